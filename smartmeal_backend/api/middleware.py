@@ -0,0 +1,46 @@
+"""
+ASGI middleware shared by all routes
+"""
+import re
+from services.logging_setup import request_id_var, new_request_id
+
+# Client-supplied IDs are accepted only if they are short and log-safe
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class RequestIdMiddleware:
+    """
+    Binds a request ID to every HTTP request (the client's X-Request-ID when
+    it is valid, otherwise a new one) so all log records from the request
+    carry it, and echoes it in the X-Request-ID response header.
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass
+    through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or new_request_id()
+        token = request_id_var.set(request_id)
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
+# Served by POST /receipts/upload; defined with the other API models
+from models.schemas import ReceiptUploadResponse  # noqa: F401
 
 class RecipeRequest(BaseModel):
     items: List[str]
@@ -21,11 +23,4 @@ class Recipe(BaseModel):
 class RecipeResponse(BaseModel):
     recipes: List[Recipe]
     total_count: int
-    message: str
-
-class ReceiptUploadResponse(BaseModel):
-    success: bool
-    items: List[str]
-    categories: dict
-    total_items: int
     message: str 
\ No newline at end of file
@@ -1,14 +1,66 @@
-from fastapi import APIRouter, HTTPException
-from models.schemas import RecipeRequest, RecipeResponse, Recipe
-from services.ai_service import gemini_service
-from services.utils import parse_recipe_response
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from models.schemas import (
+    RecipeRequest, RecipeResponse, Recipe, BatchRecipeRequest, BatchRecipeItem, BatchRecipeResponse, ReceiptUploadResponse
+)
+from services.ai_service import gemini_service, RecipeParseError
+from services.utils import parse_recipe_slots, parse_recipe
+from services.catalog import recipe_catalog
+from services.resilience import CircuitOpenError, DeadlineExceeded
+from services.admission import AdmissionRejected
+from services.receipts import read_receipts, ReceiptFormatError, ReceiptTooLarge
+from services.dietary import DietaryRules, rules_for_preferences
+from services.profile_store import profile_store, ProfileNotFound
+from services.auth import caller_plan_type
+from services.metrics import (
+    RECIPE_VALIDATE, RECIPE_SERIALIZE, RECIPES_DROPPED_VALIDATE, RECIPE_DIET_VERIFY, RECIPE_REGENERATE,
+    RECIPE_DIET_VIOLATIONS, RECIPES_REGENERATED, RECIPES_MISSING, RECIPE_PARSE_FAILURES
+)
+from services.logging_setup import log_payload
+from services.serialization import model_response
+from typing import List, Optional
 import os
+import json
+import math
+import logging
+import time
+import asyncio
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 # Check if we should use mock data (for testing without API key)
 USE_MOCK_DATA = os.getenv("USE_MOCK_DATA", "false").lower() == "true"
 
+# Answer from the recipe catalog (no LLM call) when it already has enough
+# recipes whose ingredients are mostly covered by the pantry
+CATALOG_MATCH_ENABLED = os.getenv("CATALOG_MATCH_ENABLED", "true").lower() == "true"
+CATALOG_MIN_COVERAGE = float(os.getenv("CATALOG_MIN_COVERAGE", "0.8"))
+CATALOG_MIN_RESULTS = int(os.getenv("CATALOG_MIN_RESULTS", "2"))
+CATALOG_MAX_RESULTS = int(os.getenv("CATALOG_MAX_RESULTS", "3"))
+
+# Time budget (seconds) for one recipe request, including Gemini retries;
+# clients can ask for less with an X-Request-Timeout header
+RECIPE_REQUEST_TIMEOUT = float(os.getenv("RECIPE_REQUEST_TIMEOUT", "30"))
+
+# Batch endpoint limits
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("RECIPE_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("RECIPE_BATCH_MAX_CONCURRENCY", "64"))
+BATCH_MAX_ITEMS = int(os.getenv("RECIPE_BATCH_MAX_ITEMS", "1000"))
+
+# Check generated recipes against the request's allergies and diet
+DIET_VERIFY_ENABLED = os.getenv("DIET_VERIFY_ENABLED", "true").lower() == "true"
+# Recipes per answer: the prompts ask for 2-3. Recipes that were cut off,
+# failed validation or broke the diet, and any shortfall below the minimum,
+# are requested again in one follow-up call for just the missing ones
+RECIPE_MIN_COUNT = int(os.getenv("RECIPE_MIN_COUNT", "2"))
+RECIPE_MAX_COUNT = int(os.getenv("RECIPE_MAX_COUNT", "3"))
+RECIPE_REGENERATE_ENABLED = os.getenv("RECIPE_REGENERATE_ENABLED", "true").lower() == "true"
+
+# Largest receipt upload accepted (bytes, all files together)
+RECEIPT_MAX_BYTES = int(os.getenv("RECEIPT_MAX_BYTES", str(5 * 1024 * 1024)))
+
 # Mock data for fallback/testing
 MOCK_RECIPES = [
     Recipe(
@@ -25,91 +77,511 @@ MOCK_RECIPES = [
     )
 ]
 
-@router.post("/recipes/from-receipt", response_model=RecipeResponse)
-async def generate_recipes_from_receipt(request: RecipeRequest):
+def request_deadline(timeout_header: Optional[float] = None) -> float:
+    """time.monotonic() deadline for a request, capped at RECIPE_REQUEST_TIMEOUT"""
+    timeout = RECIPE_REQUEST_TIMEOUT
+    if timeout_header is not None and timeout_header > 0:
+        timeout = min(timeout, timeout_header)
+    return time.monotonic() + timeout
+
+def apply_user_profile(request: RecipeRequest, user_id_header: Optional[str] = None):
     """
-    Generate recipes based on available ingredients from receipt
-    Path A endpoint - uses Gemini AI to generate recipes
+    Fill in user_preferences from the stored profile of the request's user
+    (user_id, else the X-User-ID header) when the request did not send them
     """
-    try:
-        # Log the incoming request for debugging
-        print(f"Received request with {len(request.items)} items: {request.items}")
+    request.user_preferences = profile_store.resolve_preferences(
+        request.user_preferences, request.user_id or user_id_header
+    )
+
+def build_generation_args(request: RecipeRequest):
+    """
+    Derive the Gemini style, preferences and detailed ingredient dicts from a request
+    """
+    # Prepare preferences based on the request
+    preferences = {}
+    if request.goal:
+        preferences['dietary_goal'] = request.goal
+    
+    # Add user preferences if provided
+    if request.user_preferences:
+        preferences.update(request.user_preferences)
+        # Preferences are personal data: only logged for a sample of requests at DEBUG
+        log_payload(logger, "User preferences", request.user_preferences)
         
-        # Use mock data if configured (for testing)
-        if USE_MOCK_DATA:
+    # Determine the style based on goal
+    style = "default"
+    if request.goal == "fitness":
+        style = "health_focused"
+    elif request.goal == "quick":
+        style = "quick_meals"
+    elif request.goal == "budget":
+        style = "budget_conscious"
+    
+    # Convert detailed items to dict format if available
+    detailed_ingredients = None
+    if request.detailed_items:
+        detailed_ingredients = [
+            {
+                'name': item.name,
+                'quantity': item.quantity,
+                'unit': item.unit,
+                'price': item.price
+            }
+            for item in request.detailed_items
+        ]
+    
+    return style, preferences, detailed_ingredients
+
+def match_catalog_recipes(request: RecipeRequest) -> List[Recipe]:
+    """
+    Catalog recipes the pantry can cover, honouring diet, allergies and dislikes
+    """
+    preferences = request.user_preferences or {}
+    diet = preferences.get('diet')
+    # The catalog only knows whether a recipe is vegetarian; leave other diets to the model
+    if diet and diet not in ('vegetarian', 'vegan'):
+        return []
+    
+    items = list(request.items)
+    if request.detailed_items:
+        items.extend(item.name for item in request.detailed_items)
+    
+    matches = recipe_catalog.match_pantry(
+        items,
+        min_coverage=CATALOG_MIN_COVERAGE,
+        limit=CATALOG_MAX_RESULTS,
+        vegetarian_only=bool(diet),
+        avoid=list(preferences.get('allergies') or []) + list(preferences.get('dislikes') or [])
+    )
+    recipes = [recipe_catalog.recipes[index] for index, _ in matches]
+    # The catalog filter is a substring check; apply the full lexicon as well
+    rules = rules_for_preferences(preferences) if DIET_VERIFY_ENABLED else None
+    if rules is not None:
+        recipes = [recipe for recipe in recipes if not rules.violations(recipe)]
+    return recipes
+
+async def regenerate_recipes(
+    request: RecipeRequest,
+    count: int,
+    rules: Optional[DietaryRules],
+    keep_names: List[str],
+    style: str,
+    preferences: dict,
+    detailed_ingredients: Optional[List[dict]],
+    deadline: Optional[float],
+    plan_type: Optional[str]
+) -> List[Recipe]:
+    """
+    Up to `count` new valid recipes (satisfying `rules`, if any) to fill slots
+    that were dropped; failures are logged and give no replacements
+    """
+    if not RECIPE_REGENERATE_ENABLED:
+        return []
+    start = time.perf_counter()
+    try:
+        ai_response = await gemini_service.generate_replacement_recipes_async(
+            ingredients=request.items,
+            count=count,
+            style=style,
+            preferences=preferences,
+            detailed_ingredients=detailed_ingredients,
+            avoid=rules.describe() if rules is not None else [],
+            exclude_names=keep_names,
+            deadline=deadline,
+            plan_type=plan_type
+        )
+    except Exception as e:
+        logger.warning("Recipe regeneration failed", extra={"count": count, "error": str(e)})
+        return []
+    finally:
+        RECIPE_REGENERATE.observe(time.perf_counter() - start)
+    
+    replacements = []
+    for recipe in parse_recipe_slots(ai_response):
+        if recipe is None or recipe.name in keep_names:
+            continue
+        if rules is not None and rules.violations(recipe):
+            RECIPE_DIET_VIOLATIONS.inc()
+            continue
+        replacements.append(recipe)
+        if len(replacements) == count:
+            break
+    RECIPES_REGENERATED.inc(len(replacements))
+    return replacements
+
+async def complete_recipes(
+    request: RecipeRequest,
+    slots: List[Optional[Recipe]],
+    incomplete: int,
+    style: str,
+    preferences: dict,
+    detailed_ingredients: Optional[List[dict]],
+    deadline: Optional[float],
+    plan_type: Optional[str]
+) -> List[Recipe]:
+    """
+    Fill the recipe slots of a model answer. Slots are empty where a recipe
+    was cut off (`incomplete` of them) or failed validation, and recipes
+    that break the request's allergies or diet are emptied too; the answer
+    is padded to RECIPE_MIN_COUNT. One follow-up call asks for exactly the
+    missing recipes, each replacement taking its slot; slots still empty
+    afterwards are dropped.
+    """
+    slots = list(slots)
+    rules = rules_for_preferences(preferences) if DIET_VERIFY_ENABLED else None
+    if rules is not None:
+        start = time.perf_counter()
+        violations = []
+        for index, recipe in enumerate(slots):
+            found = rules.violations(recipe) if recipe is not None else None
+            if found:
+                violations.append(f"{recipe.name} ({found[0]})")
+                slots[index] = None
+        RECIPE_DIET_VERIFY.observe(time.perf_counter() - start)
+        if violations:
+            RECIPE_DIET_VIOLATIONS.inc(len(violations))
+            logger.info("Recipes broke dietary constraints", extra={"violations": violations})
+    
+    expected = min(RECIPE_MAX_COUNT, max(len(slots) + incomplete, RECIPE_MIN_COUNT))
+    slots.extend([None] * (expected - len(slots)))
+    missing = slots.count(None)
+    if not missing:
+        return slots
+    
+    replacements = await regenerate_recipes(
+        request, missing, rules, [recipe.name for recipe in slots if recipe is not None],
+        style, preferences, detailed_ingredients, deadline, plan_type
+    )
+    RECIPES_MISSING.inc(missing - len(replacements))
+    recipes = []
+    for index, recipe in enumerate(slots):
+        if recipe is not None:
+            recipes.append(recipe)
+        elif replacements:
+            recipes.append(replacements.pop(0).model_copy(update={"id": f"ai_recipe_{index}"}))
+    if not recipes:
+        RECIPE_PARSE_FAILURES.inc()
+        raise ValueError("No valid recipes could be parsed from AI response")
+    
+    # Later identical requests get the completed answer from the cache
+    gemini_service.remember_recipes(
+        request.items, style, preferences, detailed_ingredients, {"recipes": [recipe.model_dump() for recipe in recipes]}
+    )
+    return recipes
+
+async def generate_recipe_response(
+    request: RecipeRequest,
+    deadline: Optional[float] = None,
+    plan_type: Optional[str] = None
+) -> RecipeResponse:
+    """
+    Run the Path A pipeline for one request (raises on failure)
+    """
+    # Use mock data if configured (for testing)
+    if USE_MOCK_DATA:
+        return RecipeResponse(
+            recipes=MOCK_RECIPES,
+            total_count=len(MOCK_RECIPES),
+            message="Mock recipes returned for testing"
+        )
+    
+    goal_message = f" for {request.goal} goal" if request.goal else ""
+    
+    if CATALOG_MATCH_ENABLED:
+        catalog_recipes = match_catalog_recipes(request)
+        if len(catalog_recipes) >= CATALOG_MIN_RESULTS:
+            logger.info("Answered from catalog", extra={"recipe_count": len(catalog_recipes)})
             return RecipeResponse(
-                recipes=MOCK_RECIPES,
-                total_count=len(MOCK_RECIPES),
-                message="Mock recipes returned for testing"
+                recipes=catalog_recipes,
+                total_count=len(catalog_recipes),
+                message=f"Found {len(catalog_recipes)} recipes{goal_message} you can make with your ingredients"
             )
-        
-        # Prepare preferences based on the request
-        preferences = {}
-        if request.goal:
-            preferences['dietary_goal'] = request.goal
-        
-        # Add user preferences if provided
-        if request.user_preferences:
-            preferences.update(request.user_preferences)
-            # Log user preferences for debugging
-            print(f"User preferences: diet={preferences.get('diet')}, allergies={preferences.get('allergies')}")
-            
-        # Determine the style based on goal
-        style = "default"
-        if request.goal == "fitness":
-            style = "health_focused"
-        elif request.goal == "quick":
-            style = "quick_meals"
-        elif request.goal == "budget":
-            style = "budget_conscious"
-        
-        # Call Gemini AI service
-        print(f"Calling Gemini AI with style: {style}")
-        
-        # Convert detailed items to dict format if available
-        detailed_ingredients = None
-        if request.detailed_items:
-            detailed_ingredients = [
-                {
-                    'name': item.name,
-                    'quantity': item.quantity,
-                    'unit': item.unit,
-                    'price': item.price
-                }
-                for item in request.detailed_items
-            ]
-        
-        ai_response = gemini_service.generate_recipes_from_ingredients(
+    
+    style, preferences, detailed_ingredients = build_generation_args(request)
+    
+    deadline = deadline if deadline is not None else request_deadline()
+    
+    # Call Gemini AI service
+    logger.debug("Calling Gemini", extra={"style": style})
+    
+    try:
+        ai_response = await gemini_service.generate_recipes_from_ingredients_async(
             ingredients=request.items,
             style=style,
             preferences=preferences,
-            detailed_ingredients=detailed_ingredients
+            detailed_ingredients=detailed_ingredients,
+            deadline=deadline,
+            plan_type=plan_type
         )
+    except RecipeParseError as e:
+        # Nothing usable in the output: every slot is regenerated below
+        logger.warning("Model response had no recipes", extra={"error": str(e)})
+        ai_response = {"recipes": []}
+    
+    # Parse the AI response into Recipe slots (None where a recipe was invalid)
+    start = time.perf_counter()
+    slots = parse_recipe_slots(ai_response)
+    RECIPE_VALIDATE.observe(time.perf_counter() - start)
+    
+    recipes = await complete_recipes(
+        request, slots, ai_response.get("incomplete", 0), style, preferences, detailed_ingredients, deadline, plan_type
+    )
+    
+    logger.info("Generated recipes", extra={"recipe_count": len(recipes)})
+    
+    # Build response message
+    message = f"Generated {len(recipes)} personalized recipes{goal_message} based on your ingredients"
+    
+    return RecipeResponse(
+        recipes=recipes,
+        total_count=len(recipes),
+        message=message
+    )
+
+@router.post("/recipes/from-receipt", response_model=RecipeResponse)
+async def generate_recipes_from_receipt(
+    request: RecipeRequest,
+    x_request_timeout: Optional[float] = Header(None),
+    x_user_id: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Generate recipes based on available ingredients from receipt
+    Path A endpoint - uses Gemini AI to generate recipes
+    """
+    try:
+        logger.info("Recipe request received", extra={"item_count": len(request.items)})
+        log_payload(logger, "Recipe request items", request.items)
+        apply_user_profile(request, x_user_id)
         
-        # Parse the AI response into Recipe objects
-        recipes = parse_recipe_response(ai_response)
-        
-        # Log success
-        print(f"Successfully generated {len(recipes)} recipes")
+        result = await generate_recipe_response(
+            request,
+            deadline=request_deadline(x_request_timeout),
+            plan_type=caller_plan_type(authorization)
+        )
         
-        # Build response message
-        goal_message = f" for {request.goal} goal" if request.goal else ""
-        message = f"Generated {len(recipes)} personalized recipes{goal_message} based on your ingredients"
+        # Serialize here rather than in FastAPI so the stage is measured
+        start = time.perf_counter()
+        response = model_response(result)
+        RECIPE_SERIALIZE.observe(time.perf_counter() - start)
+        return response
         
-        return RecipeResponse(
-            recipes=recipes,
-            total_count=len(recipes),
-            message=message
+    except ProfileNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many recipe requests: {str(e)}",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
         )
-        
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Recipe generation is temporarily unavailable: {str(e)}",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Error generating recipes: {str(e)}")
     except Exception as e:
-        print(f"Error in generate_recipes_from_receipt: {str(e)}")
+        logger.error("Recipe generation failed", extra={"error": str(e)})
         # Return a more detailed error for debugging
         raise HTTPException(
             status_code=500, 
             detail=f"Error generating recipes: {str(e)}. Make sure your Gemini API key is set correctly."
         )
 
+@router.post("/recipes/from-receipt/batch", response_model=BatchRecipeResponse)
+async def generate_recipes_batch(
+    batch: BatchRecipeRequest,
+    x_user_id: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Generate recipes for many receipts with bounded concurrency.
+    Results come back in request order, each with its recipes or its error.
+    With "stream": true the response is NDJSON, one item per line as each finishes.
+    """
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large. At most {BATCH_MAX_ITEMS} requests are allowed")
+    
+    concurrency = max(1, min(batch.concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    plan_type = caller_plan_type(authorization)
+    logger.info("Recipe batch received", extra={"batch_size": len(batch.requests), "concurrency": concurrency})
+    
+    async def run_item(index: int, request: RecipeRequest) -> BatchRecipeItem:
+        async with semaphore:
+            try:
+                apply_user_profile(request, x_user_id)
+                result = await generate_recipe_response(request, plan_type=plan_type)
+                return BatchRecipeItem(index=index, success=True, result=result)
+            except Exception as e:
+                logger.warning("Batch item failed", extra={"index": index, "error": str(e)})
+                return BatchRecipeItem(index=index, success=False, error=f"Error generating recipes: {str(e)}")
+    
+    tasks = [asyncio.ensure_future(run_item(index, request)) for index, request in enumerate(batch.requests)]
+    
+    if batch.stream:
+        async def item_stream():
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    item = await finished
+                    yield item.model_dump_json() + "\n"
+            finally:
+                # Client went away: stop the work that is still queued
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(item_stream(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    succeeded = sum(1 for item in results if item.success)
+    return model_response(BatchRecipeResponse(
+        results=results,
+        total_count=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded
+    ))
+
+@router.post("/receipts/upload", response_model=ReceiptUploadResponse)
+async def upload_receipts(request: Request):
+    """
+    Extract ingredients from receipt text: a text/plain body (one receipt) or
+    a multipart/form-data upload with one receipt per file. The body is
+    parsed as it arrives, line by line, without being buffered.
+    """
+    try:
+        receipts = await read_receipts(request.stream(), request.headers.get("content-type", ""), RECEIPT_MAX_BYTES)
+    except ReceiptTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ReceiptFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    detailed_items = [item for receipt in receipts for item in receipt.items]
+    items = list(dict.fromkeys(item.name for item in detailed_items))
+    category_by_name = {item.name: item.category for item in detailed_items}
+    categories = {}
+    for name in items:
+        categories.setdefault(category_by_name[name], []).append(name)
+    unmatched_lines = sum(receipt.unmatched_lines for receipt in receipts)
+    
+    return model_response(ReceiptUploadResponse(
+        success=bool(items),
+        items=items,
+        categories=categories,
+        total_items=len(items),
+        message=f"Found {len(items)} ingredients in {len(receipts)} receipt{'s' if len(receipts) != 1 else ''}",
+        detailed_items=detailed_items,
+        receipts=len(receipts),
+        unmatched_lines=unmatched_lines
+    ))
+
+@router.post("/recipes/from-receipt/stream")
+async def stream_recipes_from_receipt(
+    request: RecipeRequest,
+    x_request_timeout: Optional[float] = Header(None),
+    x_user_id: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Streaming variant of /recipes/from-receipt (NDJSON).
+    Emits {"type": "recipe", ...} as soon as each recipe is complete, then a
+    final {"type": "done", ...} or {"type": "error", ...} line.
+    """
+    logger.info("Streaming recipe request received", extra={"item_count": len(request.items)})
+    log_payload(logger, "Recipe request items", request.items)
+    try:
+        apply_user_profile(request, x_user_id)
+    except ProfileNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    deadline = request_deadline(x_request_timeout)
+    
+    async def event_stream():
+        count = 0
+        try:
+            # Recipes that need no model call: mock data or a catalog match
+            ready_recipes = []
+            if USE_MOCK_DATA:
+                ready_recipes = MOCK_RECIPES
+            elif CATALOG_MATCH_ENABLED:
+                ready_recipes = match_catalog_recipes(request)
+                if len(ready_recipes) < CATALOG_MIN_RESULTS:
+                    ready_recipes = []
+            
+            if ready_recipes:
+                for recipe in ready_recipes:
+                    yield json.dumps({"type": "recipe", "index": count, "recipe": recipe.model_dump()}) + "\n"
+                    count += 1
+            else:
+                style, preferences, detailed_ingredients = build_generation_args(request)
+                plan_type = caller_plan_type(authorization)
+                rules = rules_for_preferences(preferences) if DIET_VERIFY_ENABLED else None
+                emitted = []
+                idx = 0
+                async for recipe_data in gemini_service.stream_recipes_from_ingredients(
+                    ingredients=request.items,
+                    style=style,
+                    preferences=preferences,
+                    detailed_ingredients=detailed_ingredients,
+                    deadline=deadline,
+                    plan_type=plan_type
+                ):
+                    # Same validation rules as parse_recipe_slots: skip invalid recipes
+                    try:
+                        recipe = parse_recipe(recipe_data, idx)
+                    except Exception as e:
+                        logger.warning("Dropped invalid recipe", extra={"index": idx, "error": str(e)})
+                        RECIPES_DROPPED_VALIDATE.inc()
+                        continue
+                    finally:
+                        idx += 1
+                    if rules is not None:
+                        start = time.perf_counter()
+                        found = rules.violations(recipe)
+                        RECIPE_DIET_VERIFY.observe(time.perf_counter() - start)
+                        if found:
+                            RECIPE_DIET_VIOLATIONS.inc()
+                            logger.info("Recipes broke dietary constraints", extra={"violations": [f"{recipe.name} ({found[0]})"]})
+                            continue
+                    emitted.append(recipe)
+                    yield json.dumps({"type": "recipe", "index": count, "recipe": recipe.model_dump()}) + "\n"
+                    count += 1
+                
+                # Dropped recipes and any shortfall are requested once the stream ends
+                missing = min(RECIPE_MAX_COUNT, max(idx, RECIPE_MIN_COUNT)) - len(emitted)
+                if missing > 0:
+                    replacements = await regenerate_recipes(
+                        request, missing, rules, [recipe.name for recipe in emitted],
+                        style, preferences, detailed_ingredients, deadline, plan_type
+                    )
+                    RECIPES_MISSING.inc(missing - len(replacements))
+                    for recipe in replacements:
+                        recipe = recipe.model_copy(update={"id": f"ai_recipe_{idx}"})
+                        idx += 1
+                        emitted.append(recipe)
+                        yield json.dumps({"type": "recipe", "index": count, "recipe": recipe.model_dump()}) + "\n"
+                        count += 1
+                    if emitted:
+                        gemini_service.remember_recipes(
+                            request.items, style, preferences, detailed_ingredients,
+                            {"recipes": [recipe.model_dump() for recipe in emitted]}
+                        )
+            
+            if count == 0:
+                raise ValueError("No valid recipes could be parsed from AI response")
+            
+            goal_message = f" for {request.goal} goal" if request.goal else ""
+            yield json.dumps({
+                "type": "done",
+                "total_count": count,
+                "message": f"Generated {count} personalized recipes{goal_message} based on your ingredients"
+            }) + "\n"
+        except Exception as e:
+            logger.error("Recipe stream failed", extra={"error": str(e)})
+            yield json.dumps({"type": "error", "detail": f"Error generating recipes: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @router.get("/recipes/test")
 async def test_ai_connection():
     """
@@ -118,7 +590,7 @@ async def test_ai_connection():
     try:
         # Test with simple ingredients
         test_ingredients = ["chicken", "rice", "vegetables"]
-        response = gemini_service.generate_recipes_from_ingredients(
+        response = await gemini_service.generate_recipes_from_ingredients_async(
             ingredients=test_ingredients,
             style="default"
         )
@@ -133,3 +605,21 @@ async def test_ai_connection():
             "message": f"Gemini AI connection failed: {str(e)}",
             "hint": "Check if GEMINI_API_KEY is set in .env file"
         }
+
+@router.get("/recipes/cache/stats")
+async def get_recipe_cache_stats():
+    """
+    Hit/miss counters for the exact and similarity result caches and coalesced Gemini calls
+    """
+    singleflight = gemini_service.singleflight.stats()
+    similarity = gemini_service.similarity_cache.stats() if gemini_service.similarity_cache is not None else {"enabled": False}
+    if gemini_service.cache is None:
+        return {"enabled": False, "similarity": similarity, "singleflight": singleflight}
+    return {"enabled": True, **gemini_service.cache.stats(), "similarity": similarity, "singleflight": singleflight}
+
+@router.get("/recipes/upstream/stats")
+async def get_upstream_stats():
+    """
+    Retry, hedging, deadline and circuit breaker counters for Gemini calls
+    """
+    return gemini_service.resilience_stats()
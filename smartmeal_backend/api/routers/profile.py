@@ -1,41 +1,57 @@
-from fastapi import APIRouter
-from models.schemas import ProfileResponse, UserProfile, UserPreferences, NutritionGoals
+import asyncio
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import Response
+from models.schemas import ProfileResponse, ProfileUpdate
+from services.profile_store import profile_store, etag_matches, StoredProfile, ProfilePreconditionFailed, PROFILE_DEFAULT_USER
+from typing import Optional
 
 router = APIRouter()
 
+def profile_response(entry: StoredProfile) -> Response:
+    """The stored body, tagged with its ETag; clients revalidate before reuse"""
+    return Response(
+        content=entry.body,
+        media_type="application/json",
+        headers={"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    )
+
 @router.get("/profile", response_model=ProfileResponse)
-async def get_user_profile():
+async def get_user_profile(
+    x_user_id: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Get user profile with preferences and nutrition goals
+    (X-User-ID selects the user; If-None-Match gives 304 when unchanged)
     """
-    # Create fake user profile data
-    preferences = UserPreferences(
-        cuisine_preferences=["Asian", "Mediterranean", "Italian"],
-        allergies=["None"],
-        dietary_restrictions=["None"],
-        cooking_frequency="weekdays",
-        household_size=2
-    )
-    
-    nutrition_goals = NutritionGoals(
-        daily_calories=2200,
-        protein_goal=150.0,
-        carb_goal=250.0,
-        fat_goal=80.0,
-        fiber_goal=30.0
-    )
-    
-    profile = UserProfile(
-        name="John Doe",
-        email="john.doe@example.com",
-        preferences=preferences,
-        nutrition_goals=nutrition_goals,
-        member_since="January 2024",
-        plan_type="premium",
-        last_login="Today at 10:30 AM"
-    )
-    
-    return ProfileResponse(
-        profile=profile,
-        message="User profile retrieved successfully"
-    ) 
\ No newline at end of file
+    user_id = x_user_id or PROFILE_DEFAULT_USER
+    # A cache hit answers on the event loop; a miss queries SQLite in a thread
+    entry = profile_store.get_cached(user_id) or await asyncio.to_thread(profile_store.get, user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers={"ETag": entry.etag, "Cache-Control": "private, no-cache"})
+    return profile_response(entry)
+
+@router.put("/profile", response_model=ProfileResponse)
+async def update_user_profile(
+    update: ProfileUpdate,
+    x_user_id: Optional[str] = Header(None),
+    if_match: Optional[str] = Header(None)
+):
+    """
+    Create or replace the X-User-ID user's profile. plan_type, member_since
+    and last_login keep their stored values. With If-Match, the write fails
+    with 412 unless the stored profile still has that ETag.
+    """
+    if not x_user_id:
+        raise HTTPException(status_code=400, detail="X-User-ID header is required")
+    if x_user_id == PROFILE_DEFAULT_USER:
+        raise HTTPException(status_code=403, detail="The default profile cannot be changed")
+    try:
+        entry = await asyncio.to_thread(
+            profile_store.update, x_user_id, update.profile, update.user_preferences, if_match
+        )
+    except ProfilePreconditionFailed as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    return profile_response(entry)
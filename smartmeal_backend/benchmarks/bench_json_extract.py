@@ -0,0 +1,136 @@
+"""
+Corpus check, fuzz run and benchmark for the recipe JSON extractor
+
+Usage (from smartmeal_backend/):
+    python benchmarks/bench_json_extract.py [--fuzz-iterations N]
+
+Exits non-zero if any corpus case or fuzz invariant fails.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from services.json_extract import IncrementalRecipeExtractor, extract_recipes
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extractor_corpus.json")
+
+def legacy_extract(generated_text: str):
+    """The regex recovery GeminiService used before the incremental extractor"""
+    try:
+        if "```json" in generated_text:
+            generated_text = generated_text.split("```json")[1].split("```")[0]
+        elif "```" in generated_text:
+            generated_text = generated_text.split("```")[1].split("```")[0]
+        array_match = re.search(r'\[\s*\{[\s\S]*\}\s*\]', generated_text)
+        if array_match:
+            generated_text = array_match.group()
+        parsed = json.loads(generated_text.strip())
+    except (json.JSONDecodeError, RecursionError):
+        json_match = re.search(r'\[[\s\S]*\]', generated_text)
+        if not json_match:
+            return []
+        try:
+            parsed = json.loads(json_match.group())
+        except (json.JSONDecodeError, RecursionError):
+            return []
+    if isinstance(parsed, dict):
+        parsed = parsed.get("recipes", [])
+    return parsed if isinstance(parsed, list) else []
+
+def feed_in_chunks(text: str, sizes):
+    extractor = IncrementalRecipeExtractor()
+    found = []
+    pos = 0
+    while pos < len(text):
+        size = next(sizes)
+        found.extend(extractor.feed(text[pos:pos + size]))
+        pos += size
+    return found
+
+def names(recipes):
+    return [recipe.get("name") for recipe in recipes]
+
+def check_corpus(corpus) -> int:
+    failures = 0
+    print("Corpus:")
+    for case in corpus:
+        got = names(extract_recipes(case["text"]))
+        legacy = names(legacy_extract(case["text"]))
+        # Streaming must agree with one-shot extraction for any chunking
+        chunked_ok = all(
+            names(feed_in_chunks(case["text"], iter(lambda size=size: size, None))) == got
+            for size in (1, 2, 7, 64)
+        )
+        ok = got == case["expected"] and chunked_ok
+        failures += not ok
+        print(f"  {'ok  ' if ok else 'FAIL'} {case['name']:<28} extractor={len(got)} legacy={len(legacy)} expected={len(case['expected'])}")
+    return failures
+
+def fuzz(corpus, iterations: int, seed: int = 7) -> int:
+    """Random truncation and chunking must never raise, and a prefix never yields more than the full text"""
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(iterations):
+        case = rng.choice(corpus)
+        text = case["text"]
+        cut = rng.randint(0, len(text))
+        # Occasionally corrupt one character
+        if text and rng.random() < 0.3:
+            i = rng.randrange(len(text))
+            text = text[:i] + rng.choice('{}[]",\\`') + text[i + 1:]
+        try:
+            full = feed_in_chunks(text, iter(lambda: rng.randint(1, 50), None))
+            prefix = feed_in_chunks(text[:cut], iter(lambda: rng.randint(1, 50), None))
+        except Exception as e:
+            print(f"  FAIL fuzz {case['name']}: {type(e).__name__}: {e}")
+            failures += 1
+            continue
+        if len(prefix) > len(full) or names(prefix) != names(full)[:len(prefix)]:
+            # Corruption can legitimately break later recipes; prefixes must still agree
+            if text == case["text"]:
+                print(f"  FAIL fuzz {case['name']}: prefix yielded {names(prefix)} vs {names(full)}")
+                failures += 1
+    print(f"Fuzz: {iterations} iterations, {failures} failures")
+    return failures
+
+def timeit(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+def benchmark(corpus) -> dict:
+    recipe = json.loads(corpus[0]["text"])[0]
+    large = "```json\n" + json.dumps([dict(recipe, id=str(i)) for i in range(200)], indent=2) + "\n```"
+    # Many openings and no closing "}]": the greedy regexes backtrack from every start
+    pathological = "Here you go: " + "[{\"a\": [1, 2], " * 2000
+    results = {}
+    print("Benchmark (ms per call):")
+    for label, text in (("large_200_recipes", large), ("pathological_unbalanced", pathological)):
+        extractor_ms = timeit(extract_recipes, text, 20)
+        legacy_ms = timeit(legacy_extract, text, 5)
+        results[label] = {"bytes": len(text), "extractor_ms": round(extractor_ms, 3), "legacy_ms": round(legacy_ms, 3)}
+        print(f"  {label:<26} {len(text):>8} bytes  extractor={extractor_ms:8.3f}  legacy={legacy_ms:8.3f}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fuzz-iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        corpus = json.load(f)
+
+    failures = check_corpus(corpus)
+    failures += fuzz(corpus, args.fuzz_iterations)
+    benchmark(corpus)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Receipt extraction throughput (single core)
+
+Generates synthetic store receipts (header, item lines in several POS
+formats, totals and payment lines) and measures how many receipts per
+second ReceiptReader parses, fed in network-sized chunks.
+
+Usage (from smartmeal_backend/):
+    python benchmarks/bench_receipts.py [--receipts 5000] [--items 25]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from services.receipts import ReceiptReader
+
+PRODUCTS = [
+    "ORG RED ONIONS", "CHKN BRST BNLS", "BROCCOLI CROWNS", "BANANAS", "EVOO", "CHICKEN BROTH",
+    "GREEK YOGURT PLAIN", "SWT POTATOES", "BASMATI RICE", "PENNE PASTA", "LRG EGGS", "CHEDDAR CHS",
+    "BABY SPINACH", "GRND BEEF 80/20", "ATL SALMON FILLET", "FIRM TOFU", "GARLIC", "LIMES",
+    "PAPER TOWELS", "DISH SOAP", "SPARKLING WATER", "CHOC CHIP COOKIES", "AVOCADOS HASS", "ROMA TOMS"
+]
+
+def make_receipt(rng: random.Random, items: int) -> bytes:
+    lines = ["GROCERY OUTLET #4821", "1234 MARKET ST  TEL 555-0142", "03/14/2026 18:22  REG 04"]
+    total = 0.0
+    for _ in range(items):
+        product = rng.choice(PRODUCTS)
+        price = round(rng.uniform(0.5, 15), 2)
+        total += price
+        layout = rng.randrange(3)
+        if layout == 0:
+            lines.append(f"{product} {rng.uniform(0.2, 3):.2f} LB @ {price / 2:.2f}/LB   {price:.2f} F")
+        elif layout == 1:
+            lines.append(f"{rng.randint(2, 6)} @ {price / 3:.2f} {product}   {price:.2f} F")
+        else:
+            lines.append(f"{product} {rng.choice([12, 16, 32])} OZ   {price:.2f} F")
+    lines += [f"SUBTOTAL   {total:.2f}", f"TAX   {total * 0.02:.2f}", f"TOTAL   {total * 1.02:.2f}", "VISA ************1234"]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=25)
+    parser.add_argument("--chunk", type=int, default=16384, help="bytes per feed() call")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    receipts = [make_receipt(rng, args.items) for _ in range(args.receipts)]
+    megabytes = sum(map(len, receipts)) / 1e6
+
+    matched = 0
+    start = time.perf_counter()
+    for body in receipts:
+        reader = ReceiptReader()
+        for offset in range(0, len(body), args.chunk):
+            reader.feed(body[offset:offset + args.chunk])
+        matched += len(reader.finish())
+    elapsed = time.perf_counter() - start
+
+    print(f"receipts/s: {args.receipts / elapsed:,.0f}")
+    print(f"lines/s:    {args.receipts * (args.items + 7) / elapsed:,.0f}")
+    print(f"MB/s:       {megabytes / elapsed:.1f}")
+    print(f"items matched per receipt: {matched / args.receipts:.1f} of {args.items}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Resilience scenarios for GeminiService against the local fake upstream
+
+Runs retries under injected 5xx errors, hedging under a slow tail, deadline
+enforcement and the circuit breaker during an outage, and prints success
+rates and latency percentiles for each.
+
+Usage (from smartmeal_backend/):
+    python benchmarks/bench_resilience.py [--calls 200] [--port 8765]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else None
+
+async def run_calls(service, calls: int, concurrency: int = 20, timeout: float = None):
+    """Issue `calls` distinct prompts; returns latencies (ms) and outcome counts"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    outcomes = {}
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            deadline = time.monotonic() + timeout if timeout else None
+            try:
+                # Distinct ingredients per call so nothing is coalesced
+                await service.generate_recipes_from_ingredients_async([f"item{index}", "rice"], deadline=deadline)
+                outcome = "ok"
+            except Exception as e:
+                outcome = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1e3)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    await asyncio.gather(*(one(index) for index in range(calls)))
+    return {
+        "outcomes": outcomes,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1)
+    }
+
+async def scenario(name, fake, service_factory, calls, fake_options, service_env=None, timeout=None):
+    fake.config.update({"latency_ms": 50.0, "jitter_ms": 10.0, "slow_rate": 0.0, "error_rate": 0.0, "retry_after": None})
+    fake.config.update(fake_options)
+    os.environ.update(service_env or {})
+    service = service_factory()
+    try:
+        if service.hedge_enabled:
+            # Calibrate the latency window before measuring
+            fake.config.update({"slow_rate": 0.0, "error_rate": 0.0})
+            await run_calls(service, 40)
+            fake.config.update(fake_options)
+        result = await run_calls(service, calls, timeout=timeout)
+        result["upstream"] = service.resilience_stats()
+    finally:
+        await service.aclose()
+        for key in (service_env or {}):
+            os.environ.pop(key, None)
+    return name, result
+
+async def main_async(args):
+    from fake_gemini import start_fake_gemini
+    fake = start_fake_gemini(args.port)
+
+    os.environ.update({
+        "GEMINI_API_KEY": "fake",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{args.port}/v1beta",
+        "RECIPE_CACHE_ENABLED": "false"
+    })
+    from services.ai_service import GeminiService
+
+    scenarios = [
+        ("baseline", {}, {}, None),
+        ("errors_30pct_no_retry", {"error_rate": 0.3}, {"GEMINI_RETRY_ATTEMPTS": "1", "GEMINI_BREAKER_THRESHOLD": "1000"}, None),
+        ("errors_30pct_retry", {"error_rate": 0.3}, {"GEMINI_RETRY_ATTEMPTS": "4", "GEMINI_RETRY_BASE_DELAY": "0.05", "GEMINI_BREAKER_THRESHOLD": "1000"}, None),
+        ("slow_tail_no_hedge", {"slow_rate": 0.05, "slow_ms": 1000.0}, {}, None),
+        ("slow_tail_hedged", {"slow_rate": 0.05, "slow_ms": 1000.0}, {"GEMINI_HEDGE_ENABLED": "true"}, None),
+        ("deadline_300ms_vs_2s_upstream", {"latency_ms": 2000.0}, {}, 0.3),
+        ("outage_breaker", {"error_rate": 1.0}, {"GEMINI_BREAKER_THRESHOLD": "5", "GEMINI_RETRY_BASE_DELAY": "0.05"}, None),
+    ]
+    report = {}
+    for name, fake_options, service_env, timeout in scenarios:
+        name, result = await scenario(name, fake, GeminiService, args.calls, fake_options, service_env, timeout)
+        report[name] = result
+        print(f"{name}: {result['outcomes']} p50={result['p50_ms']}ms p99={result['p99_ms']}ms", file=sys.stderr)
+    fake.shutdown()
+    print(json.dumps(report, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Per-response serialization CPU
+
+Compares, for the same plan / shopping list / profile, what each way of
+turning a model into response bytes costs:
+
+  response_model   FastAPI's default: validate the returned model against
+                   response_model, jsonable_encoder, json.dumps
+  model_dump_json  one pydantic serialization per response (no validation)
+  pooled bytes     the plan pool's stored body wrapped in a Response
+
+and the app's default response class against Starlette's JSONResponse for
+plain dicts. Also drives POST /api/v1/plans/from-goal in process (no
+network) to report CPU per request with a warm pool.
+
+Usage (from smartmeal_backend/):
+    python benchmarks/bench_serialization.py [--iterations 2000]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models.schemas import PlanResponse, ShoppingList, ProfileResponse
+from services.plan_pool import build_plan_response, build_plan_json
+from services.serialization import FastJSONResponse, ORJSON_AVAILABLE, model_response, json_response
+from services.profile_store import ProfileStore, PROFILE_DEFAULT_USER
+
+def per_call_us(fn, iterations: int) -> float:
+    """CPU microseconds per call"""
+    for _ in range(min(50, iterations)):
+        fn()
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+async def fastapi_render(field, content) -> bytes:
+    """What FastAPI does with a returned model when the route declares response_model"""
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+def bench_model(name: str, model_type, model, pooled: bytes, iterations: int):
+    field = create_response_field(name="response", type_=model_type, mode="serialization")
+    loop = asyncio.new_event_loop()
+    try:
+        default_us = per_call_us(lambda: loop.run_until_complete(fastapi_render(field, model)), iterations)
+    finally:
+        loop.close()
+    dump_us = per_call_us(lambda: model_response(model), iterations)
+    pooled_us = per_call_us(lambda: json_response(pooled), iterations)
+    print(f"{name} ({len(pooled) / 1024:.1f} KB)")
+    print(f"  response_model   {default_us:9.1f} us")
+    print(f"  model_dump_json  {dump_us:9.1f} us   ({default_us / dump_us:.1f}x)")
+    print(f"  pooled bytes     {pooled_us:9.1f} us   ({default_us / pooled_us:.0f}x)")
+
+async def drive(app, path: str, body: bytes, iterations: int) -> float:
+    """CPU microseconds per in-process request through the ASGI app"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80)
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(20):
+        await app(dict(scope), receive, send)
+    start = time.process_time()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return (time.process_time() - start) / iterations * 1e6
+
+async def bench_route(iterations: int):
+    from main import app
+    from services.plan_pool import plan_pool
+    # Big enough that no request in the run builds a plan inline
+    plan_pool.size = plan_pool.low_water = iterations + 50
+    plan_pool.start(["fitness"])
+    while plan_pool.stats()["refilling"]:
+        await asyncio.sleep(0.05)
+    route_us = await drive(app, "/api/v1/plans/from-goal", b'{"goal": "fitness"}', iterations)
+    await plan_pool.stop()
+    print(f"POST /plans/from-goal, pool hit, in process: {route_us:.1f} us CPU per request")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--route-iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if ORJSON_AVAILABLE else 'no'}\n")
+    plan = build_plan_response("fitness", 0)
+    bench_model("plan", PlanResponse, plan, build_plan_json("fitness", 0), args.iterations)
+    bench_model("shopping list", ShoppingList, plan.shopping_list, plan.shopping_list.model_dump_json().encode("utf-8"), args.iterations)
+    profile = ProfileStore().get(PROFILE_DEFAULT_USER)
+    bench_model("profile", ProfileResponse, ProfileResponse.model_validate_json(profile.body), profile.body, args.iterations)
+
+    content = plan.analytics.model_dump()
+    starlette_us = per_call_us(lambda: JSONResponse(content), args.iterations)
+    fast_us = per_call_us(lambda: FastJSONResponse(content), args.iterations)
+    print("dict (plan analytics)")
+    print(f"  JSONResponse     {starlette_us:9.1f} us")
+    print(f"  FastJSONResponse {fast_us:9.1f} us   ({starlette_us / fast_us:.1f}x)\n")
+
+    asyncio.run(bench_route(args.route_iterations))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Local fake of the Gemini REST API with injectable latency and errors
+
+Serves generateContent (JSON) and streamGenerateContent (SSE) under any
+/v1beta/models/<model>:<method> path with `recipe_count` canned recipes.
+Behaviour can be changed at runtime with POST /_config and inspected with
+GET /_stats.
+
+Usage (from smartmeal_backend/):
+    python benchmarks/fake_gemini.py [--port 8765] [--latency-ms 200]
+        [--latency-dist lognormal --latency-sigma 0.5] [--recipe-count 3]
+        [--slow-rate 0.05 --slow-ms 3000] [--error-rate 0.1 --error-status 503]
+
+Then run the API against it:
+    GEMINI_API_KEY=fake GEMINI_BASE_URL=http://127.0.0.1:8765/v1beta uvicorn main:app
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict
+
+def fake_recipe(index: int) -> Dict[str, Any]:
+    return {
+        "id": f"fake-{index}",
+        "name": f"Fake Recipe {index}",
+        "description": "Canned recipe from the fake Gemini upstream",
+        "ingredients": ["chicken", "rice", "broccoli"],
+        "instructions": ["Cook the rice", "Cook the chicken", "Serve with broccoli"],
+        "prep_time": 10,
+        "cook_time": 20,
+        "servings": 2,
+        "calories_per_serving": 450,
+        "tags": ["fake"]
+    }
+
+def model_text(recipe_count: int, structured: bool = False) -> str:
+    """Model output: a bare array in JSON mode, otherwise fenced JSON as free-text prompting returns"""
+    data = json.dumps([fake_recipe(i) for i in range(recipe_count)])
+    return data if structured else "```json\n" + data + "\n```"
+
+class FakeGeminiConfig:
+    """Latency and failure injection knobs (shared by all handler threads)"""
+
+    def __init__(self, **options):
+        self.lock = threading.Lock()
+        self.values: Dict[str, Any] = {
+            "latency_ms": 200.0,      # base (uniform) or median (lognormal) latency
+            "jitter_ms": 20.0,        # uniform: extra latency drawn from [0, jitter_ms]
+            "latency_dist": "uniform",  # "uniform" or "lognormal"
+            "latency_sigma": 0.5,     # lognormal: spread of log(latency)
+            "slow_rate": 0.0,         # share of requests that take slow_ms instead
+            "slow_ms": 3000.0,
+            "error_rate": 0.0,        # share of requests answered with error_status
+            "error_status": 503,
+            "retry_after": None,      # Retry-After header sent with errors
+            "recipe_count": 3,        # recipes in every response (output size)
+            "chunk_chars": 40,        # streaming: characters per SSE event
+            "chunk_delay_ms": 20.0    # streaming: delay between events
+        }
+        self.update(options)
+        self.requests = 0
+        self.errors = 0
+        self.slow = 0
+
+    def update(self, options: Dict[str, Any]):
+        with self.lock:
+            for key, value in options.items():
+                if key in self.values and value is not None:
+                    self.values[key] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.values)
+
+def sample_latency_ms(options: Dict[str, Any]) -> float:
+    if options["latency_dist"] == "lognormal":
+        return options["latency_ms"] * random.lognormvariate(0, options["latency_sigma"])
+    return options["latency_ms"] + random.uniform(0, options["jitter_ms"])
+
+def make_handler(config: FakeGeminiConfig):
+    texts: Dict[Any, str] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.startswith("/_stats"):
+                self._send_json(200, {"requests": config.requests, "errors": config.errors, "slow": config.slow, "config": config.snapshot()})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.startswith("/_config"):
+                config.update(json.loads(body or b"{}"))
+                self._send_json(200, config.snapshot())
+                return
+
+            options = config.snapshot()
+            with config.lock:
+                config.requests += 1
+                number = config.requests
+            delay = sample_latency_ms(options)
+            if random.random() < options["slow_rate"]:
+                delay = options["slow_ms"]
+                with config.lock:
+                    config.slow += 1
+            time.sleep(delay / 1000)
+
+            if random.random() < options["error_rate"]:
+                with config.lock:
+                    config.errors += 1
+                headers = {"Retry-After": str(options["retry_after"])} if options["retry_after"] is not None else None
+                self._send_json(options["error_status"], {"error": {"code": options["error_status"], "message": "injected failure"}}, headers)
+                return
+
+            request = json.loads(body or b"{}")
+            structured = request.get("generationConfig", {}).get("responseMimeType") == "application/json"
+            schema = request.get("generationConfig", {}).get("responseSchema") or {}
+            if schema.get("type") == "OBJECT":
+                # Plan day: one recipe per requested meal, named per request so days do not repeat
+                text = json.dumps({
+                    meal: {**fake_recipe(index), "name": f"Fake {meal.title()} {number}"}
+                    for index, meal in enumerate(schema.get("required", []))
+                })
+            else:
+                key = (int(options["recipe_count"]), structured)
+                text = texts.get(key) or texts.setdefault(key, model_text(*key))
+            if "streamGenerateContent" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                step = int(options["chunk_chars"])
+                for start in range(0, len(text), step):
+                    event = {"candidates": [{"content": {"parts": [{"text": text[start:start + step]}]}}]}
+                    frame = ("data: " + json.dumps(event) + "\r\n\r\n").encode("utf-8")
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+                    self.wfile.flush()
+                    time.sleep(options["chunk_delay_ms"] / 1000)
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under load-test concurrency
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients cancel hedged and timed-out requests mid-response; that is expected
+        pass
+
+def start_fake_gemini(port: int = 8765, **options) -> ThreadingHTTPServer:
+    """Start the fake in a background thread; returns the server (call .config to reconfigure)"""
+    config = FakeGeminiConfig(**options)
+    server = FakeGeminiServer(("127.0.0.1", port), make_handler(config))
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--latency-dist", choices=["uniform", "lognormal"], default="uniform")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--recipe-count", type=int, default=3)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma, recipe_count=args.recipe_count, slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after
+    )
+    server = FakeGeminiServer(("127.0.0.1", args.port), make_handler(config))
+    print(f"Fake Gemini listening on http://127.0.0.1:{args.port}/v1beta")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
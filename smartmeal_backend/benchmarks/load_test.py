@@ -0,0 +1,244 @@
+"""
+End-to-end load test of the API against the local fake Gemini upstream
+
+Starts the fake upstream and the FastAPI app (uvicorn, in a background
+thread of this process), then drives each endpoint with a closed loop of N
+concurrent clients for a fixed time per concurrency level. Prints a JSON
+report with throughput, p50/p95/p99 latency and error rate per
+(endpoint, concurrency).
+
+With --baseline, the run is compared against an earlier report and the
+script exits with status 1 if any scenario regressed by more than
+--tolerance (throughput down, p95/p99 up) or its error rate rose by more
+than --max-error-increase. Client and server share one process and one
+GIL, so compare only against baselines recorded on the same machine.
+
+Usage (from smartmeal_backend/):
+    python benchmarks/load_test.py [--endpoints recipes,plans,plans-llm,profile]
+        [--concurrency 1,8,32] [--duration 10] [--latency-ms 200]
+        [--latency-dist lognormal --latency-sigma 0.5] [--error-rate 0.01]
+        [--recipe-count 3] [--output report.json] [--baseline baseline.json]
+
+Service settings (GEMINI_*, PLAN_POOL_*, ...) are read from the environment
+as usual; the recipe caches are off unless RECIPE_CACHE_ENABLED or
+SIMILARITY_CACHE_ENABLED is set.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+GOALS = ["fitness", "weight-loss", "muscle-gain", "low-carb", "vegetarian"]
+PANTRY = ["chicken", "rice", "broccoli", "eggs", "tomatoes", "garlic", "onions", "spinach", "tofu", "pasta"]
+
+# Builds (method, path, json body) for the i-th request of an endpoint
+RequestFactory = Callable[[int], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+def recipe_request(index: int):
+    # A distinct item per request so calls are neither cached nor coalesced
+    items = [f"item{index}"] + PANTRY[index % 5:index % 5 + 5]
+    return "POST", "/api/v1/recipes/from-receipt", {"items": items, "user_preferences": {"diet": "omnivore"}}
+
+def plan_request(index: int):
+    return "POST", "/api/v1/plans/from-goal", {"goal": GOALS[index % len(GOALS)]}
+
+def llm_plan_request(index: int):
+    return "POST", "/api/v1/plans/from-goal", {"goal": GOALS[index % len(GOALS)], "source": "llm"}
+
+def profile_request(index: int):
+    return "GET", "/api/v1/profile", None
+
+ENDPOINTS: Dict[str, RequestFactory] = {
+    "recipes": recipe_request,
+    "plans": plan_request,
+    "plans-llm": llm_plan_request,
+    "profile": profile_request
+}
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else None
+
+def start_api(port: int):
+    """Run the app under uvicorn in a daemon thread; returns once startup has finished"""
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"API server failed to start on port {port}")
+        time.sleep(0.05)
+    return server, thread
+
+async def run_level(base_url: str, factory: RequestFactory, concurrency: int, duration: float, warmup: float) -> Dict[str, Any]:
+    """Closed loop: `concurrency` clients each send their next request as soon as the last one returns"""
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(10 ** 9))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        measure_from = time.perf_counter() + warmup
+        stop_at = measure_from + duration
+
+        async def worker():
+            while True:
+                started = time.perf_counter()
+                if started >= stop_at:
+                    return
+                method, path, body = factory(next(counter))
+                try:
+                    response = await client.request(method, path, json=body)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                finished = time.perf_counter()
+                if started >= measure_from:
+                    latencies.append((finished - started) * 1e3)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    requests = len(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else None,
+        "throughput_rps": round(requests / duration, 2),
+        "p50_ms": round(percentile(latencies, 50), 2) if requests else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if requests else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if requests else None,
+        "max_ms": round(max(latencies), 2) if requests else None,
+        "statuses": statuses
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, max_error_increase: float) -> List[str]:
+    """Regressions of `report` against `baseline`, as readable strings"""
+    previous = {(entry["endpoint"], entry["concurrency"]): entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in report["results"]:
+        key = (entry["endpoint"], entry["concurrency"])
+        base = previous.get(key)
+        if not base or not entry["requests"] or not base["requests"]:
+            continue
+        label = f"{key[0]}@{key[1]}"
+        if entry["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {entry['throughput_rps']} rps < baseline {base['throughput_rps']} rps")
+        for field in ("p95_ms", "p99_ms"):
+            if entry[field] > base[field] * (1 + tolerance):
+                regressions.append(f"{label}: {field} {entry[field]} > baseline {base[field]}")
+        if entry["error_rate"] > base["error_rate"] + max_error_increase:
+            regressions.append(f"{label}: error rate {entry['error_rate']} > baseline {base['error_rate']}")
+    return regressions
+
+async def main_async(args) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.api_port}"
+    results = []
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            upstream_before = args.fake.config.requests
+            result = await run_level(base_url, ENDPOINTS[endpoint], concurrency, args.duration, args.warmup)
+            result = {"endpoint": endpoint, **result, "upstream_requests": args.fake.config.requests - upstream_before}
+            results.append(result)
+            print(
+                f"{endpoint}@{concurrency}: {result['throughput_rps']} rps "
+                f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+                f"errors={result['error_rate']}",
+                file=sys.stderr
+            )
+    return {"results": results}
+
+def parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", type=parse_list, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=lambda value: [int(item) for item in parse_list(value)], default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each level")
+    parser.add_argument("--api-port", type=int, default=8766)
+    parser.add_argument("--fake-port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--latency-dist", choices=["uniform", "lognormal"], default="uniform")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--recipe-count", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative throughput/latency regression")
+    parser.add_argument("--max-error-increase", type=float, default=0.01, help="allowed absolute error-rate increase")
+    args = parser.parse_args()
+    unknown = [name for name in args.endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints {unknown}; choose from {list(ENDPOINTS)}")
+
+    from fake_gemini import start_fake_gemini
+    fake_options = {
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "latency_dist": args.latency_dist,
+        "latency_sigma": args.latency_sigma, "slow_rate": args.slow_rate, "slow_ms": args.slow_ms,
+        "error_rate": args.error_rate, "error_status": args.error_status, "recipe_count": args.recipe_count
+    }
+    args.fake = start_fake_gemini(args.fake_port, **fake_options)
+
+    # Must be set before the app (and its service singletons) is imported
+    os.environ["GEMINI_API_KEY"] = "fake"
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{args.fake_port}/v1beta"
+    os.environ.setdefault("RECIPE_CACHE_ENABLED", "false")
+    os.environ.setdefault("SIMILARITY_CACHE_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    server, thread = start_api(args.api_port)
+
+    try:
+        report = asyncio.run(main_async(args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        args.fake.shutdown()
+
+    report["config"] = {
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "upstream": fake_options,
+        "env": {key: value for key, value in sorted(os.environ.items()) if key.startswith(("GEMINI_", "PLAN_", "RECIPE_", "CATALOG_")) and key != "GEMINI_API_KEY"},
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.tolerance, args.max_error_increase)
+        for line in report["regressions"]:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
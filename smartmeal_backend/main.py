@@ -1,11 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from api.v1 import router as api_v1_router
+from api.middleware import RequestIdMiddleware
+from services.ai_service import gemini_service
+from services.plan_pool import plan_pool, start_plan_pool
+from services.metrics import metrics
+from services.serialization import FastJSONResponse
+from services.logging_setup import configure_logging, shutdown_logging, collect_metrics as collect_logging_metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Structured, queue-backed logging (see LOG_LEVEL / LOG_FORMAT); set up
+    # on every startup, since a shutdown in the same process tears it down
+    configure_logging()
+    metrics.register_collector(collect_logging_metrics)
+    # Pre-build plans for every goal in the background
+    start_plan_pool()
+    try:
+        yield
+    finally:
+        await plan_pool.stop()
+        # Release pooled Gemini connections
+        await gemini_service.aclose()
+        shutdown_logging()
 
 app = FastAPI(
     title="SmartMeal API",
     description="SmartMeal P0 MVP Backend API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson-backed when installed
+    default_response_class=FastJSONResponse
 )
 
 # CORS configuration for React Native development
@@ -15,8 +42,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Correlates log records with the request that produced them
+app.add_middleware(RequestIdMiddleware)
+
 # Include API routes
 app.include_router(api_v1_router, prefix="/api/v1")
 
@@ -28,6 +59,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms and service counters"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
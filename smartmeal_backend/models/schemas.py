@@ -7,6 +7,7 @@ class IngredientDetail(BaseModel):
     quantity: Optional[float] = None
     unit: Optional[str] = None
     price: Optional[float] = None
+    category: Optional[str] = None  # shopping category, filled in by receipt parsing
 
 class RecipeRequest(BaseModel):
     items: List[str]  # Keep for backward compatibility
@@ -14,6 +15,7 @@ class RecipeRequest(BaseModel):
     goal: Optional[str] = None
     # User profile data for personalization
     user_preferences: Optional[Dict[str, Any]] = None  # Will contain diet, allergies, dislikes, cuisines, cookingTime
+    user_id: Optional[str] = None  # Use this user's stored profile when user_preferences is not sent
 
 class Recipe(BaseModel):
     id: str
@@ -33,9 +35,40 @@ class RecipeResponse(BaseModel):
     total_count: int
     message: str
 
+class ReceiptUploadResponse(BaseModel):
+    success: bool
+    items: List[str]  # distinct canonical ingredient names, in receipt order
+    categories: dict  # category -> item names
+    total_items: int
+    message: str
+    detailed_items: List[IngredientDetail] = []  # one per matched line item
+    receipts: int = 1
+    unmatched_lines: int = 0  # totals, payments and unknown products
+
+class BatchRecipeRequest(BaseModel):
+    requests: List[RecipeRequest]
+    concurrency: Optional[int] = None  # max in-flight generations, defaults to RECIPE_BATCH_CONCURRENCY
+    stream: bool = False  # NDJSON, one item per line in completion order
+
+class BatchRecipeItem(BaseModel):
+    index: int  # position in BatchRecipeRequest.requests
+    success: bool
+    result: Optional[RecipeResponse] = None
+    error: Optional[str] = None
+
+class BatchRecipeResponse(BaseModel):
+    results: List[BatchRecipeItem]  # in request order
+    total_count: int
+    succeeded: int
+    failed: int
+
 # Path B Models - Weekly Plan Generation from Goal
 class PlanRequest(BaseModel):
     goal: str
+    seed: Optional[int] = None  # Rebuild a specific plan instead of taking one from the pool
+    source: Optional[str] = None  # "catalog" or "llm"; defaults to PLAN_SOURCE
+    user_preferences: Optional[Dict[str, Any]] = None  # diet, allergies, preferredCuisines ("llm" plans only), ...
+    user_id: Optional[str] = None  # Use this user's stored profile when user_preferences is not sent
 
 class DailyMeal(BaseModel):
     breakfast: Recipe
@@ -76,6 +109,7 @@ class PlanResponse(BaseModel):
     shopping_list: ShoppingList
     goal: str
     message: str
+    seed: Optional[int] = None
 
 # User Profile Models
 class UserPreferences(BaseModel):
@@ -101,6 +135,19 @@ class UserProfile(BaseModel):
     plan_type: str  # "free", "premium"
     last_login: str
 
+class ProfileEdit(BaseModel):
+    # The user-editable part of UserProfile; plan_type, member_since and
+    # last_login are owned by the server and kept as stored
+    name: str
+    email: str
+    preferences: UserPreferences
+    nutrition_goals: NutritionGoals
+
+class ProfileUpdate(BaseModel):
+    profile: ProfileEdit
+    user_preferences: Optional[Dict[str, Any]] = None  # Onboarding answers, in RecipeRequest.user_preferences form
+
 class ProfileResponse(BaseModel):
     profile: UserProfile
+    user_preferences: Optional[Dict[str, Any]] = None
     message: str 
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Admission control for upstream (Gemini) calls: a concurrency cap, a token
+bucket matched to the API quota and a bounded priority wait queue
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+from .resilience import remaining
+
+# Priority classes, highest first; unknown or missing plan types are "free"
+PRIORITY_CLASSES = ["premium", "free"]
+
+class AdmissionRejected(Exception):
+    """The call was not admitted (queue full or waited too long); retry after `retry_after` seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Requests-per-second limiter; a rate of 0 disables it"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def take(self, deadline: Optional[float] = None):
+        """Wait for a token; raises AdmissionRejected if none arrives before the deadline"""
+        while not self.try_take():
+            wait = (1 - self.tokens) / self.rate
+            left = remaining(deadline)
+            if left is not None and wait > left:
+                raise AdmissionRejected("Upstream rate limit reached", retry_after=wait)
+            await asyncio.sleep(wait)
+
+class AdmissionController:
+    """
+    Caps calls in flight at `max_concurrency`. Callers beyond the cap wait in
+    one FIFO queue per priority class; a freed slot always goes to the highest
+    class with a waiter. When `max_queue` callers are already waiting the
+    newest lower-class waiter is displaced, or the caller is rejected if
+    there is none. Rejected callers, and callers that wait longer than
+    `max_wait` (or their deadline), get AdmissionRejected with a Retry-After
+    estimate.
+    """
+
+    def __init__(self, max_concurrency: int = 32, rate: float = 0.0, burst: float = 0.0, max_queue: int = 256, max_wait: float = 10.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate, burst or self.max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in PRIORITY_CLASSES}
+        self._admitted: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        self._rejected: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        self._wait_ms: Dict[str, Deque[float]] = {name: deque(maxlen=512) for name in PRIORITY_CLASSES}
+        # Moving average of how long a call holds its slot, for Retry-After
+        self._hold_seconds = 1.0
+
+    @staticmethod
+    def priority_class(plan_type: Optional[str]) -> str:
+        name = (plan_type or "").strip().lower()
+        return name if name in PRIORITY_CLASSES else PRIORITY_CLASSES[-1]
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def retry_after(self) -> float:
+        """Rough time until a new caller would get a slot"""
+        estimate = self._hold_seconds * (self.queued() + 1) / self.max_concurrency
+        if self.bucket.rate > 0:
+            estimate = max(estimate, (self.queued() + 1) / self.bucket.rate)
+        return estimate
+
+    def _reject(self, name: str, message: str):
+        self._rejected[name] += 1
+        raise AdmissionRejected(message, retry_after=self.retry_after())
+
+    async def acquire(self, plan_type: Optional[str] = None, deadline: Optional[float] = None) -> str:
+        """Wait for a slot; returns the caller's priority class"""
+        name = self.priority_class(plan_type)
+        start = time.monotonic()
+        if self.in_flight < self.max_concurrency and self.queued() == 0:
+            self.in_flight += 1
+        else:
+            if self.queued() >= self.max_queue and not self._shed_lower(name):
+                self._reject(name, "Too many requests waiting for the recipe generator")
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[name].append(waiter)
+            timeout = self.max_wait
+            left = remaining(deadline)
+            if left is not None:
+                timeout = max(0.0, min(timeout, left))
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                self._discard(name, waiter)
+                self._reject(name, "Timed out waiting for the recipe generator")
+            except AdmissionRejected:
+                # Shed from a full queue by a higher-priority caller
+                raise
+            except BaseException:
+                if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                    # The slot was handed over just as the caller went away
+                    self.release()
+                else:
+                    self._discard(name, waiter)
+                raise
+        self._admitted[name] += 1
+        self._wait_ms[name].append((time.monotonic() - start) * 1e3)
+        return name
+
+    def _shed_lower(self, name: str) -> bool:
+        """Make room for `name` by rejecting the newest waiter of the lowest class below it"""
+        for lower in reversed(PRIORITY_CLASSES[PRIORITY_CLASSES.index(name) + 1:]):
+            queue = self._queues[lower]
+            while queue:
+                waiter = queue.pop()
+                if not waiter.done():
+                    self._rejected[lower] += 1
+                    waiter.set_exception(AdmissionRejected("Displaced by a higher-priority request", retry_after=self.retry_after()))
+                    return True
+        return False
+
+    def _discard(self, name: str, waiter: asyncio.Future):
+        try:
+            self._queues[name].remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, held_seconds: Optional[float] = None):
+        if held_seconds is not None:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held_seconds
+        self.in_flight -= 1
+        for name in PRIORITY_CLASSES:
+            queue = self._queues[name]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    # Hand the slot straight to the waiter
+                    self.in_flight += 1
+                    waiter.set_result(None)
+                    return
+
+    @asynccontextmanager
+    async def slot(self, plan_type: Optional[str] = None, deadline: Optional[float] = None) -> AsyncIterator[str]:
+        name = await self.acquire(plan_type, deadline)
+        start = time.monotonic()
+        try:
+            yield name
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, object]:
+        classes = {}
+        for name in PRIORITY_CLASSES:
+            waits = sorted(self._wait_ms[name])
+            classes[name] = {
+                "queued": len(self._queues[name]),
+                "admitted": self._admitted[name],
+                "rejected": self._rejected[name],
+                "wait_ms_p50": round(waits[len(waits) // 2], 3) if waits else None,
+                "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None
+            }
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rate_limit": self.bucket.rate,
+            "retry_after": round(self.retry_after(), 3),
+            "classes": classes
+        }
+
+def create_admission_controller_from_env() -> AdmissionController:
+    return AdmissionController(
+        max_concurrency=int(os.getenv("GEMINI_MAX_IN_FLIGHT", "32")),
+        # Requests per second allowed by the Gemini quota (0 = no limit)
+        rate=float(os.getenv("GEMINI_RATE_LIMIT", "0")),
+        burst=float(os.getenv("GEMINI_RATE_BURST", "0")),
+        max_queue=int(os.getenv("GEMINI_QUEUE_SIZE", "256")),
+        max_wait=float(os.getenv("GEMINI_QUEUE_TIMEOUT", "10"))
+    )
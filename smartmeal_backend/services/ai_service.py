@@ -1,40 +1,162 @@
 import os
 import json
-import requests
-from typing import List, Dict, Any, Optional
+import time
+import asyncio
+import logging
+import warnings
+import httpx
+from typing import List, Dict, Any, Optional, AsyncIterator
 from dotenv import load_dotenv
-from .prompts import RECIPE_GENERATION_SYSTEM_PROMPT, get_recipe_prompt
+from .prompts import (
+    RECIPE_GENERATION_SYSTEM_PROMPT, RECIPE_JSON_FORMAT, RECIPE_RESPONSE_SCHEMA, get_recipe_prompt, get_replacement_instructions
+)
+from .cache import make_cache_key, create_recipe_cache_from_env
+from .similarity_cache import create_similarity_cache_from_env
+from .singleflight import SingleFlight
+from .json_extract import IncrementalRecipeExtractor, extract_json_value
+from .resilience import (
+    RETRYABLE_STATUSES, UpstreamError, CircuitOpenError, DeadlineExceeded, LatencyTracker,
+    remaining, parse_retry_after, create_retry_policy_from_env, create_circuit_breaker_from_env
+)
+from .admission import AdmissionRejected, create_admission_controller_from_env
+from .gemini_backends import GeminiBackend, LiveBackend, prompt_hash, create_backend_from_env
+from .logging_setup import log_payload
+from .metrics import (
+    metrics, Histogram, RECIPE_PROMPT_RENDER, RECIPE_ADMISSION_WAIT, RECIPE_UPSTREAM_HTTP, RECIPE_JSON_EXTRACT,
+    RECIPE_PARSE_FAILURES, RECIPES_DROPPED_EXTRACT
+)
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional "h2" package; fall back to HTTP/1.1 keep-alive without it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class RecipeParseError(Exception):
+    """The model answered, but no complete recipe object could be read from its output"""
+
 class GeminiService:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.mock_mode = not self.api_key
+        # GEMINI_BACKEND=replay serves a recorded cassette and needs no key
+        self.backend_mode = os.getenv("GEMINI_BACKEND", "live").lower()
+        self.mock_mode = not self.api_key and self.backend_mode != "replay"
+        
+        # Connection pool settings (seconds / connection counts)
+        self.connect_timeout = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("GEMINI_READ_TIMEOUT", "60"))
+        self.max_connections = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        self.http2 = HTTP2_AVAILABLE and os.getenv("GEMINI_HTTP2", "true").lower() == "true"
+        
+        # Upstream location (point GEMINI_BASE_URL at a local fake for load tests)
+        self.base_url = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+        self.model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+        # JSON response mode constrained by RECIPE_RESPONSE_SCHEMA; false falls
+        # back to asking for JSON in the prompt text
+        self.structured_output = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() == "true"
+        
+        # Resilience: jittered retries, a circuit breaker and optional hedging,
+        # where a second request is sent once the first is slower than the
+        # recent GEMINI_HEDGE_PERCENTILE latency
+        self.retry_policy = create_retry_policy_from_env()
+        self.breaker = create_circuit_breaker_from_env()
+        self.latency = LatencyTracker()
+        self.hedge_enabled = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_percentile = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+        self.hedge_min_delay = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "0.05"))
+        
+        # Concurrency cap, quota-matched rate limit and priority queue for upstream calls
+        self.admission = create_admission_controller_from_env()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+        
+        # Clients are created lazily so the async one binds to the server's event loop
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_client: Optional[httpx.Client] = None
+        
+        # Two-tier result cache (None when RECIPE_CACHE_ENABLED=false)
+        self.cache = create_recipe_cache_from_env()
+        
+        # Serves responses for near-duplicate pantries (None when SIMILARITY_CACHE_ENABLED=false)
+        self.similarity_cache = create_similarity_cache_from_env()
         
+        # Coalesces concurrent identical prompts into one upstream call
+        self.singleflight = SingleFlight()
+        
+        self.backend: Optional[GeminiBackend] = None
         if self.mock_mode:
-            print("Warning: GEMINI_API_KEY not found. Running in mock mode with sample data.")
+            logger.warning("GEMINI_API_KEY not found. Running in mock mode with sample data.")
         else:
             # Use the Gemini 2.0 Flash model via REST API
-            self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={self.api_key}"
-        
-    def generate_recipes_from_ingredients(
-        self, 
-        ingredients: List[str], 
+            self.api_url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
+            # Server-sent events variant used by the streaming endpoint
+            self.stream_url = f"{self.base_url}/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+            # Live REST calls, or recorded to / replayed from a cassette (GEMINI_BACKEND)
+            self.backend = create_backend_from_env(
+                LiveBackend(self.api_url, self.stream_url, lambda: self.async_client, lambda: self.sync_client)
+            )
+    
+    def _client_options(self) -> Dict[str, Any]:
+        """Shared timeout and pool settings for the sync and async clients"""
+        return {
+            "timeout": httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections
+            ),
+            "headers": {'Content-Type': 'application/json'},
+            "http2": self.http2
+        }
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Persistent keep-alive connection pool used by the async path"""
+        # A pool is tied to the event loop it was created on (test clients and
+        # scripts may run several loops), so rebuild it if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client.is_closed or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(**self._client_options())
+            self._async_client_loop = loop
+        return self._async_client
+    
+    @property
+    def sync_client(self) -> httpx.Client:
+        """Persistent connection pool used by the sync shim"""
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(**self._client_options())
+        return self._sync_client
+    
+    async def aclose(self):
+        """Close pooled connections (called on application shutdown)"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+    
+    def _build_payload(
+        self,
+        ingredients: List[str],
         style: str = "default",
         preferences: Optional[Dict[str, Any]] = None,
-        detailed_ingredients: Optional[List[Dict[str, Any]]] = None
+        detailed_ingredients: Optional[List[Dict[str, Any]]] = None,
+        extra_instructions: str = ""
     ) -> Dict[str, Any]:
         """
-        Generate recipes based on ingredients using Gemini AI REST API
+        Build the Gemini request payload from our prompt templates
         """
-        
-        # If in mock mode, return sample data
-        if self.mock_mode:
-            return self._get_mock_recipes(ingredients, style, preferences)
-        
-        # Build the prompt using our prompt templates
+        start = time.perf_counter()
         if detailed_ingredients:
             # Format detailed ingredients for the prompt
             ingredient_text = []
@@ -49,150 +171,652 @@ class GeminiService:
             ingredients=ingredients,
             style=style,
             **(preferences or {})
-        )
-        
-        # Force JSON output with very explicit instructions
-        full_prompt = f"""OUTPUT ONLY VALID JSON. NO OTHER TEXT.
+        ) + extra_instructions
         
-{user_prompt}
-
-IMPORTANT: Your entire response must be a valid JSON array starting with [ and ending with ]. Do not include any explanatory text before or after the JSON."""
+        payload = self._payload(RECIPE_GENERATION_SYSTEM_PROMPT, user_prompt, RECIPE_RESPONSE_SCHEMA, RECIPE_JSON_FORMAT)
+        RECIPE_PROMPT_RENDER.observe(time.perf_counter() - start)
+        return payload
+    
+    def _payload(self, system_prompt: str, user_prompt: str, response_schema: Dict[str, Any], json_format: str) -> Dict[str, Any]:
+        """
+        Gemini request payload for a JSON answer: constrained by
+        `response_schema` in structured-output mode, else by the `json_format`
+        instructions appended to the prompt
+        """
+        generation_config = {
+            "temperature": 0.2,  # Lower temperature for more consistent JSON
+            "topK": 40,
+            "topP": 0.95,
+            "maxOutputTokens": 2048
+        }
+        if self.structured_output:
+            # Gemini guarantees JSON matching the schema
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = response_schema
+        else:
+            user_prompt = f"{user_prompt}\n\n{json_format}"
         
-        # Prepare the request payload
-        payload = {
+        return {
+            "systemInstruction": {
+                "parts": [
+                    {
+                        "text": system_prompt
+                    }
+                ]
+            },
             "contents": [
                 {
                     "parts": [
                         {
-                            "text": full_prompt
+                            "text": user_prompt
                         }
                     ]
                 }
             ],
-            "generationConfig": {
-                "temperature": 0.2,  # Lower temperature for more consistent JSON
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 2048
-            }
+            "generationConfig": generation_config
         }
-        
+    
+    @staticmethod
+    def _prompt_key(payload: Dict[str, Any]) -> str:
+        """Hash of the fully rendered prompt, used for single-flight coalescing"""
+        return prompt_hash(payload)
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging, or None when hedging is off or not yet calibrated"""
+        if not self.hedge_enabled:
+            return None
+        threshold = self.latency.percentile(self.hedge_percentile)
+        if threshold is None:
+            return None
+        return max(threshold, self.hedge_min_delay)
+    
+    async def _timed_post(self, payload: Dict[str, Any], upstream_http: Histogram) -> httpx.Response:
+        start = time.perf_counter()
         try:
-            # Make the API request
-            response = requests.post(
-                self.api_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload
-            )
-            
-            # Check for errors
-            if response.status_code != 200:
-                raise Exception(f"API returned status code {response.status_code}: {response.text}")
+            response = await self.backend.post(payload)
+        finally:
+            upstream_http.observe(time.perf_counter() - start)
+        if response.status_code == 200:
+            self.latency.record(time.perf_counter() - start)
+        return response
+    
+    def _start_post(self, payload: Dict[str, Any], upstream_http: Histogram) -> asyncio.Task:
+        task = asyncio.ensure_future(self._timed_post(payload, upstream_http))
+        # The losing request of a hedged pair may fail after the winner returned
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+    
+    async def _send(self, payload: Dict[str, Any], deadline: Optional[float], upstream_http: Histogram) -> httpx.Response:
+        """
+        One attempt: a single POST, plus a hedged duplicate if the first one is
+        still running after the hedge delay. The first response wins and the
+        other request is cancelled.
+        """
+        tasks = [self._start_post(payload, upstream_http)]
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None:
+                left = remaining(deadline)
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay if left is None else min(hedge_delay, left))
+                # A hedge is an extra upstream request, so it needs its own rate-limit token
+                if not done and (left is None or left > hedge_delay) and self.admission.bucket.try_take():
+                    self.hedges += 1
+                    tasks.append(self._start_post(payload, upstream_http))
             
-            # Parse the response
-            result = response.json()
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=remaining(deadline), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded("Deadline exceeded waiting for Gemini")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _post_with_retries(
+        self,
+        payload: Dict[str, Any],
+        deadline: Optional[float],
+        upstream_http: Histogram = RECIPE_UPSTREAM_HTTP
+    ) -> httpx.Response:
+        """
+        POST to Gemini with jittered exponential retries on transport errors and
+        RETRYABLE_STATUSES, behind the circuit breaker, within the deadline
+        (each POST is timed into `upstream_http`)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            # Token first, so a half-open probe is not held up by the rate limit
+            await self.admission.bucket.take(deadline)
+            if not self.breaker.allow():
+                raise CircuitOpenError("Gemini circuit breaker is open", self.breaker.retry_after())
+            probe = self.breaker.state == "half_open"
             
-            # Extract the generated text
-            if 'candidates' in result and len(result['candidates']) > 0:
-                generated_text = result['candidates'][0]['content']['parts'][0]['text']
-                
-                # Debug: Print what AI returned
-                print(f"AI Response: {generated_text[:500]}...")  # Print first 500 chars
-                
-                # Clean up the response if it contains markdown code blocks
-                if "```json" in generated_text:
-                    generated_text = generated_text.split("```json")[1].split("```")[0]
-                elif "```" in generated_text:
-                    generated_text = generated_text.split("```")[1].split("```")[0]
-                
-                # Try to find JSON array in the response
-                import re
-                # Look for array pattern
-                array_match = re.search(r'\[\s*\{[\s\S]*\}\s*\]', generated_text)
-                if array_match:
-                    generated_text = array_match.group()
-                
-                # Parse JSON
-                parsed_response = json.loads(generated_text.strip())
-                
-                # Debug: Print parsed response type
-                print(f"Parsed response type: {type(parsed_response)}")
-                
-                # Handle if AI returns array directly instead of object with 'recipes' key
-                if isinstance(parsed_response, list):
-                    parsed_response = {"recipes": parsed_response}
-                
-                return parsed_response
+            # The caller's own deadline (DeadlineExceeded) and cancellation say
+            # nothing about upstream health and leave the breaker as it is
+            try:
+                response = await self._send(payload, deadline, upstream_http)
+            except httpx.HTTPError as e:
+                error = UpstreamError(f"Error making API request: {str(e)}", retryable=True)
             else:
-                raise Exception("No candidates found in API response")
-                
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON. Raw response: {generated_text[:200]}...")
-            # Try to extract JSON if it's embedded in text
-            import re
-            json_match = re.search(r'\[[\s\S]*\]', generated_text)
-            if json_match:
-                try:
-                    parsed = json.loads(json_match.group())
-                    return {"recipes": parsed} if isinstance(parsed, list) else parsed
-                except:
-                    pass
-            raise Exception(f"Failed to parse AI response as JSON: {str(e)}")
-        except requests.exceptions.RequestException as e:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    # Success, or a client error that says nothing about upstream health
+                    self.breaker.record_success()
+                    return response
+                error = UpstreamError(
+                    f"API returned status code {response.status_code}: {response.text}",
+                    status_code=response.status_code,
+                    retryable=True,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                )
+            finally:
+                if probe:
+                    self.breaker.release_probe()
+            
+            self.breaker.record_failure()
+            if attempt >= self.retry_policy.max_attempts or self.breaker.state == "open":
+                raise error
+            delay = max(self.retry_policy.backoff(attempt), error.retry_after or 0.0)
+            left = remaining(deadline)
+            if left is not None and delay >= left:
+                raise error
+            self.retries += 1
+            await asyncio.sleep(delay)
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Retry, hedge, deadline and circuit breaker counters"""
+        p95 = self.latency.percentile(95)
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadlines_exceeded": self.deadlines_exceeded,
+            "latency_p95_ms": round(p95 * 1e3, 1) if p95 is not None else None,
+            "circuit_breaker": self.breaker.stats(),
+            "admission": self.admission.stats(),
+            "backend": self.backend.stats() if self.backend is not None else {"name": "mock"}
+        }
+    
+    @staticmethod
+    def _response_text(response: httpx.Response) -> str:
+        """The model's output text from a Gemini REST response"""
+        # Check for errors
+        if response.status_code != 200:
+            raise Exception(f"API returned status code {response.status_code}: {response.text}")
+        
+        # Parse the response
+        result = response.json()
+        
+        # Extract the generated text
+        if not ('candidates' in result and len(result['candidates']) > 0):
+            raise Exception("No candidates found in API response")
+        
+        return result['candidates'][0]['content']['parts'][0]['text']
+    
+    def _parse_api_response(self, response: httpx.Response) -> Dict[str, Any]:
+        """
+        Extract and parse the recipe JSON from a Gemini REST response
+        """
+        start = time.perf_counter()
+        generated_text = self._response_text(response)
+        
+        # Raw model output is only logged for a sample of responses
+        log_payload(logger, "Model response", generated_text)
+        
+        recipes = None
+        dropped = 0
+        if self.structured_output:
+            # JSON mode returns a bare array; one C-level decode is enough
+            try:
+                decoded = json.loads(generated_text)
+                if isinstance(decoded, list):
+                    recipes = [recipe for recipe in decoded if isinstance(recipe, dict)]
+                    dropped = len(decoded) - len(recipes)
+            except (ValueError, RecursionError):
+                # Malformed or absurdly nested: the extractor below recovers what it can
+                pass
+        if recipes is None:
+            # Single pass over the text; tolerates code fences, surrounding prose
+            # and truncation (every complete recipe object is kept)
+            extractor = IncrementalRecipeExtractor()
+            recipes = extractor.feed(generated_text)
+            # A recipe cut off by the output limit counts as dropped too
+            dropped = extractor.dropped + (1 if extractor.truncated else 0)
+        RECIPES_DROPPED_EXTRACT.inc(dropped)
+        RECIPE_JSON_EXTRACT.observe(time.perf_counter() - start)
+        if not recipes:
+            RECIPE_PARSE_FAILURES.inc()
+            logger.warning("No recipe objects in model response", extra={"response_chars": len(generated_text)})
+            log_payload(logger, "Unparseable model response", generated_text)
+            raise RecipeParseError("Failed to parse AI response as JSON: no complete recipe objects found")
+        
+        if dropped:
+            # Lets callers ask for replacements of the recipes that were cut off
+            return {"recipes": recipes, "incomplete": dropped}
+        return {"recipes": recipes}
+    
+    def _remember(
+        self,
+        cache_key: Optional[str],
+        ingredients: List[str],
+        style: str,
+        preferences: Optional[Dict[str, Any]],
+        detailed_ingredients: Optional[List[Dict[str, Any]]],
+        response: Dict[str, Any]
+    ):
+        """Store a generated response in the exact and similarity caches"""
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+        if self.similarity_cache is not None:
+            self.similarity_cache.set(ingredients, style, preferences, detailed_ingredients, response)
+    
+    async def generate_recipes_from_ingredients_async(
+        self, 
+        ingredients: List[str], 
+        style: str = "default",
+        preferences: Optional[Dict[str, Any]] = None,
+        detailed_ingredients: Optional[List[Dict[str, Any]]] = None,
+        deadline: Optional[float] = None,
+        plan_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate recipes based on ingredients using Gemini AI REST API.
+        Non-blocking: the request goes through the shared async connection pool,
+        so one worker can have many Gemini calls in flight at once.
+        `deadline` is a time.monotonic() value; retries stop and
+        DeadlineExceeded is raised once it passes. CircuitOpenError is raised
+        without calling Gemini while the upstream is marked unhealthy, and
+        AdmissionRejected when the call cannot get an upstream slot in time
+        (`plan_type` sets its queue priority), and RecipeParseError when the
+        model's output holds no complete recipe.
+        """
+        
+        # If in mock mode, return sample data
+        if self.mock_mode:
+            return self._get_mock_recipes(ingredients, style, preferences)
+        
+        # Serve identical requests from the cache
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(ingredients, style, preferences, detailed_ingredients)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if self.similarity_cache is not None:
+            similar = self.similarity_cache.get(ingredients, style, preferences, detailed_ingredients)
+            if similar is not None:
+                return similar
+        
+        payload = self._build_payload(ingredients, style, preferences, detailed_ingredients)
+        
+        async def call_upstream() -> Dict[str, Any]:
+            try:
+                queued_at = time.perf_counter()
+                async with self.admission.slot(plan_type, deadline):
+                    RECIPE_ADMISSION_WAIT.observe(time.perf_counter() - queued_at)
+                    response = await self._post_with_retries(payload, deadline)
+                parsed_response = self._parse_api_response(response)
+            except (CircuitOpenError, DeadlineExceeded, AdmissionRejected, RecipeParseError):
+                raise
+            except Exception as e:
+                raise Exception(f"Error calling Gemini API: {str(e)}")
+            self._remember(cache_key, ingredients, style, preferences, detailed_ingredients, parsed_response)
+            return parsed_response
+        
+        # Concurrent callers with the same rendered prompt share one upstream
+        # call (bounded by the first caller's deadline); each caller still
+        # stops waiting at its own deadline
+        shared = self.singleflight.do(self._prompt_key(payload), call_upstream)
+        try:
+            if deadline is None:
+                return await shared
+            return await asyncio.wait_for(shared, timeout=max(0.0, remaining(deadline)))
+        except (DeadlineExceeded, asyncio.TimeoutError):
+            self.deadlines_exceeded += 1
+            raise DeadlineExceeded("Deadline exceeded waiting for Gemini")
+    
+    async def generate_replacement_recipes_async(
+        self,
+        ingredients: List[str],
+        count: int,
+        style: str = "default",
+        preferences: Optional[Dict[str, Any]] = None,
+        detailed_ingredients: Optional[List[Dict[str, Any]]] = None,
+        avoid: Optional[List[str]] = None,
+        exclude_names: Optional[List[str]] = None,
+        deadline: Optional[float] = None,
+        plan_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate `count` recipes to stand in for recipes dropped from an
+        earlier answer, avoiding `avoid` and the recipes in `exclude_names`.
+        Never served from or stored in the caches, since the answer depends on
+        what was dropped; raises like generate_recipes_from_ingredients_async.
+        """
+        if self.mock_mode:
+            return self._get_mock_recipes(ingredients, style, preferences)
+        
+        payload = self._build_payload(
+            ingredients, style, preferences, detailed_ingredients,
+            extra_instructions=get_replacement_instructions(count, avoid or [], exclude_names or [])
+        )
+        try:
+            queued_at = time.perf_counter()
+            async with self.admission.slot(plan_type, deadline):
+                RECIPE_ADMISSION_WAIT.observe(time.perf_counter() - queued_at)
+                response = await self._post_with_retries(payload, deadline)
+            return self._parse_api_response(response)
+        except (CircuitOpenError, DeadlineExceeded, AdmissionRejected, RecipeParseError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error calling Gemini API: {str(e)}")
+    
+    def remember_recipes(
+        self,
+        ingredients: List[str],
+        style: str,
+        preferences: Optional[Dict[str, Any]],
+        detailed_ingredients: Optional[List[Dict[str, Any]]],
+        response: Dict[str, Any]
+    ):
+        """Replace the cached answer for a request (e.g. after some of its recipes were regenerated)"""
+        if self.mock_mode:
+            return
+        cache_key = make_cache_key(ingredients, style, preferences, detailed_ingredients) if self.cache is not None else None
+        self._remember(cache_key, ingredients, style, preferences, detailed_ingredients, response)
+    
+    async def generate_json_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_schema: Dict[str, Any],
+        json_format: str,
+        deadline: Optional[float] = None,
+        plan_type: Optional[str] = None,
+        admission_wait: Histogram = RECIPE_ADMISSION_WAIT,
+        upstream_http: Histogram = RECIPE_UPSTREAM_HTTP
+    ) -> Any:
+        """
+        One uncached Gemini call for a JSON answer shaped by `response_schema`
+        (other than recipe lists, e.g. plan days). Raises like
+        generate_recipes_from_ingredients_async; RecipeParseError when the
+        output is not JSON. Queueing and upstream time are recorded under the
+        caller's stage histograms.
+        """
+        if self.mock_mode:
+            raise Exception("Gemini API key is not configured")
+        
+        payload = self._payload(system_prompt, user_prompt, response_schema, json_format)
+        try:
+            queued_at = time.perf_counter()
+            async with self.admission.slot(plan_type, deadline):
+                admission_wait.observe(time.perf_counter() - queued_at)
+                response = await self._post_with_retries(payload, deadline, upstream_http)
+            text = self._response_text(response)
+        except (CircuitOpenError, DeadlineExceeded, AdmissionRejected):
+            raise
+        except Exception as e:
+            raise Exception(f"Error calling Gemini API: {str(e)}")
+        
+        try:
+            return json.loads(text)
+        except (ValueError, RecursionError):
+            pass
+        try:
+            # Free-text mode: the JSON may sit inside a code fence or prose
+            return extract_json_value(text)
+        except ValueError:
+            pass
+        RECIPE_PARSE_FAILURES.inc()
+        log_payload(logger, "Unparseable model response", text)
+        raise RecipeParseError("Failed to parse AI response as JSON")
+    
+    def generate_recipes_from_ingredients(
+        self, 
+        ingredients: List[str], 
+        style: str = "default",
+        preferences: Optional[Dict[str, Any]] = None,
+        detailed_ingredients: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate recipes based on ingredients using Gemini AI REST API.
+
+        Deprecated: one blocking call that bypasses retries, the circuit
+        breaker, admission control and single-flight. Await
+        generate_recipes_from_ingredients_async instead.
+        """
+        warnings.warn(
+            "generate_recipes_from_ingredients is deprecated; await generate_recipes_from_ingredients_async",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        
+        # If in mock mode, return sample data
+        if self.mock_mode:
+            return self._get_mock_recipes(ingredients, style, preferences)
+        
+        # Serve identical requests from the cache
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(ingredients, style, preferences, detailed_ingredients)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if self.similarity_cache is not None:
+            similar = self.similarity_cache.get(ingredients, style, preferences, detailed_ingredients)
+            if similar is not None:
+                return similar
+        
+        payload = self._build_payload(ingredients, style, preferences, detailed_ingredients)
+        
+        try:
+            response = self.backend.post_sync(payload)
+            parsed_response = self._parse_api_response(response)
+            self._remember(cache_key, ingredients, style, preferences, detailed_ingredients, parsed_response)
+            return parsed_response
+        except httpx.HTTPError as e:
             raise Exception(f"Error making API request: {str(e)}")
         except Exception as e:
             raise Exception(f"Error calling Gemini API: {str(e)}")
     
+    async def stream_recipes_from_ingredients(
+        self,
+        ingredients: List[str],
+        style: str = "default",
+        preferences: Optional[Dict[str, Any]] = None,
+        detailed_ingredients: Optional[List[Dict[str, Any]]] = None,
+        deadline: Optional[float] = None,
+        plan_type: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream raw recipe dictionaries from Gemini's streamGenerateContent.
+        Each recipe is yielded as soon as its closing brace arrives; the
+        complete set is cached like a non-streaming response. Opening the
+        stream is retried like a regular call; once recipes have been yielded
+        a failure ends the stream instead.
+        """
+        
+        # If in mock mode, return sample data
+        if self.mock_mode:
+            for recipe_data in self._get_mock_recipes(ingredients, style, preferences)["recipes"]:
+                yield recipe_data
+            return
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(ingredients, style, preferences, detailed_ingredients)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                for recipe_data in cached.get("recipes", []):
+                    yield recipe_data
+                return
+        if self.similarity_cache is not None:
+            similar = self.similarity_cache.get(ingredients, style, preferences, detailed_ingredients)
+            if similar is not None:
+                for recipe_data in similar["recipes"]:
+                    yield recipe_data
+                return
+        
+        payload = self._build_payload(ingredients, style, preferences, detailed_ingredients)
+        extractor = IncrementalRecipeExtractor()
+        streamed = []
+        
+        # The upstream slot is held for the whole stream
+        async with self.admission.slot(plan_type, deadline):
+            attempt = 0
+            while True:
+                attempt += 1
+                left = remaining(deadline)
+                if left is not None and left <= 0:
+                    self.deadlines_exceeded += 1
+                    raise DeadlineExceeded("Deadline exceeded waiting for Gemini")
+                await self.admission.bucket.take(deadline)
+                if not self.breaker.allow():
+                    raise CircuitOpenError("Gemini circuit breaker is open", self.breaker.retry_after())
+                probe = self.breaker.state == "half_open"
+                
+                error = None
+                try:
+                    async with self.backend.stream(payload) as response:
+                        if response.status_code != 200:
+                            body = await response.aread()
+                            error = UpstreamError(
+                                f"API returned status code {response.status_code}: {body.decode(errors='replace')}",
+                                status_code=response.status_code,
+                                retryable=response.status_code in RETRYABLE_STATUSES,
+                                retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                            )
+                        else:
+                            self.breaker.record_success()
+                            async for line in response.aiter_lines():
+                                left = remaining(deadline)
+                                if left is not None and left <= 0:
+                                    self.deadlines_exceeded += 1
+                                    raise DeadlineExceeded("Deadline exceeded while streaming from Gemini")
+                                # SSE frames look like "data: {...GenerateContentResponse...}"
+                                if not line.startswith("data:"):
+                                    continue
+                                event = json.loads(line[5:])
+                                for candidate in event.get("candidates", [])[:1]:
+                                    for part in candidate.get("content", {}).get("parts", []):
+                                        for recipe_data in extractor.feed(part.get("text", "")):
+                                            streamed.append(recipe_data)
+                                            yield recipe_data
+                except httpx.HTTPError as e:
+                    if streamed:
+                        raise Exception(f"Error making API request: {str(e)}")
+                    error = UpstreamError(f"Error making API request: {str(e)}", retryable=True)
+                finally:
+                    # Client disconnects and caller deadlines leave the breaker as it is
+                    if probe:
+                        self.breaker.release_probe()
+                
+                if error is None:
+                    break
+                if not error.retryable:
+                    self.breaker.record_success()
+                    raise error
+                self.breaker.record_failure()
+                if attempt >= self.retry_policy.max_attempts or self.breaker.state == "open":
+                    raise error
+                delay = max(self.retry_policy.backoff(attempt), error.retry_after or 0.0)
+                left = remaining(deadline)
+                if left is not None and delay >= left:
+                    raise error
+                self.retries += 1
+                await asyncio.sleep(delay)
+        
+        RECIPES_DROPPED_EXTRACT.inc(extractor.dropped)
+        if streamed:
+            self._remember(cache_key, ingredients, style, preferences, detailed_ingredients, {"recipes": streamed})
+    
     def _get_mock_recipes(self, ingredients: List[str], style: str = "default", preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Return mock recipe data for testing when API key is not available"""
+        """Return mock recipe data for testing when API key is not available (same shape as model output)"""
         mock_recipes = [
             {
+                "id": "mock-1",
                 "name": f"Delicious {style.title()} Recipe",
                 "description": f"A tasty recipe using {', '.join(ingredients[:3])}",
-                "ingredients": [
-                    {"name": ing, "quantity": "1", "unit": "piece"} for ing in ingredients[:5]
-                ],
+                "ingredients": [f"1 piece {ing}" for ing in ingredients[:5]],
                 "instructions": [
                     "Wash and prepare all ingredients",
                     "Heat oil in a pan",
                     "Add ingredients and cook for 10 minutes",
                     "Season to taste and serve"
                 ],
-                "cooking_time": 20,
-                "difficulty": "Easy",
+                "prep_time": 5,
+                "cook_time": 15,
                 "servings": 2,
-                "nutrition": {
-                    "calories": 300,
-                    "protein": "15g",
-                    "carbs": "25g",
-                    "fat": "12g"
-                }
+                "calories_per_serving": 300,
+                "tags": ["easy", style]
             },
             {
+                "id": "mock-2",
                 "name": f"Quick {style.title()} Meal",
                 "description": f"Fast and healthy meal with {', '.join(ingredients[:2])}",
-                "ingredients": [
-                    {"name": ing, "quantity": "2", "unit": "pieces"} for ing in ingredients[:3]
-                ],
+                "ingredients": [f"2 pieces {ing}" for ing in ingredients[:3]],
                 "instructions": [
                     "Prepare ingredients",
                     "Cook in a skillet",
                     "Add seasoning",
                     "Serve hot"
                 ],
-                "cooking_time": 15,
-                "difficulty": "Easy",
+                "prep_time": 5,
+                "cook_time": 10,
                 "servings": 1,
-                "nutrition": {
-                    "calories": 250,
-                    "protein": "12g",
-                    "carbs": "20g",
-                    "fat": "10g"
-                }
+                "calories_per_serving": 250,
+                "tags": ["quick", style]
             }
         ]
         
         return {"recipes": mock_recipes}
 
+    def collect_metrics(self):
+        """Scrape-time metric families from the counters the service already keeps"""
+        families = []
+        if self.cache is not None:
+            cache = self.cache.stats()
+            families.append(("smartmeal_recipe_cache_lookups_total", "counter", "Recipe cache lookups by result", [
+                ({"result": "memory_hit"}, cache["memory_hits"]),
+                ({"result": "disk_hit"}, cache["disk_hits"]),
+                ({"result": "miss"}, cache["misses"])
+            ]))
+        if self.similarity_cache is not None:
+            similarity = self.similarity_cache.stats()
+            families.append(("smartmeal_similarity_cache_lookups_total", "counter", "Similarity cache lookups (after an exact-cache miss) by result", [
+                ({"result": "hit"}, similarity["hits"]),
+                ({"result": "miss"}, similarity["misses"]),
+                ({"result": "rejected"}, similarity["rejected"])
+            ]))
+        singleflight = self.singleflight.stats()
+        families.append(("smartmeal_upstream_calls_total", "counter", "Gemini calls requested, by whether they ran or joined an identical call in flight", [
+            ({"outcome": "executed"}, singleflight["executions"]),
+            ({"outcome": "coalesced"}, singleflight["coalesced"])
+        ]))
+        families.append(("smartmeal_upstream_retries_total", "counter", "Gemini requests retried", [({}, self.retries)]))
+        families.append(("smartmeal_upstream_hedges_total", "counter", "Hedged Gemini requests sent", [({}, self.hedges)]))
+        families.append(("smartmeal_upstream_deadlines_exceeded_total", "counter", "Gemini calls that ran out of time", [({}, self.deadlines_exceeded)]))
+        families.append(("smartmeal_circuit_breaker_open", "gauge", "1 while the Gemini circuit breaker is open", [
+            ({}, 1 if self.breaker.state == "open" else 0)
+        ]))
+        admission = self.admission.stats()
+        families.append(("smartmeal_admission_in_flight", "gauge", "Gemini calls holding an admission slot", [({}, admission["in_flight"])]))
+        families.append(("smartmeal_admission_queued", "gauge", "Gemini calls waiting for a slot", [
+            ({"class": name}, values["queued"]) for name, values in admission["classes"].items()
+        ]))
+        families.append(("smartmeal_admission_rejected_total", "counter", "Gemini calls rejected by admission control", [
+            ({"class": name}, values["rejected"]) for name, values in admission["classes"].items()
+        ]))
+        return families
+
 # Create a singleton instance
 gemini_service = GeminiService()
+metrics.register_collector(gemini_service.collect_metrics)
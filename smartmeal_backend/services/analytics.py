@@ -0,0 +1,147 @@
+"""
+Plan analytics computed from recipe nutrition with NumPy.
+
+One kernel serves both a single plan (the AnalyticsData in every plan
+response) and bulk scoring of thousands of candidate plans (optimizer and
+offline reporting): plans are packed into a (P, 7, 3, N) nutrition array and
+a (P, 21, V) ingredient/tag feature array and reduced along those axes.
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from models.schemas import WeeklyPlan, AnalyticsData, Recipe
+from .catalog import RecipeCatalog, NUTRIENTS, recipe_features
+from .plan_optimizer import DAYS, NUTRIENT_WEIGHTS, goal_targets, solve_weekly_plan
+
+# Macro split (share of calories from protein, carbs, fat) assumed for recipes
+# without known macros
+DEFAULT_MACRO_SPLIT = (0.20, 0.50, 0.30)
+CALORIES_PER_GRAM = (4.0, 4.0, 9.0)
+
+# Plans scored per block in bulk mode, bounding the (block, 21, 21) temporaries
+BULK_BLOCK = 1024
+
+def analytics_kernel(
+    week: np.ndarray,
+    features: np.ndarray,
+    targets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce packed plans to daily totals, goal compliance and variety.
+
+    Args:
+        week: (P, 7, 3, N) nutrition per day, meal slot and nutrient
+        features: (P, 21, V) 0/1 ingredient and tag indicators per meal
+        targets: (N,) daily targets in NUTRIENTS order
+
+    Returns:
+        daily (P, 7, N) totals, compliance (P,) and variety (P,), both 0-100.
+        Compliance is the weighted mean over days and nutrients of
+        1 - |actual - target| / target (floored at 0). Variety is
+        100 * (1 - mean pairwise Jaccard similarity) of the 21 meals, so
+        repeated meals and shared ingredients or tags lower it.
+    """
+    daily = week.sum(axis=2)
+    closeness = np.clip(1.0 - np.abs(daily - targets) / targets, 0.0, None)
+    compliance = 100.0 * (closeness @ NUTRIENT_WEIGHTS).mean(axis=1) / NUTRIENT_WEIGHTS.sum()
+
+    meals = features.shape[1]
+    upper = np.triu_indices(meals, k=1)
+    variety = np.empty(features.shape[0], dtype=np.float32)
+    for start in range(0, features.shape[0], BULK_BLOCK):
+        block = features[start:start + BULK_BLOCK]
+        intersection = block @ block.transpose(0, 2, 1)
+        sizes = np.diagonal(intersection, axis1=1, axis2=2)
+        union = sizes[:, :, None] + sizes[:, None, :] - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+        variety[start:start + BULK_BLOCK] = 100.0 * (1.0 - jaccard[:, upper[0], upper[1]].mean(axis=1))
+
+    return daily, compliance, variety
+
+def _feature_array(feature_sets: List[List[frozenset]]) -> np.ndarray:
+    """(P, 21, V) indicator array over the features that actually occur"""
+    vocabulary: Dict[str, int] = {}
+    for plan in feature_sets:
+        for meal in plan:
+            for feature in meal:
+                vocabulary.setdefault(feature, len(vocabulary))
+    array = np.zeros((len(feature_sets), len(feature_sets[0]) if feature_sets else 0, max(len(vocabulary), 1)), dtype=np.float32)
+    for p, plan in enumerate(feature_sets):
+        for m, meal in enumerate(plan):
+            array[p, m, [vocabulary[feature] for feature in meal]] = 1.0
+    return array
+
+def score_plans(catalog: RecipeCatalog, selections: np.ndarray, goal: str) -> Dict[str, np.ndarray]:
+    """
+    Bulk mode: score many candidate plans in one call
+
+    Args:
+        catalog: Catalog the selections index into
+        selections: (P, 7, 3) catalog indices
+        goal: Goal whose targets compliance is measured against
+
+    Returns:
+        {"daily": (P, 7, N), "compliance": (P,), "variety": (P,)}
+    """
+    selections = np.asarray(selections)
+    week = catalog.nutrition[selections]
+    # Feature rows are built once per distinct recipe, then gathered per plan
+    unique, inverse = np.unique(selections.reshape(len(selections), -1), return_inverse=True)
+    local = _feature_array([[catalog.features(int(index)) for index in unique]])[0]
+    features = local[inverse.reshape(len(selections), -1)]
+    daily, compliance, variety = analytics_kernel(week, features, goal_targets(goal))
+    return {"daily": daily, "compliance": compliance, "variety": variety}
+
+def recipe_nutrition(catalog: RecipeCatalog, recipe: Recipe) -> np.ndarray:
+    """Calories, protein, carbs and fat per serving (macros estimated for recipes outside the catalog)"""
+    index = catalog.index_of(recipe.id)
+    if index is not None and catalog.recipes[index].name == recipe.name:
+        return catalog.nutrition[index]
+    # Unknown recipe (edited plan or model-generated): estimate macros from calories
+    calories = float(recipe.calories_per_serving)
+    macros = [calories * share / per_gram for share, per_gram in zip(DEFAULT_MACRO_SPLIT, CALORIES_PER_GRAM)]
+    return np.array([calories, *macros], dtype=np.float32)
+
+def compute_analytics(catalog: RecipeCatalog, plan: WeeklyPlan, goal: str) -> AnalyticsData:
+    """AnalyticsData for one weekly plan, from its recipes' nutrition"""
+    days = [getattr(plan, day) for day in DAYS]
+    meals = [recipe for day in days for recipe in (day.breakfast, day.lunch, day.dinner)]
+
+    week = np.stack([recipe_nutrition(catalog, recipe) for recipe in meals]).reshape(1, len(DAYS), 3, len(NUTRIENTS))
+    features = _feature_array([[recipe_features(recipe) for recipe in meals]])
+    daily, compliance, variety = analytics_kernel(week, features, goal_targets(goal))
+
+    weekly = daily[0].sum(axis=0)
+    return AnalyticsData(
+        weekly_calories=int(round(float(weekly[0]))),
+        weekly_protein=round(float(weekly[1]), 1),
+        weekly_carbs=round(float(weekly[2]), 1),
+        weekly_fat=round(float(weekly[3]), 1),
+        goal_compliance=round(float(compliance[0]), 1),
+        variety_score=round(float(variety[0]), 1),
+        daily_breakdown={
+            day: {nutrient: round(float(value), 1) for nutrient, value in zip(NUTRIENTS, daily[0, d])}
+            for d, day in enumerate(DAYS)
+        }
+    )
+
+def select_best_plan(
+    catalog: RecipeCatalog,
+    goal: str,
+    candidates: int = 16,
+    seed: int = 0,
+    variety_weight: float = 0.3,
+    allowed: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Solve several differently-seeded candidate plans, score them in one bulk
+    call and return the (7, 3) selection with the best
+    compliance + variety_weight * variety (allowed as in solve_weekly_plan)
+    """
+    selections = np.stack([
+        # A larger jitter than the default spreads the candidates out
+        solve_weekly_plan(catalog, goal, seed=seed * candidates + offset, jitter=0.02, allowed=allowed)
+        for offset in range(candidates)
+    ])
+    scores = score_plans(catalog, selections, goal)
+    best = int(np.argmax(scores["compliance"] + variety_weight * scores["variety"]))
+    return selections[best]
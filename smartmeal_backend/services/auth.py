@@ -0,0 +1,45 @@
+"""
+Caller identity for admission priority
+
+Until the API has real authentication, AUTH_TOKENS maps bearer tokens issued
+by the operator to user IDs ("token:user_id,token:user_id"). Only a caller
+identified this way gets its stored plan type's priority for Gemini calls;
+user_id fields and X-User-ID are set by the client, so they only select
+preferences, and every other caller is treated as free.
+"""
+import os
+import hmac
+from typing import Dict, Optional
+from .profile_store import profile_store
+
+def parse_auth_tokens(value: str) -> Dict[str, str]:
+    """token -> user ID from "token:user_id,..." (entries without both are skipped)"""
+    tokens = {}
+    for entry in value.split(","):
+        token, _, user_id = entry.strip().partition(":")
+        if token and user_id:
+            tokens[token] = user_id
+    return tokens
+
+AUTH_TOKENS = parse_auth_tokens(os.getenv("AUTH_TOKENS", ""))
+
+def authenticated_user(authorization: Optional[str]) -> Optional[str]:
+    """The user ID an Authorization: Bearer header's token was issued to, or None"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    token = token.strip().encode("utf-8")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    for known, user_id in AUTH_TOKENS.items():
+        if hmac.compare_digest(known.encode("utf-8"), token):
+            return user_id
+    return None
+
+def caller_plan_type(authorization: Optional[str]) -> Optional[str]:
+    """
+    The plan type ("premium" or "free") that sets the caller's priority for
+    Gemini calls: the stored profile's of the authenticated user, else None
+    (treated as free)
+    """
+    return profile_store.plan_type(authenticated_user(authorization))
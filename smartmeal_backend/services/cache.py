@@ -0,0 +1,195 @@
+"""
+Two-tier result cache for AI recipe generation
+(in-memory LRU in front of a persistent SQLite store)
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+def make_cache_key(
+    ingredients: List[str],
+    style: str = "default",
+    preferences: Optional[Dict[str, Any]] = None,
+    detailed_ingredients: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    """
+    Build a canonical hash for a recipe generation request.
+    Ingredient names are normalized (case, whitespace, order, duplicates) so
+    equivalent pantries share one entry.
+    """
+    normalized_ingredients = sorted({ing.strip().lower() for ing in ingredients if ing and ing.strip()})
+    normalized_detailed = None
+    if detailed_ingredients:
+        normalized_detailed = sorted(
+            (
+                {**ing, 'name': str(ing.get('name', '')).strip().lower()}
+                for ing in detailed_ingredients
+            ),
+            key=lambda ing: json.dumps(ing, sort_keys=True, default=str)
+        )
+
+    canonical = json.dumps(
+        {
+            "ingredients": normalized_ingredients,
+            "style": style,
+            "preferences": preferences or {},
+            "detailed_ingredients": normalized_detailed
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class RecipeCache:
+    """
+    Bounded LRU memory tier backed by an on-disk SQLite tier.
+    Both tiers honour the same TTL; the disk tier is trimmed to max_disk_entries
+    (least recently used first) so it survives restarts without growing forever.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_memory_entries: int = 1024,
+        db_path: Optional[str] = None,
+        ttl_seconds: float = 86400,
+        max_disk_entries: int = 50000
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS recipe_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_recipe_cache_accessed ON recipe_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM recipe_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] > now:
+                        value = json.loads(row[0])
+                        self._db.execute("UPDATE recipe_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._remember(key, row[1], value)
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM recipe_cache WHERE key = ?", (key,))
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store value in both tiers"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.sets += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO recipe_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now)
+                )
+                # Trim the disk tier periodically rather than on every write
+                if self.sets % 100 == 0:
+                    self._trim_disk(now)
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _trim_disk(self, now: float):
+        self._db.execute("DELETE FROM recipe_cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            """DELETE FROM recipe_cache WHERE key IN (
+                SELECT key FROM recipe_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_disk_entries,)
+        )
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM recipe_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        disk_entries = 0
+        if self._db is not None:
+            with self._lock:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM recipe_cache").fetchone()[0]
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "sets": self.sets,
+            "memory_evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries
+        }
+
+def create_recipe_cache_from_env() -> Optional[RecipeCache]:
+    """Build the recipe cache from RECIPE_CACHE_* settings (None when disabled)"""
+    if os.getenv("RECIPE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    db_path = os.getenv("RECIPE_CACHE_DB_PATH", os.path.join(".cache", "recipe_cache.sqlite3"))
+    return RecipeCache(
+        max_memory_entries=int(os.getenv("RECIPE_CACHE_MEMORY_ENTRIES", "1024")),
+        db_path=db_path or None,
+        ttl_seconds=float(os.getenv("RECIPE_CACHE_TTL_SECONDS", "86400")),
+        max_disk_entries=int(os.getenv("RECIPE_CACHE_MAX_DISK_ENTRIES", "50000"))
+    )
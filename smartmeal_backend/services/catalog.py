@@ -0,0 +1,325 @@
+"""
+Recipe catalog: recipes with per-serving nutrition, packed into NumPy arrays
+so planners can score the whole catalog in vectorized passes, plus an
+inverted ingredient index for pantry-match queries
+"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional, Iterable
+from models.schemas import Recipe
+from .ingredients import canonical_ingredient, PANTRY_STAPLES
+
+MEAL_SLOTS = ["breakfast", "lunch", "dinner"]
+
+# Column order of RecipeCatalog.nutrition
+NUTRIENTS = ["calories", "protein", "carbs", "fat"]
+
+# Ingredients that make a recipe unsuitable for vegetarians
+MEAT_KEYWORDS = (
+    "chicken", "beef", "pork", "lamb", "turkey", "bacon", "ham", "sausage",
+    "salmon", "tuna", "fish", "shrimp", "prawn", "crab", "anchovy", "steak"
+)
+
+class RecipeCatalog:
+    """
+    Append-only recipe store. Python-side Recipe objects are kept for building
+    responses; nutrition, slot and diet flags are mirrored into NumPy arrays
+    (rebuilt lazily after additions) for the planners. Canonical ingredient
+    names map to sorted int32 posting lists of recipe indices.
+    """
+
+    def __init__(self):
+        self.recipes: List[Recipe] = []
+        self._slots: List[int] = []
+        self._nutrition: List[Tuple[float, float, float, float]] = []
+        self._ingredient_counts: List[int] = []
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._by_id: Dict[str, int] = {}
+        self._posting_lists: Dict[str, List[int]] = {}
+        self._postings: Optional[Dict[str, np.ndarray]] = None
+        self._features: List[frozenset] = []
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def add_recipes(self, recipes: List[Recipe], slot: str, macros: Dict[str, Tuple[float, float, float]]):
+        """
+        Add recipes for one meal slot
+
+        Args:
+            recipes: Recipes to add
+            slot: One of MEAL_SLOTS
+            macros: Recipe id -> (protein, carbs, fat) grams per serving
+        """
+        slot_index = MEAL_SLOTS.index(slot)
+        for recipe in recipes:
+            protein, carbs, fat = macros.get(recipe.id, (0.0, 0.0, 0.0))
+            recipe_index = len(self.recipes)
+            self._by_id[recipe.id] = recipe_index
+            self.recipes.append(recipe)
+            self._slots.append(slot_index)
+            self._nutrition.append((recipe.calories_per_serving, protein, carbs, fat))
+            terms = {canonical_ingredient(ingredient) for ingredient in recipe.ingredients} - {""}
+            self._ingredient_counts.append(len(terms))
+            self._features.append(recipe_features(recipe, terms))
+            for term in terms:
+                self._posting_lists.setdefault(term, []).append(recipe_index)
+        self._arrays = None
+        self._postings = None
+
+    def index_of(self, recipe_id: str) -> Optional[int]:
+        return self._by_id.get(recipe_id)
+
+    def _build_arrays(self) -> Dict[str, np.ndarray]:
+        if self._arrays is None:
+            self._arrays = {
+                "slot": np.asarray(self._slots, dtype=np.int8),
+                "nutrition": np.asarray(self._nutrition, dtype=np.float32).reshape(-1, len(NUTRIENTS)),
+                "vegetarian": np.asarray([_is_vegetarian(recipe) for recipe in self.recipes], dtype=bool),
+                "ingredient_count": np.asarray(self._ingredient_counts, dtype=np.int32)
+            }
+        return self._arrays
+
+    @property
+    def slot(self) -> np.ndarray:
+        """(N,) meal slot index per recipe"""
+        return self._build_arrays()["slot"]
+
+    @property
+    def nutrition(self) -> np.ndarray:
+        """(N, 4) calories, protein, carbs, fat per serving"""
+        return self._build_arrays()["nutrition"]
+
+    @property
+    def vegetarian(self) -> np.ndarray:
+        """(N,) True where the recipe has no meat or fish"""
+        return self._build_arrays()["vegetarian"]
+
+    @property
+    def ingredient_count(self) -> np.ndarray:
+        """(N,) number of distinct canonical ingredients per recipe"""
+        return self._build_arrays()["ingredient_count"]
+
+    def features(self, index: int) -> frozenset:
+        """Canonical ingredients and tags of a recipe (used for variety scoring)"""
+        return self._features[index]
+
+    def _build_postings(self) -> Dict[str, np.ndarray]:
+        # Indices are appended in increasing order, so each list is already sorted
+        if self._postings is None:
+            self._postings = {
+                term: np.asarray(indices, dtype=np.int32)
+                for term, indices in self._posting_lists.items()
+            }
+        return self._postings
+
+    def recipes_with(self, ingredient: str) -> np.ndarray:
+        """Sorted recipe indices that use the ingredient"""
+        return self._build_postings().get(canonical_ingredient(ingredient), np.empty(0, dtype=np.int32))
+
+    def match_pantry(
+        self,
+        items: Iterable[str],
+        min_coverage: float = 0.0,
+        limit: int = 10,
+        slot: Optional[str] = None,
+        vegetarian_only: bool = False,
+        avoid: Iterable[str] = ()
+    ) -> List[Tuple[int, float]]:
+        """
+        Recipes coverable by a pantry, ranked by the fraction of their
+        ingredients on hand (pantry staples such as salt count as on hand).
+
+        Only the posting lists of the pantry's ingredients are touched, so the
+        cost depends on how many recipes use those ingredients, not on the
+        catalog size.
+
+        Args:
+            items: Pantry ingredient names (any spelling; canonicalized here)
+            min_coverage: Minimum fraction of a recipe's ingredients on hand
+            limit: Maximum number of results
+            slot: Restrict to one of MEAL_SLOTS
+            vegetarian_only: Drop recipes with meat or fish
+            avoid: Words that must not appear in any ingredient (allergies, dislikes)
+
+        Returns:
+            (catalog index, coverage) pairs, best coverage first
+        """
+        postings = self._build_postings()
+        pantry = {canonical_ingredient(item) for item in items} | PANTRY_STAPLES
+        lists = [postings[term] for term in pantry if term in postings]
+        if not lists:
+            return []
+
+        indices, hits = np.unique(np.concatenate(lists), return_counts=True)
+        coverage = hits / np.maximum(self.ingredient_count[indices], 1)
+        keep = coverage >= min_coverage
+        if slot is not None:
+            keep &= self.slot[indices] == MEAL_SLOTS.index(slot)
+        if vegetarian_only:
+            keep &= self.vegetarian[indices]
+        indices, coverage = indices[keep], coverage[keep]
+
+        # Stable sort keeps catalog order among equal coverage
+        order = np.argsort(-coverage, kind="stable")
+        avoid_words = [word.strip().lower() for word in avoid if word and word.strip()]
+        matches = []
+        for position in order:
+            recipe_index = int(indices[position])
+            if avoid_words and any(
+                word in ingredient.lower()
+                for ingredient in self.recipes[recipe_index].ingredients
+                for word in avoid_words
+            ):
+                continue
+            matches.append((recipe_index, float(coverage[position])))
+            if len(matches) >= limit:
+                break
+        return matches
+
+def recipe_features(recipe: Recipe, terms: Optional[Iterable[str]] = None) -> frozenset:
+    """Canonical ingredient names plus "#tag" entries for a recipe"""
+    if terms is None:
+        terms = {canonical_ingredient(ingredient) for ingredient in recipe.ingredients} - {""}
+    return frozenset(terms) | frozenset(f"#{tag.lower()}" for tag in recipe.tags)
+
+def _is_vegetarian(recipe: Recipe) -> bool:
+    if "vegetarian" in recipe.tags or "vegan" in recipe.tags:
+        return True
+    return not any(keyword in ingredient.lower() for ingredient in recipe.ingredients for keyword in MEAT_KEYWORDS)
+
+# Built-in recipe data for meal plans
+FAKE_BREAKFAST_RECIPES = [
+    Recipe(
+        id="bf1",
+        name="Protein Smoothie Bowl",
+        description="Nutritious smoothie bowl with berries and granola",
+        ingredients=["banana", "berries", "protein powder", "almond milk", "granola"],
+        instructions=["Blend banana, berries, and protein powder", "Top with granola"],
+        prep_time=5,
+        cook_time=0,
+        servings=1,
+        calories_per_serving=320,
+        tags=["breakfast", "protein", "smoothie"]
+    ),
+    Recipe(
+        id="bf2",
+        name="Avocado Toast",
+        description="Simple and healthy avocado toast",
+        ingredients=["whole grain bread", "avocado", "eggs", "salt", "pepper"],
+        instructions=["Toast bread", "Mash avocado", "Top with poached egg"],
+        prep_time=10,
+        cook_time=5,
+        servings=1,
+        calories_per_serving=280,
+        tags=["breakfast", "healthy", "quick"]
+    ),
+    Recipe(
+        id="bf3",
+        name="Greek Yogurt Parfait",
+        description="High-protein yogurt with nuts and honey",
+        ingredients=["greek yogurt", "honey", "almonds", "berries", "chia seeds"],
+        instructions=["Layer yogurt with berries", "Top with nuts and honey"],
+        prep_time=5,
+        cook_time=0,
+        servings=1,
+        calories_per_serving=350,
+        tags=["breakfast", "protein", "quick"]
+    )
+]
+
+FAKE_LUNCH_RECIPES = [
+    Recipe(
+        id="l1",
+        name="Quinoa Salad",
+        description="Fresh quinoa salad with vegetables",
+        ingredients=["quinoa", "cucumber", "tomatoes", "olive oil", "lemon"],
+        instructions=["Cook quinoa", "Chop vegetables", "Mix with dressing"],
+        prep_time=15,
+        cook_time=15,
+        servings=2,
+        calories_per_serving=350,
+        tags=["lunch", "vegetarian", "healthy"]
+    ),
+    Recipe(
+        id="l2",
+        name="Grilled Chicken Wrap",
+        description="Protein-packed chicken wrap",
+        ingredients=["chicken breast", "tortilla", "lettuce", "tomato", "sauce"],
+        instructions=["Grill chicken", "Assemble wrap", "Serve"],
+        prep_time=10,
+        cook_time=15,
+        servings=1,
+        calories_per_serving=420,
+        tags=["lunch", "protein", "wrap"]
+    ),
+    Recipe(
+        id="l3",
+        name="Tuna Salad",
+        description="Light and protein-rich tuna salad",
+        ingredients=["tuna", "celery", "onion", "mayo", "mustard"],
+        instructions=["Mix tuna with vegetables", "Add mayo and mustard"],
+        prep_time=10,
+        cook_time=0,
+        servings=2,
+        calories_per_serving=380,
+        tags=["lunch", "protein", "quick"]
+    )
+]
+
+FAKE_DINNER_RECIPES = [
+    Recipe(
+        id="d1",
+        name="Salmon with Vegetables",
+        description="Baked salmon with roasted vegetables",
+        ingredients=["salmon", "broccoli", "carrots", "olive oil", "herbs"],
+        instructions=["Season salmon", "Roast vegetables", "Bake salmon"],
+        prep_time=15,
+        cook_time=25,
+        servings=2,
+        calories_per_serving=450,
+        tags=["dinner", "fish", "healthy"]
+    ),
+    Recipe(
+        id="d2",
+        name="Vegetarian Stir-Fry",
+        description="Colorful vegetable stir-fry",
+        ingredients=["tofu", "bell peppers", "broccoli", "soy sauce", "ginger"],
+        instructions=["Stir-fry tofu", "Add vegetables", "Season with sauce"],
+        prep_time=10,
+        cook_time=15,
+        servings=2,
+        calories_per_serving=380,
+        tags=["dinner", "vegetarian", "asian"]
+    ),
+    Recipe(
+        id="d3",
+        name="Beef Stir-Fry",
+        description="High-protein beef with vegetables",
+        ingredients=["beef strips", "bell peppers", "onion", "soy sauce", "garlic"],
+        instructions=["Stir-fry beef", "Add vegetables", "Season with sauce"],
+        prep_time=15,
+        cook_time=10,
+        servings=2,
+        calories_per_serving=520,
+        tags=["dinner", "protein", "asian"]
+    )
+]
+
+# Per-serving macros in grams: recipe id -> (protein, carbs, fat)
+FAKE_RECIPE_MACROS = {
+    "bf1": (25, 42, 6),
+    "bf2": (12, 24, 16),
+    "bf3": (22, 35, 14),
+    "l1": (10, 48, 13),
+    "l2": (35, 38, 13),
+    "l3": (30, 6, 26),
+    "d1": (36, 18, 26),
+    "d2": (20, 30, 20),
+    "d3": (40, 20, 30),
+}
+
+# Built-in catalog used by the planners
+recipe_catalog = RecipeCatalog()
+recipe_catalog.add_recipes(FAKE_BREAKFAST_RECIPES, "breakfast", FAKE_RECIPE_MACROS)
+recipe_catalog.add_recipes(FAKE_LUNCH_RECIPES, "lunch", FAKE_RECIPE_MACROS)
+recipe_catalog.add_recipes(FAKE_DINNER_RECIPES, "dinner", FAKE_RECIPE_MACROS)
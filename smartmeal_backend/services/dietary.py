@@ -0,0 +1,206 @@
+"""
+Allergen and diet verification of generated recipes
+
+Allergies and diet reach the model only as prompt text, so every recipe is
+checked afterwards against a precompiled lexicon of allergen groups. The
+lexicon includes derived ingredients: pesto means nuts and dairy, and soy
+sauce means soy and wheat. Matching is word-level: each ingredient line is
+split into words, and each word and each adjacent pair is looked up once.
+Known pairs take precedence over their words, so peanut butter is peanuts
+and not dairy, and coconut milk is neither, and "gluten-free pasta" clears
+the line of gluten.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from models.schemas import Recipe
+from .ingredients import canonical_ingredient
+
+# Allergen group -> single words (singular) that contain it
+ALLERGEN_TERMS: Dict[str, Tuple[str, ...]] = {
+    "nuts": (
+        "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia", "nut",
+        "pesto", "praline", "marzipan", "nutella", "frangipane", "gianduja", "filbert"
+    ),
+    "peanuts": ("peanut", "satay", "groundnut"),
+    "shellfish": ("shrimp", "prawn", "crab", "lobster", "scallop", "clam", "mussel", "oyster", "crawfish", "langoustine", "calamari", "squid", "octopus", "shellfish"),
+    "fish": ("fish", "salmon", "tuna", "cod", "anchovy", "sardine", "trout", "tilapia", "halibut", "mackerel", "haddock", "worcestershire", "caesar", "bonito", "dashi"),
+    "dairy": (
+        "milk", "cheese", "butter", "cream", "yogurt", "ghee", "whey", "casein", "parmesan", "mozzarella",
+        "cheddar", "feta", "ricotta", "mascarpone", "paneer", "alfredo", "bechamel", "pesto", "custard", "buttermilk", "tzatziki", "queso"
+    ),
+    "eggs": ("egg", "mayo", "aioli", "meringue", "hollandaise", "custard", "frittata", "omelette", "omelet", "carbonara", "caesar"),
+    "gluten": (
+        "wheat", "flour", "bread", "pasta", "spaghetti", "penne", "noodle", "couscous", "barley", "rye", "seitan",
+        "panko", "breadcrumb", "crouton", "bulgur", "farro", "semolina", "tortilla", "pita", "bun", "bagel", "cracker", "orzo", "udon",
+        "pastry", "gnocchi", "ramen", "lasagna", "macaroni", "pizza", "dumpling", "croissant", "biscuit", "roux"
+    ),
+    "soy": ("soy", "tofu", "tempeh", "edamame", "miso", "tamari"),
+    "sesame": ("sesame", "tahini", "hummus", "halva", "furikake"),
+    "meat": (
+        "chicken", "beef", "pork", "bacon", "ham", "lamb", "turkey", "sausage", "prosciutto", "pepperoni",
+        "salami", "chorizo", "duck", "veal", "venison", "gelatin", "lard", "meatball", "steak", "mince", "pancetta", "brisket"
+    ),
+    "honey": ("honey",),
+}
+
+# Word pairs whose meaning differs from their words (they replace them)
+ALLERGEN_PHRASES: Dict[Tuple[str, str], FrozenSet[str]] = {
+    ("peanut", "butter"): frozenset({"peanuts"}),
+    ("almond", "milk"): frozenset({"nuts"}),
+    ("almond", "butter"): frozenset({"nuts"}),
+    ("almond", "flour"): frozenset({"nuts"}),
+    ("cashew", "cream"): frozenset({"nuts"}),
+    ("coconut", "milk"): frozenset(),
+    ("coconut", "cream"): frozenset(),
+    ("oat", "milk"): frozenset({"gluten"}),
+    ("soy", "milk"): frozenset({"soy"}),
+    ("soy", "sauce"): frozenset({"soy", "gluten"}),
+    ("fish", "sauce"): frozenset({"fish"}),
+    ("oyster", "sauce"): frozenset({"shellfish"}),
+    ("rice", "flour"): frozenset(),
+    ("rice", "noodle"): frozenset(),
+    ("corn", "tortilla"): frozenset(),
+    ("cream", "cheese"): frozenset({"dairy"}),
+    ("vegetable", "broth"): frozenset(),
+    ("vegetable", "stock"): frozenset(),
+    ("vegan", "cheese"): frozenset(),
+    ("vegan", "butter"): frozenset(),
+    ("vegan", "mayo"): frozenset(),
+    ("cocoa", "butter"): frozenset(),
+    ("apple", "butter"): frozenset(),
+    ("butter", "bean"): frozenset(),
+    ("nutritional", "yeast"): frozenset(),
+    ("water", "chestnut"): frozenset(),
+    ("pine", "nut"): frozenset({"nuts"}),
+}
+
+# "<word>-free" on a line clears it of a group ("gluten-free pasta", "dairy free cheese")
+FREE_FROM: Dict[str, str] = {
+    "gluten": "gluten", "wheat": "gluten", "dairy": "dairy", "lactose": "dairy", "milk": "dairy",
+    "egg": "eggs", "nut": "nuts", "peanut": "peanuts", "soy": "soy", "meat": "meat"
+}
+
+# How users name allergies -> allergen groups
+ALLERGY_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "nut": ("nuts", "peanuts"), "nuts": ("nuts", "peanuts"), "tree nut": ("nuts",), "tree nuts": ("nuts",),
+    "peanut": ("peanuts",), "peanuts": ("peanuts",),
+    "shellfish": ("shellfish",), "seafood": ("shellfish", "fish"), "fish": ("fish",),
+    "dairy": ("dairy",), "milk": ("dairy",), "lactose": ("dairy",),
+    "egg": ("eggs",), "eggs": ("eggs",),
+    "gluten": ("gluten",), "wheat": ("gluten",), "celiac": ("gluten",),
+    "soy": ("soy",), "soya": ("soy",), "sesame": ("sesame",),
+}
+
+# Diet -> allergen groups it excludes
+DIET_EXCLUSIONS: Dict[str, Tuple[str, ...]] = {
+    "vegetarian": ("meat", "fish", "shellfish"),
+    "pescatarian": ("meat",),
+    "vegan": ("meat", "fish", "shellfish", "dairy", "eggs", "honey"),
+    "gluten-free": ("gluten",),
+    "dairy-free": ("dairy",),
+    "paleo": ("gluten", "dairy", "soy", "peanuts"),
+}
+
+# Allergy values that mean "none"
+NO_ALLERGY = {"", "none", "no", "n/a", "na", "nothing"}
+
+_WORDS = re.compile(r"[a-z]+")
+
+@lru_cache(maxsize=65536)
+def _word(word: str) -> str:
+    return canonical_ingredient(word) or word
+
+class DietaryRules:
+    """Compiled word and word-pair lookups for one set of forbidden groups"""
+
+    def __init__(self, groups: FrozenSet[str], extra_terms: FrozenSet[str] = frozenset()):
+        self.groups = groups
+        self.extra_terms = extra_terms
+        self.words: Dict[str, FrozenSet[str]] = {}
+        for group in groups:
+            for term in ALLERGEN_TERMS.get(group, ()):
+                self.words[term] = self.words.get(term, frozenset()) | {group}
+        self.phrases = {pair: found & groups for pair, found in ALLERGEN_PHRASES.items()}
+        # Allergies outside the lexicon ("strawberry", "bell pepper") are matched by name
+        for term in extra_terms:
+            parts = tuple(term.split(" ")[-2:])
+            if len(parts) == 1:
+                self.words[term] = self.words.get(term, frozenset()) | {term}
+            else:
+                self.phrases[parts] = self.phrases.get(parts, frozenset()) | {term}
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """Forbidden groups named in one ingredient line"""
+        words = [_word(word) for word in _WORDS.findall(text.lower())]
+        found = set()
+        cleared = set()
+        index = 0
+        last = len(words) - 1
+        while index <= last:
+            word = words[index]
+            if index < last:
+                following = words[index + 1]
+                if following == "free" and word in FREE_FROM:
+                    cleared.add(FREE_FROM[word])
+                    index += 2
+                    continue
+                pair = self.phrases.get((word, following))
+                if pair is not None:
+                    found |= pair
+                    index += 2
+                    continue
+            groups = self.words.get(word)
+            if groups:
+                found |= groups
+            index += 1
+        return frozenset(found - cleared)
+
+    def violations(self, recipe: Recipe) -> List[str]:
+        """"group: line" for every forbidden ingredient in the recipe (its name included)"""
+        result = []
+        for text in (recipe.name, *recipe.ingredients):
+            for group in self.scan(text):
+                result.append(f"{group}: {text}")
+        return result
+
+    def describe(self) -> List[str]:
+        """What the rules forbid, for regeneration prompts"""
+        return sorted(self.groups) + sorted(self.extra_terms)
+
+@lru_cache(maxsize=1024)
+def _compile(groups: FrozenSet[str], extra_terms: FrozenSet[str]) -> DietaryRules:
+    return DietaryRules(groups, extra_terms)
+
+def _as_list(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+def rules_for_preferences(preferences: Optional[Dict]) -> Optional[DietaryRules]:
+    """
+    Compiled rules for a request's allergies, diet and dietary restrictions,
+    or None when it has none
+    """
+    if not preferences:
+        return None
+    groups = set()
+    extra_terms = set()
+    for allergy in _as_list(preferences.get("allergies")):
+        name = allergy.strip().lower()
+        if name in NO_ALLERGY:
+            continue
+        if name in ALLERGY_ALIASES:
+            groups.update(ALLERGY_ALIASES[name])
+        else:
+            term = " ".join(_word(word) for word in _WORDS.findall(name))
+            if term:
+                extra_terms.add(term)
+    diets: Iterable[str] = [*_as_list(preferences.get("diet")), *_as_list(preferences.get("dietary_restrictions"))]
+    for diet in diets:
+        groups.update(DIET_EXCLUSIONS.get(diet.strip().lower(), ()))
+    if not groups and not extra_terms:
+        return None
+    return _compile(frozenset(groups), frozenset(extra_terms))
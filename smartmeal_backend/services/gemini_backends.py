@@ -0,0 +1,279 @@
+"""
+Transport backends for GeminiService
+
+LiveBackend talks to the Gemini REST API. RecordingBackend wraps it and
+appends every request/response pair, with its timing, to a cassette file
+(one JSON object per line). ReplayBackend serves those pairs by prompt hash
+without network access, reproducing the recorded latency and streaming
+cadence, optionally time-scaled. Select one with GEMINI_BACKEND
+(live | record | replay) and GEMINI_CASSETTE.
+"""
+import os
+import json
+import time
+import codecs
+import asyncio
+import hashlib
+import logging
+import threading
+import httpx
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Response headers worth keeping in a cassette (the body is stored decoded)
+RECORDED_HEADERS = ("content-type", "retry-after")
+
+def prompt_hash(payload: Dict[str, Any]) -> str:
+    """Hash of the fully rendered prompt; identifies a request across runs"""
+    prompt = payload["contents"][0]["parts"][0]["text"]
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def _kept_headers(response: httpx.Response) -> Dict[str, str]:
+    return {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+
+class CassetteMiss(Exception):
+    """Replay found no recorded interaction for a prompt"""
+
+class GeminiBackend:
+    """How GeminiService reaches the model; responses are httpx.Response objects"""
+
+    name = "base"
+
+    async def post(self, payload: Dict[str, Any]) -> httpx.Response:
+        """generateContent; returns the fully read response"""
+        raise NotImplementedError
+
+    def post_sync(self, payload: Dict[str, Any]) -> httpx.Response:
+        """Blocking generateContent for the sync shim"""
+        raise NotImplementedError
+
+    def stream(self, payload: Dict[str, Any]):
+        """Async context manager yielding a streaming streamGenerateContent (SSE) response"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+class LiveBackend(GeminiBackend):
+    """The Gemini REST API through the service's pooled clients"""
+
+    name = "live"
+
+    def __init__(
+        self,
+        api_url: str,
+        stream_url: str,
+        async_client: Callable[[], httpx.AsyncClient],
+        sync_client: Callable[[], httpx.Client]
+    ):
+        self.api_url = api_url
+        self.stream_url = stream_url
+        # Callables, because the service rebuilds its async client per event loop
+        self._async_client = async_client
+        self._sync_client = sync_client
+
+    async def post(self, payload: Dict[str, Any]) -> httpx.Response:
+        return await self._async_client().post(self.api_url, json=payload)
+
+    def post_sync(self, payload: Dict[str, Any]) -> httpx.Response:
+        return self._sync_client().post(self.api_url, json=payload)
+
+    def stream(self, payload: Dict[str, Any]):
+        return self._async_client().stream("POST", self.stream_url, json=payload)
+
+class Cassette:
+    """Append-only JSON-lines file of recorded interactions"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def load(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Passes a live response body through while noting when each chunk arrived"""
+
+    def __init__(self, source: httpx.Response, started: float):
+        self.source = source
+        self.started = started
+        self.chunks: List[Tuple[float, str]] = []
+        self.complete = False
+        # Chunks may split multi-byte characters; the cassette stores text
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.source.aiter_bytes():
+            self.chunks.append((round(time.perf_counter() - self.started, 6), self._decoder.decode(chunk)))
+            yield chunk
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self.chunks.append((round(time.perf_counter() - self.started, 6), tail))
+        self.complete = True
+
+class RecordingBackend(GeminiBackend):
+    """Forwards to another backend and records every completed interaction"""
+
+    name = "record"
+
+    def __init__(self, inner: GeminiBackend, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self.recorded = 0
+
+    def _record(self, kind: str, payload: Dict[str, Any], response: httpx.Response, latency: float, **body: Any):
+        self.cassette.append({
+            "key": prompt_hash(payload),
+            "kind": kind,
+            "request": payload,
+            "status": response.status_code,
+            "headers": _kept_headers(response),
+            "latency": round(latency, 6),
+            **body
+        })
+        self.recorded += 1
+
+    async def post(self, payload: Dict[str, Any]) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self.inner.post(payload)
+        self._record("generate", payload, response, time.perf_counter() - start, body=response.text)
+        return response
+
+    def post_sync(self, payload: Dict[str, Any]) -> httpx.Response:
+        start = time.perf_counter()
+        response = self.inner.post_sync(payload)
+        self._record("generate", payload, response, time.perf_counter() - start, body=response.text)
+        return response
+
+    @asynccontextmanager
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        start = time.perf_counter()
+        async with self.inner.stream(payload) as response:
+            opened = time.perf_counter() - start
+            body = _RecordingStream(response, start)
+            yield httpx.Response(response.status_code, headers=_kept_headers(response), stream=body, request=response.request)
+            # Streams the caller abandoned part-way would replay truncated
+            if body.complete:
+                self._record("stream", payload, response, opened, chunks=body.chunks)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "cassette": self.cassette.path, "recorded": self.recorded}
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """Recorded chunks, released on the recorded schedule"""
+
+    def __init__(self, chunks: List[Tuple[float, str]], opened: float, time_scale: float):
+        self.chunks = chunks
+        self.opened = opened
+        self.time_scale = time_scale
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        previous = self.opened
+        for offset, text in self.chunks:
+            if offset > previous:
+                await asyncio.sleep((offset - previous) * self.time_scale)
+            previous = offset
+            yield text.encode("utf-8")
+
+class ReplayBackend(GeminiBackend):
+    """
+    Serves recorded interactions by prompt hash. Several recordings of one
+    prompt are served in turn. With match="any", prompts that were never
+    recorded get the recorded interactions round-robin (useful for load
+    tests with generated inputs); otherwise they raise CassetteMiss.
+    """
+
+    name = "replay"
+
+    def __init__(self, entries: List[Dict[str, Any]], time_scale: float = 1.0, match: str = "exact"):
+        self.time_scale = time_scale
+        self.match = match
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._by_kind: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+            self._by_kind.setdefault(entry["kind"], []).append(entry)
+        self._turns: Dict[Tuple[str, str], int] = {}
+        self.hits = 0
+        self.fallbacks = 0
+        self.misses = 0
+
+    def _lookup(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        key = (kind, prompt_hash(payload))
+        entries = self._entries.get(key)
+        if entries:
+            self.hits += 1
+        elif self.match == "any" and self._by_kind.get(kind):
+            self.fallbacks += 1
+            key = (kind, "*")
+            entries = self._by_kind[kind]
+        else:
+            self.misses += 1
+            raise CassetteMiss(f"No recorded {kind} interaction for prompt {key[1][:12]}")
+        turn = self._turns.get(key, 0)
+        self._turns[key] = turn + 1
+        return entries[turn % len(entries)]
+
+    @staticmethod
+    def _response(entry: Dict[str, Any], **body: Any) -> httpx.Response:
+        return httpx.Response(
+            entry["status"],
+            headers=entry.get("headers", {}),
+            request=httpx.Request("POST", f"http://replay/{entry['kind']}"),
+            **body
+        )
+
+    async def post(self, payload: Dict[str, Any]) -> httpx.Response:
+        entry = self._lookup("generate", payload)
+        await asyncio.sleep(entry["latency"] * self.time_scale)
+        return self._response(entry, content=entry["body"].encode("utf-8"))
+
+    def post_sync(self, payload: Dict[str, Any]) -> httpx.Response:
+        entry = self._lookup("generate", payload)
+        time.sleep(entry["latency"] * self.time_scale)
+        return self._response(entry, content=entry["body"].encode("utf-8"))
+
+    @asynccontextmanager
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        entry = self._lookup("stream", payload)
+        await asyncio.sleep(entry["latency"] * self.time_scale)
+        yield self._response(entry, stream=_ReplayStream(entry["chunks"], entry["latency"], self.time_scale))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "interactions": sum(len(entries) for entries in self._entries.values()),
+            "time_scale": self.time_scale,
+            "match": self.match,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "misses": self.misses
+        }
+
+def create_backend_from_env(live: LiveBackend) -> GeminiBackend:
+    mode = os.getenv("GEMINI_BACKEND", "live").lower()
+    cassette = Cassette(os.getenv("GEMINI_CASSETTE", "gemini_cassette.jsonl"))
+    if mode == "record":
+        logger.info("Recording Gemini interactions", extra={"cassette": cassette.path})
+        return RecordingBackend(live, cassette)
+    if mode == "replay":
+        entries = cassette.load()
+        logger.info("Replaying Gemini interactions", extra={"cassette": cassette.path, "interactions": len(entries)})
+        return ReplayBackend(
+            entries,
+            # 0.5 replays twice as fast as recorded, 0 without any delay
+            time_scale=float(os.getenv("GEMINI_REPLAY_TIME_SCALE", "1.0")),
+            match=os.getenv("GEMINI_REPLAY_MATCH", "exact").lower()
+        )
+    return live
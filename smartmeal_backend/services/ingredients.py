@@ -0,0 +1,75 @@
+"""
+Ingredient name canonicalization shared by the catalog, caches and list builders
+"""
+import re
+from functools import lru_cache
+
+# Words that describe preparation or variety rather than the ingredient itself
+DESCRIPTORS = {
+    "fresh", "frozen", "dried", "chopped", "diced", "sliced", "minced", "grated",
+    "shredded", "boneless", "skinless", "large", "small", "medium", "ripe",
+    "organic", "raw", "cooked", "whole", "extra", "virgin", "lean", "red",
+    "yellow", "white", "baby", "cherry", "roma", "plain", "low-fat",
+    "unsalted", "salted", "canned", "strip", "fillet", "piece"
+}
+
+# Units and packaging words that show up in receipt lines and recipe strings
+UNIT_WORDS = {
+    "lb", "lbs", "oz", "g", "kg", "ml", "l", "cup", "tbsp", "tsp", "pack", "can",
+    "bunch", "dozen", "bag", "box", "jar", "bottle", "ct", "pc", "pcs", "x", "of"
+}
+
+# Names that should collapse onto one canonical ingredient
+SYNONYMS = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "capsicum": "bell pepper",
+    "garbanzo bean": "chickpea",
+    "mayonnaise": "mayo",
+    "yoghurt": "yogurt",
+    "greek yogurt": "yogurt",
+    "coriander": "cilantro",
+    "courgette": "zucchini",
+    "aubergine": "eggplant",
+    "ground beef": "beef",
+    "minced beef": "beef",
+    "chicken breast": "chicken",
+    "chicken thigh": "chicken",
+    "whole grain bread": "bread",
+    "tomatoe": "tomato",
+    "potatoe": "potato",
+}
+
+# Ingredients assumed to be on hand in any kitchen
+PANTRY_STAPLES = {"salt", "pepper", "water", "oil", "olive oil", "black pepper"}
+
+_NON_WORD = re.compile(r"[^a-z\s-]+")
+_SPACES = re.compile(r"\s+")
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word.endswith("ss") or word.endswith("us"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+@lru_cache(maxsize=16384)
+def canonical_ingredient(name: str) -> str:
+    """
+    Normalize an ingredient name: lowercase, drop quantities, punctuation and
+    descriptors, singularize, and map synonyms ("Red Onions" -> "onion")
+    """
+    text = _SPACES.sub(" ", _NON_WORD.sub(" ", name.lower())).strip()
+    if text in SYNONYMS:
+        return SYNONYMS[text]
+    words = [_singular(word) for word in text.split(" ") if word and word not in UNIT_WORDS]
+    joined = " ".join(words)
+    if joined in SYNONYMS:
+        return SYNONYMS[joined]
+    kept = [word for word in words if word not in DESCRIPTORS] or words
+    canonical = " ".join(kept)
+    return SYNONYMS.get(canonical, canonical)
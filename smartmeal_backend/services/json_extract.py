@@ -0,0 +1,237 @@
+"""
+Incremental extraction of recipe objects from (streamed) model output, and
+of a single JSON value from free-text model output
+"""
+import re
+import json
+from typing import List, Dict, Any, Optional
+
+# Characters that can change the scanner state; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'["\\{}\[\]`]')
+
+# Trailing commas before a closing bracket, a common model mistake
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+# strict=False accepts raw newlines inside strings, which models often emit
+_DECODER = json.JSONDecoder(strict=False)
+
+# What decoding malformed model output can raise: bad JSON, or nesting too
+# deep for the decoder's recursion
+MALFORMED_JSON_ERRORS = (json.JSONDecodeError, RecursionError)
+
+# Where a JSON object or array may start in free text
+_VALUE_START = re.compile(r'[\[{]')
+
+# Starts tried by extract_json_value; each failed try can scan to the end of
+# the text, so this bounds the work on long unbalanced output
+MAX_VALUE_STARTS = 32
+
+# Keys that mark a nested object as a recipe rather than e.g. an ingredient entry
+_RECIPE_KEYS = ('instructions', 'ingredients', 'description')
+
+class IncrementalRecipeExtractor:
+    """
+    Single-pass scanner that pulls recipe objects out of model output.
+
+    Feed it text chunk by chunk; each recipe object is returned as soon as its
+    closing brace arrives, so a truncated response still yields every recipe
+    that was completed. Code fences and prose before or after the JSON are
+    skipped. Recognised layouts:
+    - a top-level array of recipes: [{...}, {...}]
+    - a wrapper object holding an array: {"recipes": [{...}, {...}]}
+    - a single bare recipe object: {...}
+
+    Work is linear in the input: complete objects are decoded in one C-level
+    call where possible, otherwise only structural characters are visited and
+    the object is decoded once, when it closes.
+    """
+
+    def __init__(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # Stack depth the current recipe object was opened at (None when not capturing)
+        self._capture_depth: Optional[int] = None
+        self._pending: List[str] = []
+        # Text of a top-level object, kept in case it turns out to be a bare recipe
+        self._top_pending: Optional[List[str]] = None
+        self._top_emitted = 0
+        self._tick_run = 0
+        self.emitted = 0
+        self.dropped = 0
+
+    @property
+    def truncated(self) -> bool:
+        """True while a recipe object is open, i.e. when the text so far ends inside one"""
+        return self._capture_depth is not None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next chunk and return the recipe objects it completed"""
+        found = []
+        start = 0 if self._capture_depth is not None else None
+        top_start = 0 if self._top_pending is not None else None
+        pos = 1 if self._escape else 0
+        self._escape = False
+        # A run of backticks may continue from the previous chunk
+        last_tick = -1 if self._tick_run else -2
+
+        while True:
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                break
+            pos = match.start()
+            ch = text[pos]
+
+            if ch == '`':
+                # A code fence inside an unfinished structure (even mid-string)
+                # means the model abandoned it and started over
+                self._tick_run = self._tick_run + 1 if pos == last_tick + 1 else 1
+                last_tick = pos
+                if self._tick_run == 3 and self._stack:
+                    self._reset()
+                    start = top_start = None
+                pos += 1
+                continue
+
+            if self._in_string:
+                if ch == '\\':
+                    if pos + 1 >= len(text):
+                        self._escape = True
+                    pos += 2
+                    continue
+                if ch == '"':
+                    self._in_string = False
+                pos += 1
+                continue
+
+            if ch == '"':
+                # Quotes only matter inside JSON; prose around it is ignored
+                if self._stack:
+                    self._in_string = True
+            elif ch == '[' or ch == '{':
+                if ch == '{' and self._capture_depth is None:
+                    if not self._stack:
+                        self._top_pending = []
+                        self._top_emitted = 0
+                        top_start = pos
+                    elif self._stack[-1] == '[':
+                        # Fast path: a complete, valid object decodes in one C-level call
+                        end = self._try_decode_at(text, pos, found)
+                        if end is not None:
+                            pos = end
+                            continue
+                        self._capture_depth = len(self._stack)
+                        start = pos
+                self._stack.append(ch)
+            else:
+                if not self._stack:
+                    pos += 1
+                    continue
+                if self._stack[-1] != ('[' if ch == ']' else '{'):
+                    # Mismatched bracket: the structure is broken, start over
+                    self._reset()
+                    start = top_start = None
+                    pos += 1
+                    continue
+                self._stack.pop()
+
+                if ch == '}' and self._capture_depth == len(self._stack):
+                    self._pending.append(text[start:pos + 1])
+                    self._accept(self._decode(''.join(self._pending)), found)
+                    self._pending = []
+                    self._capture_depth = None
+                    start = None
+
+                if ch == '}' and not self._stack and self._top_pending is not None:
+                    # A top-level object closed: either a wrapper whose recipes
+                    # were already emitted, or a single bare recipe
+                    if not self._top_emitted:
+                        self._top_pending.append(text[top_start:pos + 1])
+                        recipe = self._decode(''.join(self._top_pending))
+                        if recipe is not None and _looks_like_recipe(recipe):
+                            found.append(recipe)
+                    self._top_pending = None
+                    top_start = None
+            pos += 1
+
+        if last_tick != len(text) - 1:
+            self._tick_run = 0
+        if start is not None:
+            self._pending.append(text[start:])
+        if top_start is not None and self._top_pending is not None and not self._top_emitted:
+            self._top_pending.append(text[top_start:])
+        self.emitted += len(found)
+        return found
+
+    def _try_decode_at(self, text: str, pos: int, found: List[Dict[str, Any]]) -> Optional[int]:
+        """Decode a whole object starting at pos; returns the end offset, or None to fall back to scanning"""
+        try:
+            obj, end = _DECODER.raw_decode(text, pos)
+        except MALFORMED_JSON_ERRORS:
+            return None
+        self._accept(obj if isinstance(obj, dict) else None, found)
+        return end
+
+    def _accept(self, recipe: Optional[Dict[str, Any]], found: List[Dict[str, Any]]):
+        # Inside a wrapper object only recipe-shaped objects count
+        if recipe is not None and self._top_pending is not None and not _looks_like_recipe(recipe):
+            recipe = None
+        if recipe is None:
+            self.dropped += 1
+            return
+        found.append(recipe)
+        self._top_emitted += 1
+
+    def _reset(self):
+        self._stack = []
+        self._in_string = False
+        self._capture_depth = None
+        self._pending = []
+        self._top_pending = None
+        self._top_emitted = 0
+
+    @staticmethod
+    def _decode(object_text: str) -> Optional[Dict[str, Any]]:
+        try:
+            parsed = _DECODER.decode(object_text)
+        except MALFORMED_JSON_ERRORS:
+            try:
+                parsed = _DECODER.decode(_TRAILING_COMMA.sub(r'\1', object_text))
+            except MALFORMED_JSON_ERRORS:
+                return None
+        return parsed if isinstance(parsed, dict) else None
+
+def _looks_like_recipe(obj: Dict[str, Any]) -> bool:
+    return 'name' in obj and any(key in obj for key in _RECIPE_KEYS)
+
+def extract_recipes(text: str) -> List[Dict[str, Any]]:
+    """
+    Extract every complete recipe object from a full model response
+
+    Args:
+        text: Raw generated text (may include code fences, prose or truncation)
+
+    Returns:
+        List of recipe dictionaries in the order they appear
+    """
+    return IncrementalRecipeExtractor().feed(text)
+
+def extract_json_value(text: str) -> Any:
+    """
+    The first complete JSON object or array in model output that may wrap it
+    in a code fence or prose, or leave trailing commas in it
+
+    Raises:
+        ValueError: when the text holds no complete JSON value
+    """
+    for attempt, match in enumerate(_VALUE_START.finditer(text)):
+        if attempt == MAX_VALUE_STARTS:
+            break
+        # A value that only decodes without its trailing commas still beats
+        # the objects nested inside it
+        for candidate in (text[match.start():], _TRAILING_COMMA.sub(r'\1', text[match.start():])):
+            try:
+                return _DECODER.raw_decode(candidate)[0]
+            except MALFORMED_JSON_ERRORS:
+                continue
+    raise ValueError("No complete JSON value in model output")
@@ -0,0 +1,157 @@
+"""
+Structured, non-blocking logging
+
+Log calls on the event loop only put a record on a bounded queue; a
+listener thread formats it (JSON lines or plain text) and writes it to
+stderr. Every record carries the request ID of the request it was logged
+from, and verbose payloads (model output, item lists, preferences) are only
+logged for a sample of requests.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import uuid
+import random
+import logging
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of verbose payloads that are logged (at DEBUG level), and their size cap
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+
+# Request ID of the request being handled ("-" outside a request)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueues records without blocking and without formatting them on the
+    caller's thread; records are dropped (and counted) when the queue is full
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve %-args now (they may be mutated later); full formatting
+        # happens in the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # SimpleQueue has no size limit of its own but is much cheaper to put
+        # to than queue.Queue; the bound here is approximate across threads
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, request_id, message and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the request ID and extra fields as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _STANDARD_ATTRS)
+        return f"{line} {fields}" if fields else line
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+# Records dropped by handlers that have since been shut down
+_dropped_before = 0
+
+def configure_logging():
+    """
+    Install the queue handler on the root logger and start the writer thread;
+    idempotent, and configures again after shutdown_logging
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    _handler = NonBlockingQueueHandler(log_queue, LOG_QUEUE_SIZE)
+    _handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every Gemini request at INFO; the stage metrics already cover that
+    logging.getLogger("httpx").setLevel(max(root.level, logging.WARNING))
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _handler, _dropped_before
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_handler)
+    _dropped_before += _handler.dropped
+    _listener = None
+    _handler = None
+
+def dropped_log_records() -> int:
+    return _dropped_before + (_handler.dropped if _handler is not None else 0)
+
+def collect_metrics():
+    """Scrape-time metric family for records dropped by a full log queue"""
+    return [("smartmeal_log_records_dropped_total", "counter", "Log records dropped because the log queue was full", [
+        ({}, dropped_log_records())
+    ])]
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, **fields: Any):
+    """
+    Log a verbose payload at DEBUG level for a sample of calls
+    (LOG_PAYLOAD_SAMPLE_RATE), truncated to LOG_PAYLOAD_MAX_CHARS
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    logger.debug(message, extra={**fields, "payload": text[:LOG_PAYLOAD_MAX_CHARS], "payload_chars": len(text)})
@@ -0,0 +1,198 @@
+"""
+Lightweight Prometheus-format metrics (histograms and counters)
+
+Recording is a perf_counter() pair, a bisect over the bucket bounds and a
+list increment - well under a microsecond (python benchmarks/bench_metrics.py) -
+so stage timing stays on in production. Values that services already count (cache, single-flight, pool,
+breaker) are read at scrape time through collectors instead of being
+double-counted on the hot path. Updates take no lock: the event loop is
+single-threaded, and plan builds in worker threads can at worst lose a rare
+increment.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Upper bounds (seconds) shared by all latency histograms
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# (metric name, type, help, [(labels, value), ...]) as returned by collectors
+Sample = Tuple[Dict[str, str], float]
+MetricFamily = Tuple[str, str, str, List[Sample]]
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Histogram:
+    """One labeled histogram series"""
+
+    __slots__ = ("labels", "bounds", "counts", "total")
+
+    def __init__(self, labels: Dict[str, str], bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.labels = labels
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        # The observation count is derived from the buckets at scrape time
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels({**self.labels, 'le': repr(bound)})} {cumulative}")
+        cumulative += self.counts[-1]
+        lines.append(f"{name}_bucket{_format_labels({**self.labels, 'le': '+Inf'})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {self.total!r}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {cumulative}")
+        return lines
+
+class Counter:
+    """One labeled counter series"""
+
+    __slots__ = ("labels", "value")
+
+    def __init__(self, labels: Dict[str, str]):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class MetricsRegistry:
+    """Holds metric series and collectors and renders the text exposition format"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Tuple[str, Dict[Tuple, Histogram]]] = {}
+        self._counters: Dict[str, Tuple[str, Dict[Tuple, Counter]]] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def histogram(self, name: str, help_text: str, **labels: str) -> Histogram:
+        """Get or create the series of histogram `name` with these labels"""
+        _, series = self._histograms.setdefault(name, (help_text, {}))
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Histogram(labels)
+        return series[key]
+
+    def counter(self, name: str, help_text: str, **labels: str) -> Counter:
+        """Get or create the series of counter `name` with these labels"""
+        _, series = self._counters.setdefault(name, (help_text, {}))
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Counter(labels)
+        return series[key]
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Add a callable that reports metric families at scrape time (once, however often it is registered)"""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for name, (help_text, series) in self._histograms.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for histogram in series.values():
+                lines.extend(histogram.samples(name))
+        for name, (help_text, series) in self._counters.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for counter in series.values():
+                lines.append(f"{name}{_format_labels(counter.labels)} {_format_value(counter.value)}")
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Global registry instance
+metrics = MetricsRegistry()
+
+STAGE_HELP = "Time spent in each stage of a request"
+
+def stage_histogram(endpoint: str, stage: str) -> Histogram:
+    """Series of smartmeal_stage_duration_seconds for one endpoint stage"""
+    return metrics.histogram("smartmeal_stage_duration_seconds", STAGE_HELP, endpoint=endpoint, stage=stage)
+
+# Path A stages
+RECIPE_PROMPT_RENDER = stage_histogram("recipes", "prompt_render")
+RECIPE_ADMISSION_WAIT = stage_histogram("recipes", "admission_wait")
+RECIPE_UPSTREAM_HTTP = stage_histogram("recipes", "upstream_http")
+RECIPE_JSON_EXTRACT = stage_histogram("recipes", "json_extract")
+RECIPE_VALIDATE = stage_histogram("recipes", "validate")
+RECIPE_DIET_VERIFY = stage_histogram("recipes", "diet_verify")
+RECIPE_REGENERATE = stage_histogram("recipes", "regenerate")
+RECIPE_SERIALIZE = stage_histogram("recipes", "serialize")
+
+# Path B stages
+PLAN_POOL_TAKE = stage_histogram("plans", "pool_take")
+PLAN_OPTIMIZE = stage_histogram("plans", "optimize")
+PLAN_BUILD = stage_histogram("plans", "build_plan")
+PLAN_ANALYTICS = stage_histogram("plans", "analytics")
+PLAN_SHOPPING_LIST = stage_histogram("plans", "shopping_list")
+PLAN_SERIALIZE = stage_histogram("plans", "serialize")
+PLAN_LLM_DAY = stage_histogram("plans", "llm_day")
+PLAN_LLM_WEEK = stage_histogram("plans", "llm_week")
+PLAN_LLM_ADMISSION_WAIT = stage_histogram("plans", "llm_admission_wait")
+PLAN_LLM_UPSTREAM_HTTP = stage_histogram("plans", "llm_upstream_http")
+
+RECIPE_PARSE_FAILURES = metrics.counter(
+    "smartmeal_recipe_parse_failures_total",
+    "Model responses from which no valid recipe could be parsed"
+)
+RECIPES_DROPPED_EXTRACT = metrics.counter(
+    "smartmeal_recipes_dropped_total",
+    "Recipe objects dropped from model output",
+    stage="extract"
+)
+RECIPES_DROPPED_VALIDATE = metrics.counter(
+    "smartmeal_recipes_dropped_total",
+    "Recipe objects dropped from model output",
+    stage="validate"
+)
+RECIPE_DIET_VIOLATIONS = metrics.counter(
+    "smartmeal_recipe_diet_violations_total",
+    "Generated recipes that broke the request's allergies or diet"
+)
+RECIPES_REGENERATED = metrics.counter(
+    "smartmeal_recipes_regenerated_total",
+    "Replacement recipes accepted for recipes that were cut off, invalid, missing or broke the request's diet"
+)
+RECIPES_MISSING = metrics.counter(
+    "smartmeal_recipes_missing_total",
+    "Recipe slots still empty after regeneration (answers shorter than expected)"
+)
+PLAN_MEALS_MODEL = metrics.counter(
+    "smartmeal_plan_meals_total",
+    "Meals in model-generated weekly plans, by where they came from",
+    source="model"
+)
+PLAN_MEALS_REGENERATED = metrics.counter(
+    "smartmeal_plan_meals_total",
+    "Meals in model-generated weekly plans, by where they came from",
+    source="regenerated"
+)
+PLAN_MEALS_CATALOG = metrics.counter(
+    "smartmeal_plan_meals_total",
+    "Meals in model-generated weekly plans, by where they came from",
+    source="catalog"
+)
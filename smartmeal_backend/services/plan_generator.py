@@ -0,0 +1,274 @@
+"""
+Model-generated weekly plans
+
+A single Gemini call for 21 recipes would overrun maxOutputTokens and take
+tens of seconds, so the week is split into one call per day, run
+concurrently under a cap; the week then takes about as long as its slowest
+day. Each day gets its own cuisine theme so that independent calls rarely
+collide. A cross-day pass afterwards removes repeated recipes and ones that
+break the diet, asks again for just those meals (one call per affected day,
+again concurrently), and fills whatever is still missing from the catalog
+optimizer's plan for the goal.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from models.schemas import DailyMeal, PlanResponse, Recipe, WeeklyPlan
+from .ai_service import gemini_service
+from .catalog import recipe_catalog, MEAL_SLOTS, NUTRIENTS
+from .analytics import recipe_nutrition
+from .dietary import rules_for_preferences
+from .plan_optimizer import DAYS, GOAL_TARGETS, DEFAULT_TARGETS, solve_weekly_plan
+from .plan_pool import build_plan_response, finish_plan_response
+from .prompts import PLAN_DAY_SYSTEM_PROMPT, PLAN_DAY_JSON_FORMAT, get_plan_day_prompt, plan_day_response_schema
+from .utils import parse_recipe
+from .metrics import (
+    PLAN_LLM_DAY, PLAN_LLM_WEEK, PLAN_LLM_ADMISSION_WAIT, PLAN_LLM_UPSTREAM_HTTP,
+    PLAN_MEALS_MODEL, PLAN_MEALS_REGENERATED, PLAN_MEALS_CATALOG
+)
+
+logger = logging.getLogger(__name__)
+
+# Gemini calls in flight for one plan (7 runs the whole week at once)
+PLAN_LLM_CONCURRENCY = int(os.getenv("PLAN_LLM_CONCURRENCY", "7"))
+# Time budget (seconds) for generating one plan, both rounds included
+PLAN_LLM_TIMEOUT = float(os.getenv("PLAN_LLM_TIMEOUT", "45"))
+
+# Rotated across the week (preferred cuisines replace them when given)
+DAY_THEMES = ["Mediterranean", "Mexican", "East Asian", "Indian", "Middle Eastern", "Italian", "American comfort food"]
+
+# day index -> meal slot -> recipe (None where the slot still needs one)
+Week = List[Dict[str, Optional[Recipe]]]
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+class PlanUnsatisfiable(Exception):
+    """No recipe available for a meal satisfies the user's allergies and diet"""
+
+def recipe_key(recipe: Recipe) -> str:
+    """Name used to spot the same dish planned on two days"""
+    return " ".join(_WORDS.findall(recipe.name.lower()))
+
+def parse_plan_day(data: Any, day: str, meals: List[str]) -> Dict[str, Recipe]:
+    """
+    Recipes from a plan-day answer: an object keyed by meal, or (free-text
+    mode) a list in meal order. Invalid recipes are left out.
+    """
+    if isinstance(data, list):
+        data = dict(zip(meals, data))
+    if not isinstance(data, dict):
+        return {}
+    recipes = {}
+    for index, meal in enumerate(meals):
+        recipe_data = data.get(meal)
+        if not isinstance(recipe_data, dict):
+            continue
+        try:
+            # Ids must be unique across the week; the model's are not
+            recipes[meal] = parse_recipe({**recipe_data, "id": f"{day}-{meal}"}, index)
+        except Exception as e:
+            logger.warning("Dropped invalid plan recipe", extra={"day": day, "meal": meal, "error": str(e)})
+    return recipes
+
+async def request_meals(
+    day_index: int,
+    meals: List[str],
+    goal: str,
+    theme: str,
+    preferences: Dict[str, Any],
+    exclude_names: List[str],
+    semaphore: asyncio.Semaphore,
+    deadline: Optional[float],
+    plan_type: Optional[str]
+) -> Dict[str, Recipe]:
+    """One Gemini call for some or all meals of one day"""
+    day = DAYS[day_index]
+    prompt = get_plan_day_prompt(
+        day, goal, GOAL_TARGETS.get(goal, DEFAULT_TARGETS), theme, meals, exclude_names, **preferences
+    )
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            data = await gemini_service.generate_json_async(
+                PLAN_DAY_SYSTEM_PROMPT,
+                prompt,
+                plan_day_response_schema(meals),
+                PLAN_DAY_JSON_FORMAT.format(meals=", ".join(meals)),
+                deadline=deadline,
+                plan_type=plan_type,
+                admission_wait=PLAN_LLM_ADMISSION_WAIT,
+                upstream_http=PLAN_LLM_UPSTREAM_HTTP
+            )
+        finally:
+            PLAN_LLM_DAY.observe(time.perf_counter() - start)
+    return parse_plan_day(data, day, meals)
+
+async def _gather_days(requests: List[Tuple[int, List[str]]], call) -> Dict[int, Dict[str, Recipe]]:
+    """Run one call per (day, meals) concurrently; a failed day gives no recipes"""
+    results = await asyncio.gather(*(call(day_index, meals) for day_index, meals in requests), return_exceptions=True)
+    by_day = {}
+    for (day_index, meals), result in zip(requests, results):
+        if isinstance(result, BaseException):
+            logger.warning("Plan day generation failed", extra={"day": DAYS[day_index], "meals": meals, "error": str(result)})
+            result = {}
+        by_day[day_index] = result
+    return by_day
+
+def _accept(week: Week, by_day: Dict[int, Dict[str, Recipe]], seen: Dict[str, str], rules) -> int:
+    """
+    Cross-day pass: place recipes that are new to the week and satisfy the
+    diet, in day order; returns how many were placed
+    """
+    placed = 0
+    for day_index in sorted(by_day):
+        for meal, recipe in by_day[day_index].items():
+            if week[day_index][meal] is not None:
+                continue
+            key = recipe_key(recipe)
+            if key in seen:
+                logger.info("Dropped repeated plan recipe", extra={"day": DAYS[day_index], "meal": meal, "recipe": recipe.name})
+                continue
+            if rules is not None and rules.violations(recipe):
+                logger.info("Dropped plan recipe that breaks the diet", extra={"day": DAYS[day_index], "meal": meal, "recipe": recipe.name})
+                continue
+            seen[key] = recipe.name
+            week[day_index][meal] = recipe
+            placed += 1
+    return placed
+
+def _missing(week: Week) -> List[Tuple[int, List[str]]]:
+    requests = []
+    for day_index, meals in enumerate(week):
+        empty = [meal for meal in MEAL_SLOTS if meals[meal] is None]
+        if empty:
+            requests.append((day_index, empty))
+    return requests
+
+def _repeat(week: Week, meal: str) -> Recipe:
+    """
+    A recipe already planned for this meal on another day, for when no
+    catalog recipe for it satisfies the diet
+    """
+    for meals in week:
+        if meals[meal] is not None:
+            return meals[meal]
+    raise PlanUnsatisfiable(f"No {meal} recipe satisfies the allergies and diet")
+
+def plan_constraints(goal: str, preferences: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The request's preferences, plus the diet its goal implies"""
+    constraints = dict(preferences or {})
+    if goal == "vegetarian" and not constraints.get("diet"):
+        constraints["diet"] = "vegetarian"
+    return constraints
+
+def diet_mask(rules) -> Optional[np.ndarray]:
+    """Catalog recipes that satisfy the rules, or None when there are none"""
+    if rules is None:
+        return None
+    return np.array([not rules.violations(recipe) for recipe in recipe_catalog.recipes], dtype=bool)
+
+def build_diet_plan_response(goal: str, preferences: Optional[Dict[str, Any]], seed: int) -> PlanResponse:
+    """
+    Catalog plan for a goal from only the recipes that satisfy the user's
+    allergies and diet (pooled plans ignore them); PlanUnsatisfiable when a
+    meal has no such recipe
+    """
+    allowed = diet_mask(rules_for_preferences(plan_constraints(goal, preferences)))
+    if allowed is not None:
+        for slot_index, meal in enumerate(MEAL_SLOTS):
+            if not allowed[recipe_catalog.slot == slot_index].any():
+                raise PlanUnsatisfiable(f"No {meal} recipe satisfies the allergies and diet")
+    return build_plan_response(goal, seed, allowed=allowed)
+
+def assemble_weekly_plan(week: Week) -> WeeklyPlan:
+    """WeeklyPlan from a complete week, with daily totals from each recipe's nutrition"""
+    days = {}
+    for day_index, day in enumerate(DAYS):
+        meals = [week[day_index][meal] for meal in MEAL_SLOTS]
+        totals = sum(recipe_nutrition(recipe_catalog, recipe) for recipe in meals)
+        days[day] = DailyMeal(
+            breakfast=meals[0],
+            lunch=meals[1],
+            dinner=meals[2],
+            total_calories=int(round(float(totals[0]))),
+            **{f"total_{nutrient}": round(float(value), 1) for nutrient, value in zip(NUTRIENTS[1:], totals[1:])}
+        )
+    return WeeklyPlan(**days)
+
+async def generate_llm_plan_response(
+    goal: str,
+    preferences: Optional[Dict[str, Any]] = None,
+    seed: Optional[int] = None,
+    plan_type: Optional[str] = None
+) -> PlanResponse:
+    """
+    Weekly plan written by the model, one concurrent call per day. Meals the
+    model could not provide (failed calls, repeats, diet violations after one
+    retry) come from the catalog plan for the goal and seed, restricted to
+    recipes that satisfy the diet; when the catalog has none for a meal, a
+    recipe already planned for it is repeated, else PlanUnsatisfiable.
+    """
+    start = time.perf_counter()
+    deadline = time.monotonic() + PLAN_LLM_TIMEOUT
+    constraints = plan_constraints(goal, preferences)
+    rules = rules_for_preferences(constraints)
+    themes = list(constraints.get("preferredCuisines") or []) or DAY_THEMES
+    offset = seed or 0
+    semaphore = asyncio.Semaphore(PLAN_LLM_CONCURRENCY)
+    week: Week = [{meal: None for meal in MEAL_SLOTS} for _ in DAYS]
+    seen: Dict[str, str] = {}
+
+    if not gemini_service.mock_mode:
+        # Round 1: every day at once
+        by_day = await _gather_days(
+            [(day_index, list(MEAL_SLOTS)) for day_index in range(len(DAYS))],
+            lambda day_index, meals: request_meals(
+                day_index, meals, goal, themes[(day_index + offset) % len(themes)], constraints, [],
+                semaphore, deadline, plan_type
+            )
+        )
+        PLAN_MEALS_MODEL.inc(_accept(week, by_day, seen, rules))
+
+        # Round 2: only the meals that were dropped, told what the week already has
+        missing = _missing(week)
+        if missing and time.monotonic() < deadline:
+            planned = list(seen.values())
+            by_day = await _gather_days(
+                missing,
+                lambda day_index, meals: request_meals(
+                    day_index, meals, goal, themes[(day_index + offset + 1) % len(themes)], constraints, planned,
+                    semaphore, deadline, plan_type
+                )
+            )
+            PLAN_MEALS_REGENERATED.inc(_accept(week, by_day, seen, rules))
+
+    # Whatever is still missing comes from the catalog optimizer
+    fallback = 0
+    if _missing(week):
+        allowed = diet_mask(rules)
+        selection = await asyncio.to_thread(solve_weekly_plan, recipe_catalog, goal, offset, allowed=allowed)
+        for day_index, meals in _missing(week):
+            for meal in meals:
+                index = selection[day_index, MEAL_SLOTS.index(meal)]
+                if allowed is None or allowed[index]:
+                    week[day_index][meal] = recipe_catalog.recipes[index]
+                else:
+                    # The optimizer fell back to the whole slot: nothing in it fits the diet
+                    week[day_index][meal] = _repeat(week, meal)
+                fallback += 1
+        PLAN_MEALS_CATALOG.inc(fallback)
+
+    weekly_plan = assemble_weekly_plan(week)
+    PLAN_LLM_WEEK.observe(time.perf_counter() - start)
+    logger.info("Generated weekly plan", extra={"goal": goal, "catalog_meals": fallback})
+
+    message = f"Generated a personalized {goal} meal plan for you!"
+    if fallback == len(DAYS) * len(MEAL_SLOTS):
+        message = f"Generated a {goal} meal plan from our recipe catalog"
+    elif fallback:
+        message = f"Generated a personalized {goal} meal plan for you ({fallback} meals from our recipe catalog)"
+    return await asyncio.to_thread(finish_plan_response, goal, weekly_plan, seed, message)
@@ -0,0 +1,118 @@
+"""
+Weekly plan optimizer: picks 21 meals from the recipe catalog to meet a
+goal's daily calorie and macro targets, with a penalty for repeats
+"""
+import numpy as np
+from typing import Dict, Optional
+from models.schemas import WeeklyPlan, DailyMeal
+from .catalog import RecipeCatalog, MEAL_SLOTS, NUTRIENTS
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Daily targets per goal: calories (kcal) and protein, carbs, fat (g)
+GOAL_TARGETS: Dict[str, Dict[str, float]] = {
+    "fitness": {"calories": 2200, "protein": 150, "carbs": 250, "fat": 70},
+    "weight-loss": {"calories": 1800, "protein": 130, "carbs": 170, "fat": 60},
+    "muscle-gain": {"calories": 2500, "protein": 180, "carbs": 300, "fat": 75},
+    "low-carb": {"calories": 2000, "protein": 140, "carbs": 80, "fat": 120},
+    "vegetarian": {"calories": 2000, "protein": 90, "carbs": 260, "fat": 70},
+}
+DEFAULT_TARGETS = {"calories": 2000, "protein": 120, "carbs": 230, "fat": 70}
+
+# Share of what is left of the day's target that each slot should cover
+SLOT_SHARE = np.array([0.25, 0.35 / 0.75, 1.0], dtype=np.float32)
+
+# Relative importance of hitting each nutrient (same order as NUTRIENTS)
+NUTRIENT_WEIGHTS = np.array([1.0, 0.6, 0.4, 0.4], dtype=np.float32)
+
+def goal_targets(goal: str) -> np.ndarray:
+    """Daily target vector (same order as NUTRIENTS) for a goal"""
+    targets = GOAL_TARGETS.get(goal, DEFAULT_TARGETS)
+    return np.array([targets[nutrient] for nutrient in NUTRIENTS], dtype=np.float32)
+
+def solve_weekly_plan(
+    catalog: RecipeCatalog,
+    goal: str,
+    seed: Optional[int] = None,
+    variety_weight: float = 0.02,
+    jitter: float = 0.002,
+    allowed: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Choose breakfast, lunch and dinner for each day of the week.
+
+    Meals are filled in order; each pick scores every catalog recipe for the
+    slot in one vectorized pass: squared, target-normalized distance to what is
+    left of the day's calorie and macro targets, plus a penalty that grows with
+    how often the recipe was already used this week. A small seeded jitter
+    breaks ties so different seeds give different (reproducible) plans.
+
+    Args:
+        catalog: Recipe catalog to choose from
+        goal: Dietary goal (keys of GOAL_TARGETS; "vegetarian" also filters meat)
+        seed: Seed for the tie-breaking jitter
+        variety_weight: Penalty per previous use of a recipe
+        jitter: Scale of the random tie-breaker
+        allowed: Boolean mask of catalog recipes that may be picked (e.g. the
+            ones that satisfy a user's diet); like the goal's own filter, a
+            slot with no allowed recipe falls back to all of its recipes
+
+    Returns:
+        (7, 3) array of catalog indices, days x MEAL_SLOTS
+    """
+    targets = goal_targets(goal)
+    nutrition = catalog.nutrition
+    rng = np.random.default_rng(seed)
+
+    allowed = np.ones(len(catalog), dtype=bool) if allowed is None else allowed.copy()
+    if goal == "vegetarian":
+        allowed &= catalog.vegetarian
+
+    # Per-slot candidate sets, normalized by the daily target once up front
+    candidates = []
+    for slot_index in range(len(MEAL_SLOTS)):
+        indices = np.flatnonzero((catalog.slot == slot_index) & allowed)
+        if indices.size == 0:
+            # No recipe passes the filter: fall back to the whole slot
+            indices = np.flatnonzero(catalog.slot == slot_index)
+        if indices.size == 0:
+            raise ValueError(f"Recipe catalog has no {MEAL_SLOTS[slot_index]} recipes")
+        candidates.append((indices, nutrition[indices] / targets))
+
+    uses = np.zeros(len(catalog), dtype=np.float32)
+    selection = np.empty((len(DAYS), len(MEAL_SLOTS)), dtype=np.int64)
+
+    for day in range(len(DAYS)):
+        remaining = np.ones(len(NUTRIENTS), dtype=np.float32)
+        for slot_index, (indices, normalized) in enumerate(candidates):
+            slot_target = remaining * SLOT_SHARE[slot_index]
+            deviation = normalized - slot_target
+            score = (deviation * deviation) @ NUTRIENT_WEIGHTS
+            score += variety_weight * uses[indices]
+            if jitter:
+                score += jitter * rng.random(indices.size, dtype=np.float32)
+            best = int(np.argmin(score))
+            chosen = indices[best]
+            selection[day, slot_index] = chosen
+            uses[chosen] += 1
+            remaining = remaining - normalized[best]
+
+    return selection
+
+def build_weekly_plan(catalog: RecipeCatalog, selection: np.ndarray) -> WeeklyPlan:
+    """Turn a (7, 3) selection from solve_weekly_plan into a WeeklyPlan"""
+    nutrition = catalog.nutrition
+    days = {}
+    for day_index, day in enumerate(DAYS):
+        chosen = selection[day_index]
+        totals = nutrition[chosen].sum(axis=0)
+        days[day] = DailyMeal(
+            breakfast=catalog.recipes[chosen[0]],
+            lunch=catalog.recipes[chosen[1]],
+            dinner=catalog.recipes[chosen[2]],
+            total_calories=int(round(float(totals[0]))),
+            total_protein=float(totals[1]),
+            total_carbs=float(totals[2]),
+            total_fat=float(totals[3])
+        )
+    return WeeklyPlan(**days)
@@ -0,0 +1,195 @@
+"""
+Pool of ready-made weekly plans per goal, refilled in the background
+"""
+import os
+import time
+import asyncio
+import logging
+import numpy as np
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from models.schemas import PlanResponse, WeeklyPlan
+from .catalog import recipe_catalog
+from .plan_optimizer import GOAL_TARGETS, build_weekly_plan
+from .analytics import compute_analytics, select_best_plan
+from .shopping import build_shopping_list
+from .metrics import metrics, PLAN_OPTIMIZE, PLAN_BUILD, PLAN_ANALYTICS, PLAN_SHOPPING_LIST, PLAN_SERIALIZE
+from .logging_setup import request_id_var
+
+logger = logging.getLogger(__name__)
+
+PLAN_POOL_ENABLED = os.getenv("PLAN_POOL_ENABLED", "true").lower() == "true"
+PLAN_POOL_SIZE = int(os.getenv("PLAN_POOL_SIZE", "32"))
+PLAN_POOL_LOW_WATER = int(os.getenv("PLAN_POOL_LOW_WATER", "8"))
+# Optimizer runs scored per pooled plan; generation is off the request path,
+# so it can afford more candidates than an inline build would
+PLAN_POOL_CANDIDATES = int(os.getenv("PLAN_POOL_CANDIDATES", "16"))
+
+def build_plan_response(
+    goal: str,
+    seed: int,
+    candidates: int = PLAN_POOL_CANDIDATES,
+    allowed: Optional[np.ndarray] = None
+) -> PlanResponse:
+    """
+    Build a complete plan response for a goal, from the catalog recipes
+    `allowed` marks (all by default). The same goal and seed always give
+    the same plan.
+    """
+    start = time.perf_counter()
+    selection = select_best_plan(recipe_catalog, goal, candidates=candidates, seed=seed, allowed=allowed)
+    optimized = time.perf_counter()
+    weekly_plan = build_weekly_plan(recipe_catalog, selection)
+    PLAN_OPTIMIZE.observe(optimized - start)
+    PLAN_BUILD.observe(time.perf_counter() - optimized)
+    return finish_plan_response(goal, weekly_plan, seed, f"Generated a personalized {goal} meal plan for you!")
+
+def build_plan_json(goal: str, seed: int) -> bytes:
+    """build_plan_response, serialized: pooled plans are stored as response bytes"""
+    plan_response = build_plan_response(goal, seed)
+    start = time.perf_counter()
+    body = plan_response.model_dump_json().encode("utf-8")
+    PLAN_SERIALIZE.observe(time.perf_counter() - start)
+    return body
+
+def finish_plan_response(goal: str, weekly_plan: WeeklyPlan, seed: Optional[int], message: str) -> PlanResponse:
+    """Add analytics and the shopping list to a finished weekly plan"""
+    start = time.perf_counter()
+    analytics = compute_analytics(recipe_catalog, weekly_plan, goal)
+    analyzed = time.perf_counter()
+    shopping_list = build_shopping_list(weekly_plan)
+    PLAN_ANALYTICS.observe(analyzed - start)
+    PLAN_SHOPPING_LIST.observe(time.perf_counter() - analyzed)
+    return PlanResponse(
+        plan=weekly_plan,
+        analytics=analytics,
+        shopping_list=shopping_list,
+        goal=goal,
+        seed=seed,
+        message=message
+    )
+
+class PlanPool:
+    """
+    Keeps up to `size` pre-built plans per key (a goal, or a goal plus profile
+    bucket). take() pops a plan in O(1); whenever a key drops below
+    `low_water` a background task refills it, building plans one at a time in
+    a worker thread with consecutive seeds. An empty pool builds inline.
+    Plans are whatever the builder returns; the global pool keeps serialized
+    response bodies, so a hit costs no model or JSON work at all.
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[str, int], Any],
+        size: int = PLAN_POOL_SIZE,
+        low_water: int = PLAN_POOL_LOW_WATER
+    ):
+        self.builder = builder
+        self.size = size
+        self.low_water = min(low_water, size)
+        self._plans: Dict[str, Deque[Any]] = {}
+        self._next_seed: Dict[str, int] = {}
+        self._refills: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.built = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self._build_ms: Deque[float] = deque(maxlen=256)
+        self._last_refill_ms = 0.0
+
+    def _seed(self, key: str) -> int:
+        seed = self._next_seed.get(key, 0)
+        self._next_seed[key] = seed + 1
+        return seed
+
+    def start(self, keys: List[str]):
+        """Schedule an initial fill for every key; does not wait for it"""
+        for key in keys:
+            self._plans.setdefault(key, deque())
+            self._schedule_refill(key)
+
+    async def take(self, key: str) -> Any:
+        plans = self._plans.setdefault(key, deque())
+        if plans:
+            self.hits += 1
+            plan = plans.popleft()
+        else:
+            self.misses += 1
+            plan = await asyncio.to_thread(self.builder, key, self._seed(key))
+        if len(plans) < self.low_water:
+            self._schedule_refill(key)
+        return plan
+
+    def _schedule_refill(self, key: str):
+        task = self._refills.get(key)
+        # A task from an earlier event loop (e.g. a test client) never completes
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self._refills[key] = asyncio.create_task(self._refill(key))
+
+    async def _refill(self, key: str):
+        # Runs in a copy of the triggering request's context; do not log under its ID
+        request_id_var.set("-")
+        plans = self._plans.setdefault(key, deque())
+        start = time.perf_counter()
+        self.refills += 1
+        try:
+            while len(plans) < self.size:
+                build_start = time.perf_counter()
+                plan = await asyncio.to_thread(self.builder, key, self._seed(key))
+                self._build_ms.append((time.perf_counter() - build_start) * 1e3)
+                self.built += 1
+                plans.append(plan)
+        except Exception as e:
+            self.refill_errors += 1
+            logger.exception("Plan pool refill failed", extra={"goal": key, "error": str(e)})
+        finally:
+            self._last_refill_ms = (time.perf_counter() - start) * 1e3
+
+    async def stop(self):
+        """Cancel in-flight refills"""
+        tasks = [task for task in self._refills.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refills.clear()
+
+    def stats(self) -> Dict[str, object]:
+        build_ms = sorted(self._build_ms)
+        return {
+            "depth": {key: len(plans) for key, plans in self._plans.items()},
+            "size": self.size,
+            "low_water": self.low_water,
+            "hits": self.hits,
+            "misses": self.misses,
+            "built": self.built,
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+            "refilling": sorted(key for key, task in self._refills.items() if not task.done()),
+            "build_ms_p50": round(build_ms[len(build_ms) // 2], 3) if build_ms else None,
+            "build_ms_max": round(build_ms[-1], 3) if build_ms else None,
+            "last_refill_ms": round(self._last_refill_ms, 3)
+        }
+
+    def collect_metrics(self):
+        """Scrape-time metric families for the pool"""
+        return [
+            ("smartmeal_plan_pool_depth", "gauge", "Ready-made plans in the pool", [
+                ({"goal": key}, len(plans)) for key, plans in self._plans.items()
+            ]),
+            ("smartmeal_plan_pool_takes_total", "counter", "Plans taken from the pool, by whether one was ready", [
+                ({"result": "hit"}, self.hits),
+                ({"result": "miss"}, self.misses)
+            ]),
+            ("smartmeal_plan_pool_built_total", "counter", "Plans built by background refills", [({}, self.built)])
+        ]
+
+# Global pool instance
+plan_pool = PlanPool(build_plan_json)
+metrics.register_collector(plan_pool.collect_metrics)
+
+def start_plan_pool():
+    if PLAN_POOL_ENABLED:
+        plan_pool.start(list(GOAL_TARGETS))
@@ -0,0 +1,355 @@
+"""
+User profiles: a SQLite store with a read-through in-memory cache
+
+Each cached entry holds the parsed profile, its serialized response body and
+ETag, and the preferences it resolves to for recipe and plan requests, so a
+hit costs neither a query nor any parsing. Writes through this process
+replace the cached entry; the TTL bounds how long a write made by another
+worker process can go unseen.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+from models.schemas import ProfileEdit, ProfileResponse, UserProfile, UserPreferences, NutritionGoals
+from .metrics import metrics
+
+# Profile served when a request names no user
+PROFILE_DEFAULT_USER = os.getenv("PROFILE_DEFAULT_USER", "demo")
+
+# Seeded under PROFILE_DEFAULT_USER when the store has no such profile
+DEMO_PROFILE = UserProfile(
+    name="John Doe",
+    email="john.doe@example.com",
+    preferences=UserPreferences(
+        cuisine_preferences=["Asian", "Mediterranean", "Italian"],
+        allergies=["None"],
+        dietary_restrictions=["None"],
+        cooking_frequency="weekdays",
+        household_size=2
+    ),
+    nutrition_goals=NutritionGoals(
+        daily_calories=2200,
+        protein_goal=150.0,
+        carb_goal=250.0,
+        fat_goal=80.0,
+        fiber_goal=30.0
+    ),
+    member_since="January 2024",
+    plan_type="premium",
+    last_login="Today at 10:30 AM"
+)
+
+# Plan type of profiles created through the API
+NEW_PROFILE_PLAN_TYPE = "free"
+
+# Profile list values that mean "nothing"
+_NONE_VALUES = {"", "none", "no", "n/a", "na", "nothing"}
+
+class ProfileNotFound(Exception):
+    """No profile is stored for the user"""
+
+class ProfilePreconditionFailed(Exception):
+    """If-Match named a version of the profile that is no longer current"""
+
+class StoredProfile(NamedTuple):
+    """One cached profile; shared between callers and read-only"""
+    user_id: str
+    profile: UserProfile
+    user_preferences: Optional[Dict[str, Any]]
+    version: int
+    body: bytes
+    etag: str
+    preferences: Dict[str, Any]
+
+def profile_preferences(profile: UserProfile, user_preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The user_preferences a recipe or plan request would send for this
+    profile: its cuisines, allergies and restrictions, overridden by the
+    onboarding answers stored with it (diet, dislikes, cookingTime, ...)
+    """
+    def values(items: List[str]) -> List[str]:
+        return [item for item in items if item.strip().lower() not in _NONE_VALUES]
+
+    preferences: Dict[str, Any] = {}
+    if values(profile.preferences.cuisine_preferences):
+        preferences["preferredCuisines"] = values(profile.preferences.cuisine_preferences)
+    if values(profile.preferences.allergies):
+        preferences["allergies"] = values(profile.preferences.allergies)
+    if values(profile.preferences.dietary_restrictions):
+        preferences["dietary_restrictions"] = values(profile.preferences.dietary_restrictions)
+    if user_preferences:
+        preferences.update(user_preferences)
+    return preferences
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match / If-Match header names etag (weak comparison)"""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+class ProfileStore:
+    """
+    Profiles keyed by user ID in SQLite (in memory when db_path is None),
+    with a bounded LRU of parsed entries in front of it
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_memory_entries: int = 4096,
+        ttl_seconds: float = 60
+    ):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.not_found = 0
+        self.writes = 0
+        self.conflicts = 0
+
+        self._open_db()
+
+    def _open_db(self):
+        if self.db_path:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS profiles (
+                user_id TEXT PRIMARY KEY,
+                profile TEXT NOT NULL,
+                user_preferences TEXT,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO profiles (user_id, profile, user_preferences, version, updated_at) VALUES (?, ?, NULL, 1, ?)",
+            (PROFILE_DEFAULT_USER, DEMO_PROFILE.model_dump_json(), time.time())
+        )
+
+    def _entry(self, user_id: str, profile: UserProfile, user_preferences: Optional[Dict[str, Any]], version: int) -> StoredProfile:
+        response = ProfileResponse(
+            profile=profile,
+            user_preferences=user_preferences,
+            message="User profile retrieved successfully"
+        )
+        body = response.model_dump_json().encode("utf-8")
+        etag = f'"{version}-{hashlib.sha256(body).hexdigest()[:16]}"'
+        return StoredProfile(
+            user_id, profile, user_preferences, version, body, etag, profile_preferences(profile, user_preferences)
+        )
+
+    def _load(self, user_id: str) -> Optional[StoredProfile]:
+        row = self._db.execute(
+            "SELECT profile, user_preferences, version FROM profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        profile = UserProfile.model_validate_json(row[0])
+        user_preferences = json.loads(row[1]) if row[1] else None
+        return self._entry(user_id, profile, user_preferences, row[2])
+
+    def _remember(self, entry: StoredProfile):
+        self._memory[entry.user_id] = (time.monotonic() + self.ttl_seconds, entry)
+        self._memory.move_to_end(entry.user_id)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _cached(self, user_id: str) -> Optional[StoredProfile]:
+        cached = self._memory.get(user_id)
+        if cached is not None:
+            expires_at, entry = cached
+            if expires_at > time.monotonic():
+                self._memory.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            del self._memory[user_id]
+        return None
+
+    def get_cached(self, user_id: str) -> Optional[StoredProfile]:
+        """
+        The user's profile if it is cached, else None; never queries the
+        database, so async callers can try it before moving get() to a thread
+        """
+        with self._lock:
+            return self._cached(user_id)
+
+    def get(self, user_id: str) -> Optional[StoredProfile]:
+        """The user's profile, or None when there is none"""
+        with self._lock:
+            entry = self._cached(user_id)
+            if entry is not None:
+                return entry
+
+            self.misses += 1
+            entry = self._load(user_id)
+            if entry is None:
+                self.not_found += 1
+                return None
+            self._remember(entry)
+            return entry
+
+    def put(
+        self,
+        user_id: str,
+        profile: UserProfile,
+        user_preferences: Optional[Dict[str, Any]] = None,
+        if_match: Optional[str] = None
+    ) -> StoredProfile:
+        """
+        Create or replace the user's profile. With if_match, the write only
+        happens if the stored profile still has that ETag (ProfilePreconditionFailed
+        otherwise); the check is made against the database, not the cache.
+        """
+        with self._lock:
+            current = self._load(user_id)
+            self._check_match(user_id, current, if_match)
+            return self._write(user_id, current, profile, user_preferences)
+
+    def update(
+        self,
+        user_id: str,
+        edit: ProfileEdit,
+        user_preferences: Optional[Dict[str, Any]] = None,
+        if_match: Optional[str] = None
+    ) -> StoredProfile:
+        """
+        Like put, for a client's edit: plan_type, member_since and last_login
+        keep their stored values (a new profile starts on the free plan)
+        """
+        with self._lock:
+            current = self._load(user_id)
+            self._check_match(user_id, current, if_match)
+            if current is not None:
+                owned = current.profile
+                profile = UserProfile(
+                    **edit.model_dump(),
+                    member_since=owned.member_since,
+                    plan_type=owned.plan_type,
+                    last_login=owned.last_login
+                )
+            else:
+                profile = UserProfile(
+                    **edit.model_dump(),
+                    member_since=time.strftime("%B %Y"),
+                    plan_type=NEW_PROFILE_PLAN_TYPE,
+                    last_login="Never"
+                )
+            return self._write(user_id, current, profile, user_preferences)
+
+    def _check_match(self, user_id: str, current: Optional[StoredProfile], if_match: Optional[str]):
+        if if_match is not None and (current is None or not etag_matches(if_match, current.etag)):
+            self.conflicts += 1
+            raise ProfilePreconditionFailed(f"Profile for {user_id} has changed")
+
+    def _write(
+        self,
+        user_id: str,
+        current: Optional[StoredProfile],
+        profile: UserProfile,
+        user_preferences: Optional[Dict[str, Any]]
+    ) -> StoredProfile:
+        version = current.version + 1 if current is not None else 1
+        profile_json = profile.model_dump_json()
+        preferences_json = json.dumps(user_preferences) if user_preferences is not None else None
+        if current is None:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO profiles (user_id, profile, user_preferences, version, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, profile_json, preferences_json, version, time.time())
+            )
+        else:
+            # Another process may have written since _load; only replace the version we read
+            cursor = self._db.execute(
+                "UPDATE profiles SET profile = ?, user_preferences = ?, version = ?, updated_at = ? WHERE user_id = ? AND version = ?",
+                (profile_json, preferences_json, version, time.time(), user_id, current.version)
+            )
+        if cursor.rowcount == 0:
+            self._memory.pop(user_id, None)
+            self.conflicts += 1
+            raise ProfilePreconditionFailed(f"Profile for {user_id} was changed concurrently")
+
+        entry = self._entry(user_id, profile, user_preferences, version)
+        self._remember(entry)
+        self.writes += 1
+        return entry
+
+    def invalidate(self, user_id: str):
+        """Drop the cached entry, e.g. after the row was changed from outside"""
+        with self._lock:
+            self._memory.pop(user_id, None)
+
+    def plan_type(self, user_id: Optional[str]) -> Optional[str]:
+        """The plan type ("free", "premium") stored for a user, or None without a profile"""
+        if not user_id:
+            return None
+        entry = self.get(user_id)
+        return entry.profile.plan_type if entry is not None else None
+
+    def resolve_preferences(self, user_preferences: Optional[Dict[str, Any]], user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Preferences for a request: the ones it sent, else those of the user
+        it names (ProfileNotFound if that user has no profile), else None
+        """
+        if user_preferences is not None or not user_id:
+            return user_preferences
+        entry = self.get(user_id)
+        if entry is None:
+            raise ProfileNotFound(f"No profile for user {user_id}")
+        # Requests own their preferences; the cached dict stays untouched
+        return dict(entry.preferences)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_found": self.not_found,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "conflicts": self.conflicts,
+            "memory_entries": len(self._memory)
+        }
+
+    def collect_metrics(self):
+        """Scrape-time metric families for the profile store"""
+        return [
+            ("smartmeal_profile_lookups_total", "counter", "Profile lookups by result", [
+                ({"result": "hit"}, self.hits),
+                ({"result": "miss"}, self.misses - self.not_found),
+                ({"result": "not_found"}, self.not_found)
+            ]),
+            ("smartmeal_profile_writes_total", "counter", "Profile writes by result", [
+                ({"result": "ok"}, self.writes),
+                ({"result": "conflict"}, self.conflicts)
+            ])
+        ]
+
+def create_profile_store_from_env() -> ProfileStore:
+    """Build the profile store from PROFILE_* settings"""
+    return ProfileStore(
+        db_path=os.getenv("PROFILE_DB_PATH", os.path.join(".cache", "profiles.sqlite3")) or None,
+        max_memory_entries=int(os.getenv("PROFILE_CACHE_ENTRIES", "4096")),
+        ttl_seconds=float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+    )
+
+# Global profile store instance
+profile_store = create_profile_store_from_env()
+metrics.register_collector(profile_store.collect_metrics)
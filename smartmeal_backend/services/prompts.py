@@ -2,91 +2,64 @@
 Prompt templates for different AI generation scenarios
 """
 
-RECIPE_GENERATION_SYSTEM_PROMPT = """You are a recipe generation API that ONLY returns valid JSON responses. 
-Never include explanatory text, greetings, or commentary outside the JSON structure.
-Always respond with a JSON array of recipe objects and nothing else."""
+from typing import Any, Dict, Iterable, Type
+from pydantic import BaseModel
+from models.schemas import Recipe
 
-RECIPE_GENERATION_PROMPTS = {
-    "default": """Based on these grocery items, create 2-3 diverse recipes that:
-- Use ingredients efficiently (minimize waste)
-- Offer variety in cooking time (quick & regular options)
-- Include different meal types (main, side, etc.)
-- Are practical for home cooking
-
-Ingredients: {ingredients}
+RECIPE_GENERATION_SYSTEM_PROMPT = """You are a recipe generation API. Respond with a JSON array of recipe objects and nothing else.
+Use only the provided ingredients plus common pantry staples. Times are in minutes, calories per serving."""
 
-Return ONLY a valid JSON array of recipes in this exact format (no additional text):
-[
-  {{
-    "id": "1",
-    "name": "Recipe Name",
-    "description": "Brief description of the dish",
-    "ingredients": ["ingredient1", "ingredient2", "ingredient3"],
-    "instructions": ["Step 1: Do this", "Step 2: Then this", "Step 3: Finally this"],
-    "prep_time": 15,
-    "cook_time": 30,
-    "servings": 4,
-    "calories_per_serving": 350,
-    "tags": ["healthy", "quick", "main-dish"]
-  }},
-  {{
-    "id": "2",
-    "name": "Another Recipe",
-    "description": "Description",
-    "ingredients": ["ingredient1", "ingredient2"],
-    "instructions": ["Step 1", "Step 2"],
-    "prep_time": 10,
-    "cook_time": 20,
-    "servings": 2,
-    "calories_per_serving": 280,
-    "tags": ["vegetarian", "side-dish"]
-  }}
-]""",
+# Style guidance only; the output format comes from RECIPE_RESPONSE_SCHEMA
+# (or RECIPE_JSON_FORMAT when structured output is turned off)
+RECIPE_GENERATION_PROMPTS = {
+    "default": """Create 2-3 diverse, practical home-cooking recipes that use these ingredients efficiently (minimal waste), mixing quick and regular cooking times and meal types.
+Ingredients: {ingredients}""",
+    
+    "health_focused": """Create 2-3 healthy, nutrient-dense recipes using healthy cooking methods (grilling, steaming, roasting).
+Ingredients: {ingredients}""",
     
-    "health_focused": """Create healthy recipes using: {ingredients}
+    "quick_meals": """Create 2-3 quick recipes (under 30 minutes total) with minimal prep: one-pot or sheet-pan meals, simple techniques, meal-prep friendly.
+Ingredients: {ingredients}""",
+    
+    "budget_conscious": """Create 2-3 filling, cost-effective recipes that stretch these ingredients across servings and reuse leftovers.
+Ingredients: {ingredients}"""
+}
 
-Return ONLY this JSON array format:
-[
-  {{
-    "id": "1",
-    "name": "Healthy Recipe Name",
-    "description": "Nutritious description emphasizing health benefits",
-    "ingredients": ["chicken breast", "broccoli", "olive oil"],
-    "instructions": ["Step 1: Prepare ingredients", "Step 2: Cook healthily", "Step 3: Serve"],
-    "prep_time": 15,
-    "cook_time": 25,
-    "servings": 4,
-    "calories_per_serving": 320,
-    "tags": ["healthy", "high-protein", "low-carb"]
-  }}
-]
+# Format instruction for free-text JSON prompting (GEMINI_STRUCTURED_OUTPUT=false)
+RECIPE_JSON_FORMAT = """Return ONLY a JSON array, no other text. Each object has: id (string), name, description, ingredients (array of strings), instructions (array of strings), prep_time, cook_time, servings, calories_per_serving (integers), tags (array of strings)."""
 
-Requirements:
-- Emphasize nutritional value
-- Use healthy cooking methods (grilling, steaming, roasting)
-- Include 2-3 recipes
-- NO text outside JSON""",
-    
-    "quick_meals": """Generate quick recipes (under 30 minutes) using:
-{ingredients}
+def _gemini_type(prop: Dict[str, Any]) -> Dict[str, Any]:
+    if "anyOf" in prop:
+        options = [option for option in prop["anyOf"] if option.get("type") != "null"]
+        return {**_gemini_type(options[0]), "nullable": True}
+    result = {"type": prop["type"].upper()}
+    if prop["type"] == "array":
+        result["items"] = _gemini_type(prop["items"])
+    return result
 
-Focus on:
-- Minimal prep time
-- One-pot or sheet-pan meals
-- Simple cooking techniques
-- Meal prep friendly options
-- Clear time-saving tips""",
-    
-    "budget_conscious": """Create cost-effective recipes that maximize these ingredients:
-{ingredients}
+def gemini_response_schema(model: Type[BaseModel], exclude: Iterable[str] = (), max_items: int = 3) -> Dict[str, Any]:
+    """
+    Gemini responseSchema (OpenAPI subset) for a JSON array of `model` objects;
+    every field not excluded is required, in declaration order
+    """
+    properties = {
+        name: _gemini_type(prop)
+        for name, prop in model.model_json_schema()["properties"].items()
+        if name not in exclude
+    }
+    return {
+        "type": "ARRAY",
+        "maxItems": max_items,
+        "items": {
+            "type": "OBJECT",
+            "properties": properties,
+            "required": list(properties),
+            "propertyOrdering": list(properties)
+        }
+    }
 
-Priorities:
-- Stretch ingredients across multiple servings
-- Use affordable cooking methods
-- Suggest budget-friendly substitutions
-- Include leftover usage tips
-- Focus on filling, satisfying meals"""
-}
+# The model never has an image to link
+RECIPE_RESPONSE_SCHEMA = gemini_response_schema(Recipe, exclude=("image_url",))
 
 def get_recipe_prompt(ingredients: list, style: str = "default", **kwargs) -> str:
     """
@@ -99,6 +72,14 @@ def get_recipe_prompt(ingredients: list, style: str = "default", **kwargs) -> st
     """
     prompt = RECIPE_GENERATION_PROMPTS.get(style, RECIPE_GENERATION_PROMPTS["default"])
     prompt = prompt.format(ingredients=", ".join(ingredients))
+    return prompt + get_preference_constraints(**kwargs)
+
+def get_preference_constraints(**kwargs) -> str:
+    """
+    Prompt lines for the user's diet, allergies, dislikes and other profile
+    constraints (empty when there are none)
+    """
+    prompt = ""
     
     # Add user profile constraints
     if kwargs.get('diet'):
@@ -144,3 +125,71 @@ def get_recipe_prompt(ingredients: list, style: str = "default", **kwargs) -> st
         prompt += f"\nMaximum Total Time: {kwargs['max_time']} minutes"
     
     return prompt
+
+def get_replacement_instructions(count: int, avoid: Iterable[str] = (), exclude_names: Iterable[str] = ()) -> str:
+    """
+    Extra instructions appended to a recipe prompt when only some recipes of
+    an earlier answer are being regenerated
+    """
+    plural = "s" if count != 1 else ""
+    instructions = f"\n\nReturn exactly {count} recipe{plural}."
+    avoid = list(avoid)
+    if avoid:
+        instructions += f"\nThe recipe{plural} MUST NOT contain any {', '.join(avoid)} or ingredients made from them (sauces, pastes, spreads)."
+    exclude_names = list(exclude_names)
+    if exclude_names:
+        instructions += f"\nMake them different from: {', '.join(exclude_names)}"
+    return instructions
+
+PLAN_DAY_SYSTEM_PROMPT = """You are a meal planning API. Respond with a JSON object holding one recipe per requested meal and nothing else.
+Times are in minutes, calories per serving."""
+
+# One day (or the meals of a day still missing) of a model-generated weekly plan
+PLAN_DAY_PROMPT = """Plan {meals} for {day} of a {goal} weekly meal plan. The whole day should come to about {calories} kcal, {protein} g protein, {carbs} g carbs and {fat} g fat.
+Theme for the day: {theme}. Practical home cooking, each meal a different main ingredient."""
+
+# Format instruction for free-text JSON prompting (GEMINI_STRUCTURED_OUTPUT=false)
+PLAN_DAY_JSON_FORMAT = """Return ONLY a JSON object, no other text, with one key per meal ({meals}). Each value has: id (string), name, description, ingredients (array of strings), instructions (array of strings), prep_time, cook_time, servings, calories_per_serving (integers), tags (array of strings)."""
+
+def plan_day_response_schema(meals: Iterable[str]) -> Dict[str, Any]:
+    """Gemini responseSchema for an object with one Recipe per meal slot"""
+    meals = list(meals)
+    return {
+        "type": "OBJECT",
+        "properties": {meal: RECIPE_RESPONSE_SCHEMA["items"] for meal in meals},
+        "required": meals,
+        "propertyOrdering": meals
+    }
+
+def get_plan_day_prompt(
+    day: str,
+    goal: str,
+    targets: Dict[str, float],
+    theme: str,
+    meals: Iterable[str],
+    exclude_names: Iterable[str] = (),
+    **kwargs
+) -> str:
+    """
+    Prompt for some or all meals of one plan day
+    
+    Args:
+        day: Day of the week
+        goal: Dietary goal of the plan
+        targets: Daily calories, protein, carbs and fat for the goal
+        theme: Cuisine or style for the day, so concurrent days differ
+        meals: Meal slots to create (breakfast, lunch, dinner)
+        exclude_names: Recipes already in the plan that must not repeat
+        **kwargs: User profile constraints, as for get_recipe_prompt
+    """
+    prompt = PLAN_DAY_PROMPT.format(
+        meals=", ".join(meals),
+        day=day.title(),
+        goal=goal,
+        theme=theme,
+        **{nutrient: int(round(value)) for nutrient, value in targets.items()}
+    )
+    exclude_names = list(exclude_names)
+    if exclude_names:
+        prompt += f"\nAlready in the plan (do not repeat): {', '.join(exclude_names)}"
+    return prompt + get_preference_constraints(**kwargs)
@@ -0,0 +1,323 @@
+"""
+Receipt line-item extraction
+
+Receipt text is read line by line as it arrives (plain text or multipart
+uploads, never buffered whole). Each line is tokenized once and run through
+a word-level Aho-Corasick automaton compiled from the ingredient lexicon,
+so matching costs one dict step per word however large the lexicon is.
+Quantity, unit and price come from the same line, and the category comes
+from the shopping table.
+"""
+import re
+import codecs
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from multipart.multipart import MultipartParser, parse_options_header, STATE_END
+from models.schemas import IngredientDetail
+from .ingredients import canonical_ingredient, SYNONYMS
+from .shopping import INGREDIENT_TABLE
+
+# Shorthand printed by store point-of-sale systems
+RECEIPT_ABBREVIATIONS = {
+    "chkn": "chicken", "chk": "chicken", "brst": "breast", "bnls": "boneless",
+    "grnd": "ground", "bf": "beef", "tom": "tomato", "toms": "tomato",
+    "pot": "potato", "swt": "sweet", "brocc": "broccoli", "broc": "broccoli",
+    "mush": "mushroom", "shrm": "shrimp", "yog": "yogurt", "ygrt": "yogurt",
+    "chs": "cheese", "bnna": "banana", "bnns": "banana", "avo": "avocado",
+    "org": "organic", "evoo": "olive oil", "grn": "green", "pep": "pepper",
+    "ppr": "pepper", "oliv": "olive", "brd": "bread", "whl": "whole"
+}
+
+# Lines starting with these are totals, payments or store details, not items
+NON_ITEM_WORDS = {
+    "subtotal", "total", "tax", "change", "cash", "visa", "mastercard", "amex",
+    "debit", "credit", "balance", "tend", "tender", "card", "savings", "coupon",
+    "discount", "thank", "store", "tel", "phone", "receipt", "items", "auth"
+}
+
+# Receipt units -> IngredientDetail.unit
+RECEIPT_UNITS = {
+    "lb": "lb", "lbs": "lb", "oz": "oz", "kg": "kg", "g": "g", "ml": "ml", "l": "l",
+    "ct": "each", "pk": "pack", "pack": "pack", "ea": "each", "each": "each", "dz": "dozen", "doz": "dozen"
+}
+
+_WORDS = re.compile(r"[a-z]+")
+# "2.31 lb", "12 oz", "6 ct"
+_MEASURE = re.compile(r"(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(RECEIPT_UNITS, key=len, reverse=True)) + r")\b")
+# "3 @ 1.29", "2 x 0.99"
+_COUNT = re.compile(r"(\d+)\s*(?:@|x\s)")
+# Trailing line price, optionally followed by a tax flag ("4.99 F", "$3.49")
+_PRICE = re.compile(r"\$?(-?\d+\.\d{2})\s*[a-z*]{0,2}\s*$")
+
+# Longest accepted line; longer runs without a newline are cut
+MAX_LINE_CHARS = 512
+
+class ReceiptFormatError(ValueError):
+    """The upload is not a readable receipt (bad multipart body, no boundary, ...)"""
+
+class ReceiptTooLarge(ValueError):
+    """The upload exceeds the configured size limit"""
+
+@lru_cache(maxsize=65536)
+def _normalize_word(word: str) -> str:
+    """One receipt word in lexicon form ("" for units and noise)"""
+    return canonical_ingredient(RECEIPT_ABBREVIATIONS.get(word, word))
+
+def _tokens(words: List[str]) -> List[str]:
+    tokens = []
+    for word in words:
+        # Abbreviations may expand to two words ("evoo" -> "olive oil")
+        for token in _normalize_word(word).split(" "):
+            if token:
+                tokens.append(token)
+    return tokens
+
+class IngredientLexicon:
+    """
+    Word-level Aho-Corasick automaton over ingredient phrases. find() returns
+    the longest phrase in a token sequence (the rightmost on ties, since
+    receipt lines put the head noun last: "chicken broth" is broth).
+    match() memoizes results per word sequence, since bulk imports see the
+    same product descriptions over and over.
+    """
+
+    MEMO_SIZE = 65536
+
+    def __init__(self, phrases: Dict[str, str]):
+        self._memo: Dict[str, Optional[str]] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Longest (phrase length, canonical name) ending in each state
+        self._out: List[Optional[Tuple[int, str]]] = [None]
+        for phrase, canonical in phrases.items():
+            self._add(_tokens(_WORDS.findall(phrase.lower())), canonical)
+        self._link()
+
+    def _add(self, tokens: List[str], canonical: str):
+        if not tokens:
+            return
+        state = 0
+        for token in tokens:
+            following = self._goto[state].get(token)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][token] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            state = following
+        self._out[state] = (len(tokens), canonical)
+
+    def _link(self):
+        """Breadth-first failure links; each state inherits the longest output on its fail chain"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for token, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[following] = target if target != following else 0
+                if self._out[following] is None:
+                    self._out[following] = self._out[self._fail[following]]
+                queue.append(following)
+
+    def find(self, tokens: List[str]) -> Optional[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        best: Optional[Tuple[int, str]] = None
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            match = out[state]
+            if match is not None and (best is None or match[0] >= best[0]):
+                best = match
+        return best[1] if best else None
+
+    def match(self, words: List[str]) -> Optional[str]:
+        """The ingredient named by a line's words, or None"""
+        key = " ".join(words)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        name = self.find(_tokens(words))
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = name
+        return name
+
+def build_lexicon() -> IngredientLexicon:
+    """Lexicon of every shopping-table ingredient plus synonym spellings"""
+    phrases = {name: name for name in INGREDIENT_TABLE}
+    phrases.update(SYNONYMS)
+    phrases.update({"broth": "broth", "stock": "broth", "cereal": "cereal", "juice": "juice"})
+    return IngredientLexicon(phrases)
+
+# Compiled once; shared by every request
+LEXICON = build_lexicon()
+
+def category_of(name: str) -> str:
+    entry = INGREDIENT_TABLE.get(name)
+    return entry[0] if entry else "Other"
+
+def parse_line(line: str, lexicon: IngredientLexicon = LEXICON) -> Optional[IngredientDetail]:
+    """The ingredient on one receipt line, or None for non-item lines"""
+    text = line.lower()
+    words = _WORDS.findall(text)
+    if not words or words[0] in NON_ITEM_WORDS:
+        return None
+    name = lexicon.match(words)
+    if name is None:
+        return None
+
+    quantity, unit, price = None, None, None
+    price_match = _PRICE.search(text)
+    if price_match:
+        price = float(price_match.group(1))
+        text = text[:price_match.start()]
+    measure = _MEASURE.search(text)
+    if measure:
+        quantity, unit = float(measure.group(1)), RECEIPT_UNITS[measure.group(2)]
+    else:
+        count = _COUNT.search(text)
+        if count:
+            quantity, unit = float(count.group(1)), "each"
+    return IngredientDetail(name=name, quantity=quantity, unit=unit, price=price, category=category_of(name))
+
+class ReceiptReader:
+    """
+    Incremental receipt parser: feed() raw bytes as they arrive, finish() at
+    the end of the receipt. Only the current partial line is held in memory.
+    """
+
+    def __init__(self, lexicon: IngredientLexicon = LEXICON):
+        self.lexicon = lexicon
+        self.items: List[IngredientDetail] = []
+        self.lines = 0
+        self.unmatched_lines = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+
+    def _line(self, line: str):
+        if not line.strip():
+            return
+        self.lines += 1
+        item = parse_line(line, self.lexicon)
+        if item is None:
+            self.unmatched_lines += 1
+        else:
+            self.items.append(item)
+
+    def feed(self, data: bytes):
+        lines = self._decoder.decode(data).split("\n")
+        # The cap is on the whole line: its first MAX_LINE_CHARS characters
+        # are kept however the line is split across reads
+        lines[0] = self._partial + lines[0][:MAX_LINE_CHARS - len(self._partial)]
+        self._partial = lines.pop()[:MAX_LINE_CHARS]
+        for line in lines:
+            self._line(line[:MAX_LINE_CHARS])
+
+    def finish(self) -> List[IngredientDetail]:
+        self._partial += self._decoder.decode(b"", final=True)
+        self._line(self._partial[:MAX_LINE_CHARS])
+        self._partial = ""
+        return self.items
+
+class _MultipartReceipts:
+    """python-multipart callbacks that route every file part into its own ReceiptReader"""
+
+    def __init__(self):
+        self.receipts: List[ReceiptReader] = []
+        self._current: Optional[ReceiptReader] = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def on_part_begin(self):
+        self._current = None
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        # Plain form fields are ignored; every uploaded file is one receipt
+        if b"filename" in options:
+            self._current = ReceiptReader()
+            self.receipts.append(self._current)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._current is not None:
+            self._current.feed(data[start:end])
+
+    def on_part_end(self):
+        if self._current is not None:
+            self._current.finish()
+            self._current = None
+
+    def callbacks(self) -> Dict[str, object]:
+        return {name: getattr(self, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end"
+        )}
+
+async def read_receipts(chunks: AsyncIterator[bytes], content_type: str, max_bytes: int) -> List[ReceiptReader]:
+    """
+    Parse receipts from a request body stream: each file of a
+    multipart/form-data upload is one receipt, and a text/plain body is a
+    single receipt
+    """
+    media_type, options = parse_options_header(content_type)
+    if media_type == b"multipart/form-data":
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise ReceiptFormatError("Multipart upload without a boundary")
+        handler = _MultipartReceipts()
+        sink = MultipartParser(boundary, handler.callbacks())
+    elif media_type in (b"text/plain", b""):
+        handler = None
+        sink = ReceiptReader()
+    else:
+        raise ReceiptFormatError(f"Unsupported content type {content_type!r}; upload text/plain or multipart/form-data")
+
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise ReceiptTooLarge(f"Upload exceeds {max_bytes} bytes")
+        if not chunk:
+            continue
+        if handler is None:
+            sink.feed(chunk)
+            continue
+        try:
+            sink.write(chunk)
+        except Exception as e:
+            raise ReceiptFormatError(f"Malformed multipart upload: {str(e)}")
+
+    if handler is None:
+        sink.finish()
+        return [sink]
+    try:
+        sink.finalize()
+    except Exception as e:
+        raise ReceiptFormatError(f"Malformed multipart upload: {str(e)}")
+    # finalize() does not check this itself in every python-multipart version
+    if sink.state != STATE_END:
+        raise ReceiptFormatError("Malformed multipart upload: body ends before the closing boundary")
+    return handler.receipts
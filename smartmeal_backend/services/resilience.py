@@ -0,0 +1,149 @@
+"""
+Retry, hedging and circuit-breaker building blocks for upstream (Gemini) calls
+"""
+import os
+import time
+import random
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class UpstreamError(Exception):
+    """An upstream call failed; `retryable` tells whether trying again may help"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the call was not attempted"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the upstream answered"""
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline (None means no deadline)"""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (the HTTP-date form is ignored)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter")"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1 = first retry)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """q-th percentile (0-100), or None until there are enough samples"""
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    closed: calls pass; `failure_threshold` failures in a row open it.
+    open: calls fail fast for `reset_timeout` seconds.
+    half_open: one probe call is let through; success closes, failure re-opens.
+    A probe that ends without a verdict (cancelled, out of caller deadline,
+    a local error) must call release_probe() so the next call can probe.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "open" and self.retry_after() <= 0:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self):
+        """The half-open probe ended without telling anything about upstream health"""
+        if self.state == "half_open":
+            self._probe_in_flight = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 3) if self.state == "open" else 0.0
+        }
+
+def create_retry_policy_from_env() -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3")),
+        base_delay=float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.2")),
+        max_delay=float(os.getenv("GEMINI_RETRY_MAX_DELAY", "2.0"))
+    )
+
+def create_circuit_breaker_from_env() -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+    )
@@ -0,0 +1,43 @@
+"""
+Response serialization fast paths
+
+Models built by our own code are already valid, so routes serialize them
+once with model_dump_json() and return the bytes, instead of letting
+FastAPI validate them again against `response_model` and round-trip them
+through jsonable_encoder. Plain dict responses are encoded with orjson
+(listed in requirements.txt); without it they fall back to the standard
+json module, with identical output apart from speed.
+"""
+import json
+from typing import Any
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+# orjson is optional; without it responses use the standard json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def json_bytes(content: Any) -> bytes:
+    """Compact UTF-8 JSON for plain Python data"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes with orjson when available (the app's default response class)"""
+
+    def render(self, content: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            return json_bytes(content)
+        return super().render(content)
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize a trusted model once, skipping response_model validation"""
+    return Response(content=model.model_dump_json(), status_code=status_code, media_type="application/json")
+
+def json_response(body: bytes) -> Response:
+    """Response for JSON that was serialized ahead of time"""
+    return Response(content=body, media_type="application/json")
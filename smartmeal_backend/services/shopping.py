@@ -0,0 +1,192 @@
+"""
+Shopping list aggregation for weekly plans
+"""
+import re
+import math
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional
+from models.schemas import WeeklyPlan, ShoppingList
+from .ingredients import canonical_ingredient
+
+STORE_SUGGESTIONS = ["Whole Foods", "Trader Joe's", "Local Market"]
+
+# Display order of categories in the shopping list
+CATEGORY_ORDER = ["Proteins", "Dairy", "Grains", "Vegetables", "Fruits", "Pantry", "Other"]
+
+# Canonical ingredient -> (category, base unit, amount per serving, price per base unit in USD)
+# Base units: "g" for weight, "ml" for volume, "each" for counted items
+INGREDIENT_TABLE: Dict[str, Tuple[str, str, float, float]] = {
+    # Proteins
+    "chicken": ("Proteins", "g", 150, 0.011),
+    "beef": ("Proteins", "g", 150, 0.015),
+    "pork": ("Proteins", "g", 150, 0.010),
+    "salmon": ("Proteins", "g", 150, 0.026),
+    "tuna": ("Proteins", "g", 120, 0.014),
+    "shrimp": ("Proteins", "g", 120, 0.024),
+    "tofu": ("Proteins", "g", 150, 0.006),
+    "egg": ("Proteins", "each", 2, 0.35),
+    "protein powder": ("Proteins", "g", 30, 0.04),
+    "chickpea": ("Proteins", "g", 120, 0.004),
+    "lentil": ("Proteins", "g", 80, 0.004),
+    "bean": ("Proteins", "g", 120, 0.004),
+    # Dairy
+    "yogurt": ("Dairy", "g", 170, 0.006),
+    "milk": ("Dairy", "ml", 240, 0.001),
+    "almond milk": ("Dairy", "ml", 240, 0.0015),
+    "cheese": ("Dairy", "g", 30, 0.018),
+    "butter": ("Dairy", "g", 10, 0.012),
+    # Grains
+    "quinoa": ("Grains", "g", 60, 0.012),
+    "rice": ("Grains", "g", 75, 0.004),
+    "brown rice": ("Grains", "g", 75, 0.005),
+    "pasta": ("Grains", "g", 85, 0.004),
+    "bread": ("Grains", "each", 2, 0.25),
+    "tortilla": ("Grains", "each", 1, 0.30),
+    "granola": ("Grains", "g", 40, 0.012),
+    "oat": ("Grains", "g", 40, 0.005),
+    "flour": ("Grains", "g", 30, 0.002),
+    # Vegetables
+    "broccoli": ("Vegetables", "g", 100, 0.006),
+    "carrot": ("Vegetables", "each", 1, 0.20),
+    "bell pepper": ("Vegetables", "each", 1, 1.00),
+    "onion": ("Vegetables", "each", 0.5, 0.60),
+    "green onion": ("Vegetables", "each", 2, 0.15),
+    "garlic": ("Vegetables", "each", 2, 0.10),
+    "ginger": ("Vegetables", "g", 10, 0.015),
+    "tomato": ("Vegetables", "each", 1, 0.50),
+    "cucumber": ("Vegetables", "each", 0.5, 0.70),
+    "lettuce": ("Vegetables", "g", 50, 0.008),
+    "spinach": ("Vegetables", "g", 60, 0.012),
+    "celery": ("Vegetables", "each", 1, 0.25),
+    "mushroom": ("Vegetables", "g", 80, 0.010),
+    "zucchini": ("Vegetables", "each", 0.5, 0.80),
+    "potato": ("Vegetables", "each", 1, 0.50),
+    "sweet potato": ("Vegetables", "each", 1, 0.90),
+    "herb": ("Vegetables", "g", 5, 0.10),
+    "cilantro": ("Vegetables", "g", 5, 0.08),
+    # Fruits
+    "banana": ("Fruits", "each", 1, 0.25),
+    "berry": ("Fruits", "g", 75, 0.015),
+    "avocado": ("Fruits", "each", 0.5, 1.20),
+    "lemon": ("Fruits", "each", 0.5, 0.60),
+    "lime": ("Fruits", "each", 0.5, 0.40),
+    "apple": ("Fruits", "each", 1, 0.70),
+    # Pantry
+    "olive oil": ("Pantry", "ml", 15, 0.012),
+    "oil": ("Pantry", "ml", 15, 0.006),
+    "soy sauce": ("Pantry", "ml", 15, 0.008),
+    "sauce": ("Pantry", "ml", 30, 0.010),
+    "mayo": ("Pantry", "ml", 15, 0.010),
+    "mustard": ("Pantry", "ml", 5, 0.010),
+    "honey": ("Pantry", "ml", 15, 0.020),
+    "almond": ("Pantry", "g", 20, 0.022),
+    "chia seed": ("Pantry", "g", 10, 0.020),
+    "salt": ("Pantry", "g", 2, 0.001),
+    "pepper": ("Pantry", "g", 1, 0.020),
+    "sugar": ("Pantry", "g", 10, 0.002),
+}
+
+# Unknown ingredients count as one item per use at a flat price
+DEFAULT_ENTRY = ("Other", "each", 1, 1.00)
+
+# Ingredients never worth buying
+SKIP_INGREDIENTS = {"water", ""}
+
+# Rough weight of one counted item, used when a recipe weighs a counted ingredient
+GRAMS_PER_ITEM = 100.0
+
+# Unit spelling -> (base unit, factor to base)
+UNIT_CONVERSIONS: Dict[str, Tuple[str, float]] = {
+    "g": ("g", 1), "gram": ("g", 1), "grams": ("g", 1),
+    "kg": ("g", 1000), "oz": ("g", 28.35), "lb": ("g", 453.6), "lbs": ("g", 453.6),
+    "ml": ("ml", 1), "l": ("ml", 1000), "cup": ("ml", 240), "cups": ("ml", 240),
+    "tbsp": ("ml", 15), "tsp": ("ml", 5),
+}
+
+# Leading "2", "1.5", "1/2" with an optional unit, e.g. "200 g chicken", "2 cups rice"
+_QUANTITY = re.compile(
+    r"^\s*(\d+(?:\.\d+)?(?:/\d+)?)\s*(" + "|".join(sorted(UNIT_CONVERSIONS, key=len, reverse=True)) + r")?\b\s*(?:of\s+)?(.*)$",
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=16384)
+def parse_ingredient(text: str) -> Tuple[str, Optional[float], Optional[str]]:
+    """
+    Split a recipe ingredient string into (canonical name, quantity, base unit).
+    Quantity and unit are None when the string has no leading amount.
+    """
+    match = _QUANTITY.match(text)
+    if not match:
+        return canonical_ingredient(text), None, None
+    amount_text, unit, rest = match.groups()
+    if "/" in amount_text:
+        numerator, denominator = amount_text.split("/")
+        amount = float(numerator) / float(denominator) if float(denominator) else 0.0
+    else:
+        amount = float(amount_text)
+    name = canonical_ingredient(rest)
+    if unit:
+        base_unit, factor = UNIT_CONVERSIONS[unit.lower()]
+        return name, amount * factor, base_unit
+    return name, amount, "each"
+
+def _format_quantity(amount: float, unit: str) -> str:
+    if unit == "g":
+        return f"{amount / 1000:.1f} kg" if amount >= 1000 else f"{amount:.0f} g"
+    if unit == "ml":
+        return f"{amount / 1000:.1f} l" if amount >= 1000 else f"{amount:.0f} ml"
+    # Partial items still have to be bought whole
+    return f"x{math.ceil(amount - 1e-9)}"
+
+def _to_base_unit(amount: Optional[float], unit: Optional[str], entry: Tuple[str, str, float, float]) -> float:
+    """Convert a parsed amount into the table entry's base unit"""
+    base_unit, per_serving = entry[1], entry[2]
+    if amount is None:
+        return per_serving
+    if unit == base_unit:
+        return amount
+    if unit == "each":
+        # "2 salmon" means two portions
+        return amount * per_serving
+    if base_unit == "each":
+        # Weighed or measured produce: roughly 100 g (or ml) per item
+        return amount / GRAMS_PER_ITEM
+    # Weight <-> volume, assuming a density close to water
+    return amount
+
+def build_shopping_list(plan: WeeklyPlan) -> ShoppingList:
+    """
+    Aggregate the ingredients of the 21 meals in a plan into a shopping list.
+    Ingredients are canonicalized and deduplicated; quantities are converted
+    to each ingredient's base unit and summed (explicit amounts when the recipe
+    gives one, otherwise the table's per-serving amount). Categories and cost
+    come from INGREDIENT_TABLE.
+    """
+    # name -> amount in the ingredient's base unit
+    totals: Dict[str, float] = {}
+    for day in (plan.monday, plan.tuesday, plan.wednesday, plan.thursday, plan.friday, plan.saturday, plan.sunday):
+        for recipe in (day.breakfast, day.lunch, day.dinner):
+            for ingredient in recipe.ingredients:
+                name, amount, unit = parse_ingredient(ingredient)
+                if name in SKIP_INGREDIENTS:
+                    continue
+                entry = INGREDIENT_TABLE.get(name, DEFAULT_ENTRY)
+                totals[name] = totals.get(name, 0.0) + _to_base_unit(amount, unit, entry)
+
+    items = []
+    categories: Dict[str, List[str]] = {}
+    estimated_cost = 0.0
+    for name in sorted(totals):
+        category, base_unit, _, price = INGREDIENT_TABLE.get(name, DEFAULT_ENTRY)
+        amount = totals[name]
+        estimated_cost += amount * price
+        label = f"{name.capitalize()} ({_format_quantity(amount, base_unit)})"
+        items.append(label)
+        categories.setdefault(category, []).append(label)
+
+    return ShoppingList(
+        items=items,
+        estimated_cost=round(estimated_cost, 2),
+        store_suggestions=list(STORE_SUGGESTIONS),
+        categories={category: categories[category] for category in CATEGORY_ORDER if category in categories}
+    )
@@ -0,0 +1,211 @@
+"""
+Similarity cache for AI recipe generation
+
+Near-duplicate pantries ("onions" vs "red onion", one extra spice) miss the
+exact cache. This cache keeps a MinHash signature of each request's
+canonical ingredient set, bucketed by style and preferences (diet and
+allergies must match exactly), and finds candidates through LSH banding.
+Candidates are verified with the exact Jaccard similarity of the stored
+sets. A stored response is served when similarity reaches the threshold,
+minus any recipe that uses an ingredient the new pantry lacks.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+from .ingredients import canonical_ingredient, PANTRY_STAPLES
+
+# Mersenne prime for the universal hash family a*x + b mod p
+_PRIME = np.uint64((1 << 61) - 1)
+
+def pantry_terms(ingredients: List[str], detailed_ingredients: Optional[List[Dict[str, Any]]] = None) -> FrozenSet[str]:
+    """Canonical ingredient set of a request; staples every kitchen has are left out"""
+    names = list(ingredients)
+    if detailed_ingredients:
+        names.extend(str(ing.get("name", "")) for ing in detailed_ingredients)
+    return frozenset(canonical_ingredient(name) for name in names) - PANTRY_STAPLES - {""}
+
+def bucket_key(style: str, preferences: Optional[Dict[str, Any]]) -> str:
+    """Only requests with the same style and preferences may share results"""
+    canonical = json.dumps({"style": style, "preferences": preferences or {}}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _uses(recipe_ingredient: str, missing: Set[str]) -> bool:
+    """Whether a recipe ingredient line refers to one of the missing pantry items"""
+    canonical = canonical_ingredient(recipe_ingredient)
+    if canonical in missing:
+        return True
+    words = set(canonical.split(" "))
+    return any(set(item.split(" ")) <= words for item in missing)
+
+class MinHasher:
+    """MinHash signatures with `num_perm` permutations (vectorized over terms and permutations)"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2^31 and term hashes < 2^32 keep a*x + b inside uint64
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, terms: FrozenSet[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=4).digest(), "little") for term in terms),
+            dtype=np.uint64,
+            count=len(terms)
+        )
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+class SimilarityCache:
+    """
+    In-memory LSH index over MinHash signatures. `bands` x `rows` must equal
+    `num_perm`; with 16 bands of 4 rows, a pair at Jaccard 0.7 becomes a
+    candidate about 99% of the time, and one at 0.3 about 12% of the time.
+    Entries expire after `ttl_seconds`, and the least recently used are
+    evicted beyond `max_entries`. Stored values must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        max_entries: int = 4096,
+        ttl_seconds: float = 86400,
+        min_recipes: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_recipes = min_recipes
+        self.hasher = MinHasher(num_perm)
+
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # id -> (bucket, terms, band keys, value, expires_at)
+        self._entries: "OrderedDict[int, Tuple[str, FrozenSet[str], List[Tuple], Dict[str, Any], float]]" = OrderedDict()
+        # (bucket, band index, band bytes) -> ids
+        self._bands: Dict[Tuple, Set[int]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # similar enough, but every recipe needed a missing ingredient
+        self.recipes_dropped = 0
+        self.sets = 0
+
+    def _band_keys(self, bucket: str, terms: FrozenSet[str]) -> List[Tuple]:
+        signature = self.hasher.signature(terms)
+        return [
+            (bucket, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def get(
+        self,
+        ingredients: List[str],
+        style: str = "default",
+        preferences: Optional[Dict[str, Any]] = None,
+        detailed_ingredients: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """A stored response for a similar pantry (with unusable recipes removed), or None"""
+        terms = pantry_terms(ingredients, detailed_ingredients)
+        if not terms:
+            return None
+        keys = self._band_keys(bucket_key(style, preferences), terms)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for key in keys:
+                candidates |= self._bands.get(key, set())
+            best, best_similarity = None, 0.0
+            for entry_id in candidates:
+                _, stored_terms, _, _, expires_at = self._entries[entry_id]
+                if expires_at <= now:
+                    continue
+                similarity = len(terms & stored_terms) / len(terms | stored_terms)
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            _, stored_terms, _, value, _ = self._entries[best]
+
+            missing = set(stored_terms - terms)
+            recipes = value.get("recipes", [])
+            if missing:
+                recipes = [
+                    recipe for recipe in recipes
+                    if not any(_uses(str(ingredient), missing) for ingredient in recipe.get("ingredients", []))
+                ]
+            if len(recipes) < self.min_recipes:
+                self.rejected += 1
+                return None
+            self.hits += 1
+            self.recipes_dropped += len(value.get("recipes", [])) - len(recipes)
+            return {**value, "recipes": recipes}
+
+    def set(
+        self,
+        ingredients: List[str],
+        style: str,
+        preferences: Optional[Dict[str, Any]],
+        detailed_ingredients: Optional[List[Dict[str, Any]]],
+        value: Dict[str, Any]
+    ):
+        """Index a generated response under its pantry"""
+        terms = pantry_terms(ingredients, detailed_ingredients)
+        if not terms:
+            return
+        keys = self._band_keys(bucket_key(style, preferences), terms)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (keys[0][0], terms, keys, value, time.time() + self.ttl_seconds)
+            for key in keys:
+                self._bands.setdefault(key, set()).add(entry_id)
+            self.sets += 1
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, entry_id: int):
+        _, _, keys, _, _ = self._entries.pop(entry_id)
+        for key in keys:
+            ids = self._bands.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._bands[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.rejected
+        return {
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "recipes_dropped": self.recipes_dropped,
+            "sets": self.sets,
+            "entries": len(self._entries)
+        }
+
+def create_similarity_cache_from_env() -> Optional[SimilarityCache]:
+    """Build the similarity cache from SIMILARITY_CACHE_* settings (None when disabled)"""
+    if os.getenv("SIMILARITY_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return SimilarityCache(
+        # Minimum Jaccard similarity of canonical ingredient sets
+        threshold=float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.8")),
+        num_perm=int(os.getenv("SIMILARITY_CACHE_NUM_PERM", "64")),
+        bands=int(os.getenv("SIMILARITY_CACHE_BANDS", "16")),
+        max_entries=int(os.getenv("SIMILARITY_CACHE_MAX_ENTRIES", "4096")),
+        ttl_seconds=float(os.getenv("SIMILARITY_CACHE_TTL_SECONDS", os.getenv("RECIPE_CACHE_TTL_SECONDS", "86400")))
+    )
@@ -2,21 +2,24 @@
 Utilities for processing AI responses
 """
 import json
-from typing import List, Dict, Any
+import logging
+from typing import List, Dict, Any, Optional
 from models.schemas import Recipe
+from .metrics import RECIPE_PARSE_FAILURES, RECIPES_DROPPED_VALIDATE
+from .receipts import ReceiptReader
 
-def parse_recipe_response(ai_response: Dict[str, Any]) -> List[Recipe]:
+logger = logging.getLogger(__name__)
+
+def parse_recipe_slots(ai_response: Dict[str, Any]) -> List[Optional[Recipe]]:
     """
-    Parse and validate AI response into Recipe objects
+    Validate each recipe of an AI response in its own slot
     
     Args:
         ai_response: Dictionary from AI containing recipes
         
     Returns:
-        List of validated Recipe objects
+        One entry per recipe object, None where it failed validation
     """
-    recipes = []
-    
     # Handle different possible response formats
     recipe_list = None
     
@@ -32,48 +35,75 @@ def parse_recipe_response(ai_response: Dict[str, Any]) -> List[Recipe]:
     elif 'results' in ai_response:
         recipe_list = ai_response['results']
     else:
-        # If none of the above, print the keys to debug
-        print(f"Unexpected AI response format. Keys found: {ai_response.keys()}")
+        logger.warning("Unexpected AI response format", extra={"keys": list(ai_response.keys())})
         raise ValueError(f"AI response missing 'recipes' field. Found keys: {list(ai_response.keys())}")
     
+    slots: List[Optional[Recipe]] = []
     for idx, recipe_data in enumerate(recipe_list):
         try:
-            # Handle ingredients - they might come as objects or strings
-            ingredients = recipe_data.get('ingredients', [])
-            if ingredients and isinstance(ingredients[0], dict):
-                # If ingredients are objects like {"item": "Chicken", "quantity": "2"}
-                ingredients = [ing.get('item', str(ing)) for ing in ingredients]
-            
-            # Ensure required fields with defaults
-            recipe = Recipe(
-                id=recipe_data.get('id', f'ai_recipe_{idx}'),
-                name=recipe_data['name'],
-                description=recipe_data['description'],
-                ingredients=ingredients,
-                instructions=recipe_data.get('instructions', []),
-                prep_time=int(recipe_data.get('prep_time', 15)),
-                cook_time=int(recipe_data.get('cook_time', 30)),
-                servings=int(recipe_data.get('servings', 4)),
-                calories_per_serving=int(recipe_data.get('calories_per_serving', 0)),
-                tags=recipe_data.get('tags', [])
-            )
-            recipes.append(recipe)
+            slots.append(parse_recipe(recipe_data, idx))
         except Exception as e:
-            print(f"Error parsing recipe {idx}: {str(e)}")
-            continue
+            logger.warning("Dropped invalid recipe", extra={"index": idx, "error": str(e)})
+            RECIPES_DROPPED_VALIDATE.inc()
+            slots.append(None)
+    return slots
+
+def parse_recipe_response(ai_response: Dict[str, Any]) -> List[Recipe]:
+    """
+    Parse and validate AI response into Recipe objects
+    
+    Args:
+        ai_response: Dictionary from AI containing recipes
+        
+    Returns:
+        List of validated Recipe objects (invalid ones are skipped)
+    """
+    recipes = [recipe for recipe in parse_recipe_slots(ai_response) if recipe is not None]
     
     if not recipes:
+        RECIPE_PARSE_FAILURES.inc()
         raise ValueError("No valid recipes could be parsed from AI response")
     
     return recipes
 
+def parse_recipe(recipe_data: Dict[str, Any], idx: int = 0) -> Recipe:
+    """
+    Validate a single AI recipe object into a Recipe
+    
+    Args:
+        recipe_data: One recipe dictionary from the AI response
+        idx: Position of the recipe, used for the fallback id
+        
+    Returns:
+        Validated Recipe object (raises if required fields are missing)
+    """
+    # Handle ingredients - they might come as objects or strings
+    ingredients = recipe_data.get('ingredients', [])
+    if ingredients and isinstance(ingredients[0], dict):
+        # If ingredients are objects like {"item": "Chicken", "quantity": "2"}
+        ingredients = [ing.get('item', str(ing)) for ing in ingredients]
+    
+    # Ensure required fields with defaults
+    return Recipe(
+        id=recipe_data.get('id', f'ai_recipe_{idx}'),
+        name=recipe_data['name'],
+        description=recipe_data['description'],
+        ingredients=ingredients,
+        instructions=recipe_data.get('instructions', []),
+        prep_time=int(recipe_data.get('prep_time', 15)),
+        cook_time=int(recipe_data.get('cook_time', 30)),
+        servings=int(recipe_data.get('servings', 4)),
+        calories_per_serving=int(recipe_data.get('calories_per_serving', 0)),
+        tags=recipe_data.get('tags', [])
+    )
+
 def extract_ingredients_from_receipt(receipt_text: str) -> List[str]:
     """
-    Extract ingredients from receipt text
-    This is a placeholder - in production, you'd use OCR or more sophisticated parsing
+    Extract ingredients from receipt text (OCR output or a text export)
+    
+    Returns:
+        Distinct canonical ingredient names in receipt order
     """
-    # For demo, return mock ingredients
-    return [
-        'chicken breast', 'bell peppers', 'onions', 'garlic',
-        'rice', 'tomatoes', 'olive oil', 'pasta', 'ground beef', 'cheese'
-    ]
+    reader = ReceiptReader()
+    reader.feed(receipt_text.encode("utf-8"))
+    return list(dict.fromkeys(item.name for item in reader.finish()))
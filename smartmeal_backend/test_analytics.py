@@ -0,0 +1,68 @@
+"""
+Plan analytics: bulk scoring agrees with the single-plan AnalyticsData and
+with a plain-Python reference, across block boundaries
+Runs in process (no server or Gemini key needed): pytest test_analytics.py
+"""
+from itertools import combinations
+
+import numpy as np
+import pytest
+import services.analytics as analytics
+from services.analytics import analytics_kernel, compute_analytics, score_plans
+from services.catalog import recipe_catalog, NUTRIENTS
+from services.plan_optimizer import DAYS, NUTRIENT_WEIGHTS, build_weekly_plan, goal_targets, solve_weekly_plan
+
+GOAL = "fitness"
+
+def selections(count: int) -> np.ndarray:
+    return np.stack([solve_weekly_plan(recipe_catalog, GOAL, seed=seed, jitter=0.05) for seed in range(count)])
+
+def reference(selection: np.ndarray, goal: str):
+    """Compliance and variety of one (7, 3) selection, the slow way"""
+    targets = goal_targets(goal)
+    closeness = []
+    for day in selection:
+        totals = sum(recipe_catalog.nutrition[index] for index in day)
+        closeness.append(sum(
+            weight * max(0.0, 1.0 - abs(total - target) / target)
+            for total, target, weight in zip(totals, targets, NUTRIENT_WEIGHTS)
+        ) / NUTRIENT_WEIGHTS.sum())
+    meals = [recipe_catalog.features(int(index)) for index in selection.reshape(-1)]
+    jaccard = [len(a & b) / len(a | b) if a | b else 0.0 for a, b in combinations(meals, 2)]
+    return 100.0 * np.mean(closeness), 100.0 * (1.0 - np.mean(jaccard))
+
+def test_single_plan_matches_compute_analytics():
+    selection = selections(1)[0]
+    scores = score_plans(recipe_catalog, selection[None], GOAL)
+    data = compute_analytics(recipe_catalog, build_weekly_plan(recipe_catalog, selection), GOAL)
+    assert data.goal_compliance == pytest.approx(float(scores["compliance"][0]), abs=0.05)
+    assert data.variety_score == pytest.approx(float(scores["variety"][0]), abs=0.05)
+    for d, day in enumerate(DAYS):
+        for n, nutrient in enumerate(NUTRIENTS):
+            assert data.daily_breakdown[day][nutrient] == pytest.approx(float(scores["daily"][0, d, n]), abs=0.05)
+
+def test_bulk_scores_match_the_reference(monkeypatch):
+    # A small block makes the variety loop cross block boundaries
+    monkeypatch.setattr(analytics, "BULK_BLOCK", 3)
+    plans = selections(8)
+    scores = score_plans(recipe_catalog, plans, GOAL)
+    for p, selection in enumerate(plans):
+        compliance, variety = reference(selection, GOAL)
+        assert scores["compliance"][p] == pytest.approx(compliance, rel=1e-4)
+        assert scores["variety"][p] == pytest.approx(variety, rel=1e-4)
+
+def test_repeated_meals_lower_variety():
+    varied = selections(1)[0]
+    repeated = np.tile(varied[0], (len(DAYS), 1))
+    scores = score_plans(recipe_catalog, np.stack([varied, repeated]), GOAL)
+    assert scores["variety"][1] < scores["variety"][0]
+
+def test_kernel_on_targets_is_fully_compliant():
+    targets = goal_targets(GOAL)
+    week = np.broadcast_to(targets / 3, (1, len(DAYS), 3, len(NUTRIENTS))).astype(np.float32)
+    # Every meal distinct and sharing nothing: no similarity at all
+    features = np.eye(len(DAYS) * 3, dtype=np.float32)[None]
+    daily, compliance, variety = analytics_kernel(week, features, targets)
+    assert daily[0] == pytest.approx(np.tile(targets, (len(DAYS), 1)), rel=1e-5)
+    assert compliance[0] == pytest.approx(100.0)
+    assert variety[0] == pytest.approx(100.0)
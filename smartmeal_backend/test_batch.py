@@ -0,0 +1,61 @@
+"""
+Recipe batches: one failed item (upstream error, unknown user) does not fail
+the rest, in the JSON response or the NDJSON stream
+Runs in process (no server or Gemini key needed): pytest test_batch.py
+"""
+import os
+import json
+
+# In-memory profile store, before the app creates the global one
+os.environ["PROFILE_DB_PATH"] = ""
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.ai_service import gemini_service
+from benchmarks.fake_gemini import model_text
+import api.routers.path_a_routes as path_a_routes
+
+BATCH = [
+    {"items": ["tofu", "rice"]},
+    {"items": ["poison", "rice"]},
+    {"items": ["beef", "rice"], "user_id": "nobody"},
+    {"items": ["egg", "bread"]}
+]
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Gemini answered in process; prompts mentioning "poison" fail"""
+
+    async def post_with_retries(payload, deadline, *args):
+        if "poison" in json.dumps(payload):
+            raise Exception("upstream unavailable")
+        body = {"candidates": [{"content": {"parts": [{"text": model_text(3, structured=True)}]}}]}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", "http://gemini"))
+
+    monkeypatch.setattr(gemini_service, "mock_mode", False)
+    monkeypatch.setattr(gemini_service, "cache", None)
+    monkeypatch.setattr(gemini_service, "similarity_cache", None)
+    monkeypatch.setattr(gemini_service, "_post_with_retries", post_with_retries)
+    monkeypatch.setattr(path_a_routes, "CATALOG_MATCH_ENABLED", False)
+    monkeypatch.setattr(path_a_routes, "DIET_VERIFY_ENABLED", False)
+
+def test_failed_items_do_not_fail_the_batch(upstream):
+    with TestClient(app) as client:
+        response = client.post("/api/v1/recipes/from-receipt/batch", json={"requests": BATCH})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3]
+    assert [item["success"] for item in body["results"]] == [True, False, False, True]
+    assert (body["succeeded"], body["failed"]) == (2, 2)
+    assert "upstream unavailable" in body["results"][1]["error"]
+    assert "nobody" in body["results"][2]["error"]
+    assert body["results"][3]["result"]["total_count"] > 0
+
+def test_failed_items_do_not_end_the_stream(upstream):
+    with TestClient(app) as client:
+        response = client.post("/api/v1/recipes/from-receipt/batch", json={"requests": BATCH, "stream": True})
+    assert response.status_code == 200
+    items = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda item: item["index"])
+    assert [item["success"] for item in items] == [True, False, False, True]
@@ -0,0 +1,108 @@
+"""
+Circuit breaker: consecutive upstream failures open it, half-open admits a
+single probe, and a probe that ends without a verdict (local error, caller
+deadline) is released rather than left holding the breaker
+Runs in process (no server or Gemini key needed): pytest test_circuit_breaker.py
+"""
+import asyncio
+
+import httpx
+import pytest
+from services.ai_service import gemini_service
+from services.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy
+
+def half_open(breaker: CircuitBreaker) -> CircuitBreaker:
+    """Move an open breaker past its reset timeout"""
+    breaker.opened_at -= breaker.reset_timeout
+    return breaker
+
+def test_consecutive_failures_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() > 0
+
+def test_half_open_admits_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    half_open(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    half_open(breaker)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    half_open(breaker)
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A fresh breaker on the service, one attempt per call"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    monkeypatch.setattr(gemini_service, "breaker", breaker)
+    monkeypatch.setattr(gemini_service, "retry_policy", RetryPolicy(max_attempts=1))
+    return breaker
+
+def send_raising(error: Exception):
+    async def send(payload, deadline, upstream_http):
+        raise error
+    return send
+
+def post():
+    return asyncio.run(gemini_service._post_with_retries({}, None))
+
+def test_upstream_failures_open_the_service_breaker(breaker, monkeypatch):
+    monkeypatch.setattr(gemini_service, "_send", send_raising(httpx.ConnectError("refused")))
+    for _ in range(2):
+        with pytest.raises(Exception, match="refused"):
+            post()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        post()
+
+@pytest.mark.parametrize("error", [RuntimeError("local bug"), DeadlineExceeded("caller gave up")])
+def test_probe_without_a_verdict_is_released(breaker, monkeypatch, error):
+    for _ in range(2):
+        breaker.record_failure()
+    half_open(breaker)
+    monkeypatch.setattr(gemini_service, "_send", send_raising(error))
+    with pytest.raises(type(error)):
+        post()
+    # Neither a failure nor a success: still half-open, and the next call may probe
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def test_successful_probe_closes_the_service_breaker(breaker, monkeypatch):
+    for _ in range(2):
+        breaker.record_failure()
+    half_open(breaker)
+
+    async def send(payload, deadline, upstream_http):
+        return httpx.Response(200, json={}, request=httpx.Request("POST", "http://gemini"))
+
+    monkeypatch.setattr(gemini_service, "_send", send)
+    assert post().status_code == 200
+    assert breaker.state == "closed"
@@ -0,0 +1,65 @@
+"""
+Dietary rules: word pairs override their words (peanut butter is not dairy,
+coconut milk is neither), "<allergen>-free" clears a line, and allergies
+outside the lexicon are matched by name
+Runs in process (no server or Gemini key needed): pytest test_dietary.py
+"""
+import pytest
+from models.schemas import Recipe
+from services.dietary import rules_for_preferences
+
+def scan(preferences, text):
+    return set(rules_for_preferences(preferences).scan(text))
+
+@pytest.mark.parametrize("text, expected", [
+    ("2 tbsp peanut butter", {"peanuts"}),
+    ("1 can coconut milk", set()),
+    ("1 cup almond milk", {"nuts"}),
+    ("2 tbsp soy sauce", {"soy", "gluten"}),
+    ("200 g butter beans", set()),
+    ("1 tbsp cocoa butter", set()),
+    ("100 g cream cheese", {"dairy"}),
+    ("1 tbsp pesto", {"nuts", "dairy"}),
+    ("2 tbsp butter", {"dairy"}),
+    ("handful of pine nuts", {"nuts"}),
+])
+def test_pairs_override_their_words(text, expected):
+    everything = {"allergies": ["nuts", "dairy", "soy", "gluten"]}
+    assert scan(everything, text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("200 g gluten-free pasta", set()),
+    ("gluten free bread", set()),
+    ("1 cup dairy-free cheese", set()),
+    ("lactose free milk", set()),
+    ("egg-free mayo", set()),
+    # Only the named group is cleared
+    ("gluten-free cheese pasta", {"dairy"}),
+    ("dairy-free butter on wheat toast", {"gluten"}),
+])
+def test_free_from_clears_its_group(text, expected):
+    rules = {"allergies": ["gluten", "dairy", "eggs"]}
+    assert scan(rules, text) == expected
+
+def test_only_forbidden_groups_are_reported():
+    assert scan({"allergies": ["shellfish"]}, "2 tbsp peanut butter") == set()
+    assert scan({"allergies": ["shellfish"]}, "1 tbsp oyster sauce") == {"shellfish"}
+    assert scan({"diet": "vegan"}, "1 tbsp honey") == {"honey"}
+    assert scan({"diet": "vegetarian"}, "1 tbsp fish sauce") == {"fish"}
+
+def test_allergies_outside_the_lexicon_match_by_name():
+    rules = {"allergies": ["strawberry", "bell pepper"]}
+    assert scan(rules, "1 cup sliced strawberries") == {"strawberry"}
+    assert scan(rules, "1 red bell pepper") == {"bell pepper"}
+    assert scan(rules, "1 tsp black pepper") == set()
+
+def test_no_allergies_means_no_rules():
+    assert rules_for_preferences({"allergies": ["None"], "preferredCuisines": ["Italian"]}) is None
+
+def test_recipe_name_is_checked_too():
+    recipe = Recipe(
+        id="1", name="Shrimp Pad Thai", description="", ingredients=["rice noodles", "lime"],
+        instructions=["Cook"], prep_time=5, cook_time=10, servings=2, calories_per_serving=400, tags=[]
+    )
+    assert rules_for_preferences({"allergies": ["shellfish"]}).violations(recipe) == ["shellfish: Shrimp Pad Thai"]
+    assert rules_for_preferences({"allergies": ["gluten"]}).violations(recipe) == []
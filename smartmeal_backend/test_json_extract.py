@@ -0,0 +1,69 @@
+"""
+JSON extraction from model output: malformed output, including nesting too
+deep for the decoder, yields the recipes it contains rather than an error,
+and free-text answers give the JSON value they wrap
+Runs in process (no server or Gemini key needed): pytest test_json_extract.py
+"""
+import json
+import asyncio
+
+import httpx
+import pytest
+from services.ai_service import gemini_service, RecipeParseError
+from services.json_extract import IncrementalRecipeExtractor, extract_recipes, extract_json_value
+from benchmarks.fake_gemini import model_text
+
+DEEP = '{"a":[' * 4000
+
+def names(recipes):
+    return [recipe.get("name") for recipe in recipes]
+
+def gemini_response(text: str) -> httpx.Response:
+    body = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    return httpx.Response(200, json=body, request=httpx.Request("POST", "http://gemini"))
+
+def test_deeply_nested_truncated_output_has_no_recipes():
+    assert extract_recipes("[" + DEEP) == []
+
+def test_recipe_after_deeply_nested_value_is_kept():
+    recipe = json.loads(model_text(1, structured=True))[0]
+    text = "[" + DEEP + "]}" * 4000 + ", " + json.dumps(recipe) + "]"
+    assert names(extract_recipes(text)) == [recipe["name"]]
+
+def test_deeply_nested_output_fed_in_chunks():
+    extractor = IncrementalRecipeExtractor()
+    text = "[" + DEEP
+    found = []
+    for start in range(0, len(text), 97):
+        found.extend(extractor.feed(text[start:start + 97]))
+    assert found == []
+
+def test_deeply_nested_api_response_is_a_parse_error(monkeypatch):
+    monkeypatch.setattr(gemini_service, "structured_output", True)
+    with pytest.raises(RecipeParseError):
+        gemini_service._parse_api_response(gemini_response("[" + DEEP + "]}" * 4000 + "]"))
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"breakfast": {"name": "Oats"}}', {"breakfast": {"name": "Oats"}}),
+    ('Here is the plan:\n```json\n{"lunch": {"name": "Soup"}}\n```\nEnjoy {and} more', {"lunch": {"name": "Soup"}}),
+    ('[note] {"dinner": {"name": "Stew"},} trailing ]', {"dinner": {"name": "Stew"}}),
+    ('[{"name": "A"}, {"name": "B"}] and then {"x": 1}', [{"name": "A"}, {"name": "B"}])
+])
+def test_json_value_in_free_text(text, expected):
+    assert extract_json_value(text) == expected
+
+@pytest.mark.parametrize("text", ["", "no json here", '{"breakfast": {"name": "Oa', "[" + DEEP])
+def test_no_json_value_in_free_text(text):
+    with pytest.raises(ValueError):
+        extract_json_value(text)
+
+def test_free_text_plan_day_answer_is_parsed(monkeypatch):
+    text = 'Sure! {"breakfast": {"name": "Oats"}} Let me know if {you} need more.'
+
+    async def post_with_retries(payload, deadline, upstream_http):
+        return gemini_response(text)
+
+    monkeypatch.setattr(gemini_service, "mock_mode", False)
+    monkeypatch.setattr(gemini_service, "_post_with_retries", post_with_retries)
+    answer = asyncio.run(gemini_service.generate_json_async("system", "user", {}, "{}"))
+    assert answer == {"breakfast": {"name": "Oats"}}
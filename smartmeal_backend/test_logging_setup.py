@@ -0,0 +1,39 @@
+"""
+Logging setup: configure_logging is idempotent, comes back after
+shutdown_logging (a second app startup in one process), and leaves the
+logging module's global switches alone
+Runs in process (no server or Gemini key needed): pytest test_logging_setup.py
+"""
+import os
+
+# In-memory profile store, before the app creates the global one
+os.environ["PROFILE_DB_PATH"] = ""
+
+import logging
+from fastapi.testclient import TestClient
+from main import app
+from services import logging_setup
+
+def queue_handlers():
+    return [handler for handler in logging.getLogger().handlers if isinstance(handler, logging_setup.NonBlockingQueueHandler)]
+
+def test_configure_is_idempotent_and_leaves_global_switches_alone():
+    switches = (logging.logProcesses, logging.logMultiprocessing, logging.logThreads)
+    logging_setup.configure_logging()
+    logging_setup.configure_logging()
+    assert len(queue_handlers()) == 1
+    assert (logging.logProcesses, logging.logMultiprocessing, logging.logThreads) == switches
+    logging_setup.shutdown_logging()
+
+def test_second_startup_logs_through_the_queue_again():
+    for _ in range(2):
+        with TestClient(app) as client:
+            assert len(queue_handlers()) == 1
+            assert client.get("/health").status_code == 200
+        assert queue_handlers() == []
+
+def test_startups_register_the_logging_metrics_once():
+    for _ in range(2):
+        with TestClient(app) as client:
+            body = client.get("/metrics").text
+    assert body.count("# TYPE smartmeal_log_records_dropped_total counter") == 1
@@ -0,0 +1,122 @@
+"""
+Plans honour the user's allergies and diet: model-written plans whose
+meals are filled from the catalog, and catalog plans, which then bypass the
+pool; plus the pool's inline builds and refills
+Runs in process (no server or Gemini key needed): pytest test_plan_generator.py
+"""
+import os
+import asyncio
+
+# In-memory profile store, before the app creates the global one
+os.environ["PROFILE_DB_PATH"] = ""
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from models.schemas import UserProfile
+from services.ai_service import gemini_service
+from services.dietary import rules_for_preferences
+from services.profile_store import profile_store, DEMO_PROFILE
+from services.plan_pool import PlanPool, plan_pool, build_plan_response
+
+def plan_recipes(plan):
+    return [plan[day][meal] for day in plan for meal in ("breakfast", "lunch", "dinner")]
+
+def violations(plan, preferences):
+    rules = rules_for_preferences(preferences)
+    return [
+        (recipe["name"], found)
+        for recipe in plan_recipes(plan)
+        for found in [rules.scan(" ".join([recipe["name"], *recipe["ingredients"]]))]
+        if found
+    ]
+
+@pytest.fixture
+def failing_upstream(monkeypatch):
+    """Every plan-day call fails, so the whole week comes from the catalog"""
+    calls = []
+
+    async def generate_json_async(*args, **kwargs):
+        calls.append(args)
+        raise Exception("Error calling Gemini API: upstream unavailable")
+
+    monkeypatch.setattr(gemini_service, "mock_mode", False)
+    monkeypatch.setattr(gemini_service, "generate_json_async", generate_json_async)
+    return calls
+
+def test_vegan_fallback_plan_has_no_animal_products():
+    preferences = {"diet": "vegan"}
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/plans/from-goal",
+            json={"goal": "fitness", "source": "llm", "user_preferences": preferences}
+        )
+    assert response.status_code == 200
+    assert violations(response.json()["plan"], preferences) == []
+
+def test_allergy_profile_fallback_plan_has_no_allergens(failing_upstream):
+    profile = UserProfile(**{
+        **DEMO_PROFILE.model_dump(),
+        "preferences": {**DEMO_PROFILE.preferences.model_dump(), "allergies": ["nuts", "shellfish"]}
+    })
+    profile_store.put("allergic-user", profile)
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/plans/from-goal",
+            json={"goal": "muscle-gain", "source": "llm", "user_id": "allergic-user"}
+        )
+    assert failing_upstream, "the model was not asked"
+    assert response.status_code == 200
+    assert violations(response.json()["plan"], {"allergies": ["nuts", "shellfish"]}) == []
+
+def test_unsatisfiable_diet_is_rejected_rather_than_violated():
+    # The catalog has no vegan dinner without soy or gluten
+    preferences = {"diet": "vegan", "allergies": ["soy", "gluten"]}
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/plans/from-goal",
+            json={"goal": "fitness", "source": "llm", "user_preferences": preferences}
+        )
+    assert response.status_code == 422
+
+def test_catalog_plan_honours_the_diet_instead_of_the_pool():
+    preferences = {"allergies": ["nuts", "shellfish"]}
+    with TestClient(app) as client:
+        hits, misses = plan_pool.hits, plan_pool.misses
+        response = client.post("/api/v1/plans/from-goal", json={"goal": "fitness", "user_preferences": preferences})
+        assert (plan_pool.hits, plan_pool.misses) == (hits, misses)
+    assert response.status_code == 200
+    assert violations(response.json()["plan"], preferences) == []
+
+def test_catalog_plan_without_a_diet_comes_from_the_pool():
+    with TestClient(app) as client:
+        taken = plan_pool.hits + plan_pool.misses
+        response = client.post(
+            "/api/v1/plans/from-goal", json={"goal": "fitness", "user_preferences": {"preferredCuisines": ["Italian"]}}
+        )
+        assert plan_pool.hits + plan_pool.misses == taken + 1
+    assert response.status_code == 200
+
+def test_unsatisfiable_catalog_plan_is_rejected():
+    preferences = {"diet": "vegan", "allergies": ["soy", "gluten"]}
+    with TestClient(app) as client:
+        response = client.post("/api/v1/plans/from-goal", json={"goal": "fitness", "user_preferences": preferences})
+    assert response.status_code == 422
+
+def test_pool_builds_inline_when_empty_and_refills_with_new_seeds():
+    async def scenario():
+        pool = PlanPool(lambda goal, seed: (goal, seed), size=4, low_water=2)
+        # Nothing pooled yet: built inline with the first seed
+        assert await pool.take("fitness") == ("fitness", 0)
+        await pool._refills["fitness"]
+        assert pool.stats()["depth"]["fitness"] == 4
+        taken = [await pool.take("fitness") for _ in range(4)]
+        await pool.stop()
+        return pool, taken
+
+    pool, taken = asyncio.run(scenario())
+    assert taken == [("fitness", seed) for seed in range(1, 5)]
+    assert (pool.hits, pool.misses) == (4, 1)
+
+def test_same_seed_gives_the_same_plan():
+    assert build_plan_response("fitness", 7).plan == build_plan_response("fitness", 7).plan
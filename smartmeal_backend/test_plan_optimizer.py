@@ -0,0 +1,49 @@
+"""
+Plan optimizer: picks stay within each meal slot and the allowed recipes,
+and a slot with no allowed recipe falls back to all of its recipes
+Runs in process (no server or Gemini key needed): pytest test_plan_optimizer.py
+"""
+import numpy as np
+from services.catalog import recipe_catalog, MEAL_SLOTS
+from services.plan_optimizer import DAYS, solve_weekly_plan
+
+def slot_mask(slot_index: int) -> np.ndarray:
+    return recipe_catalog.slot == slot_index
+
+def test_picks_match_their_slot():
+    selection = solve_weekly_plan(recipe_catalog, "fitness", seed=1)
+    assert selection.shape == (len(DAYS), len(MEAL_SLOTS))
+    for slot_index in range(len(MEAL_SLOTS)):
+        assert (recipe_catalog.slot[selection[:, slot_index]] == slot_index).all()
+
+def test_same_seed_same_plan():
+    assert (solve_weekly_plan(recipe_catalog, "fitness", seed=3) == solve_weekly_plan(recipe_catalog, "fitness", seed=3)).all()
+
+def test_allowed_mask_is_respected():
+    # One allowed recipe per slot: every day gets exactly those
+    allowed = np.zeros(len(recipe_catalog), dtype=bool)
+    chosen = [int(np.flatnonzero(slot_mask(slot_index))[-1]) for slot_index in range(len(MEAL_SLOTS))]
+    allowed[chosen] = True
+    selection = solve_weekly_plan(recipe_catalog, "fitness", seed=0, allowed=allowed)
+    assert (selection == np.array(chosen)).all()
+
+def test_slot_without_allowed_recipes_falls_back_to_the_whole_slot():
+    allowed = np.ones(len(recipe_catalog), dtype=bool)
+    allowed[slot_mask(0)] = False
+    before = allowed.copy()
+    selection = solve_weekly_plan(recipe_catalog, "fitness", seed=0, allowed=allowed)
+    assert (recipe_catalog.slot[selection[:, 0]] == 0).all()
+    # The other slots are still restricted (here: not at all), and the mask is not modified
+    assert allowed[selection[:, 1:]].all()
+    assert (allowed == before).all()
+
+def test_empty_mask_falls_back_everywhere():
+    allowed = np.zeros(len(recipe_catalog), dtype=bool)
+    assert (solve_weekly_plan(recipe_catalog, "fitness", seed=0, allowed=allowed)
+            == solve_weekly_plan(recipe_catalog, "fitness", seed=0)).all()
+
+def test_vegetarian_goal_picks_vegetarian_recipes():
+    selection = solve_weekly_plan(recipe_catalog, "vegetarian", seed=0)
+    for slot_index in range(len(MEAL_SLOTS)):
+        if (slot_mask(slot_index) & recipe_catalog.vegetarian).any():
+            assert recipe_catalog.vegetarian[selection[:, slot_index]].all()
@@ -0,0 +1,143 @@
+"""
+Profile store: requests resolved by user ID get the stored profile's
+preferences; only an authenticated caller gets its plan type's admission
+priority
+Runs in process (no server or Gemini key needed): pytest test_profile_store.py
+"""
+import os
+import json
+
+# In-memory profile store, before the app creates the global one
+os.environ["PROFILE_DB_PATH"] = ""
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from models.schemas import UserProfile
+from services.ai_service import gemini_service
+from services.profile_store import profile_store, DEMO_PROFILE, PROFILE_DEFAULT_USER
+from benchmarks.fake_gemini import model_text
+import api.routers.path_a_routes as path_a_routes
+import services.auth as auth
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Gemini answered in process, so calls still go through admission control"""
+    sent = []
+
+    async def post_with_retries(payload, deadline):
+        sent.append(payload)
+        body = {"candidates": [{"content": {"parts": [{"text": model_text(3, structured=True)}]}}]}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", "http://gemini"))
+
+    monkeypatch.setattr(gemini_service, "mock_mode", False)
+    monkeypatch.setattr(gemini_service, "cache", None)
+    monkeypatch.setattr(gemini_service, "similarity_cache", None)
+    monkeypatch.setattr(gemini_service, "_post_with_retries", post_with_retries)
+    monkeypatch.setattr(path_a_routes, "CATALOG_MATCH_ENABLED", False)
+    monkeypatch.setattr(path_a_routes, "DIET_VERIFY_ENABLED", False)
+    return sent
+
+def admitted(plan_class: str) -> int:
+    return gemini_service.admission.stats()["classes"][plan_class]["admitted"]
+
+def test_authenticated_premium_profile_is_admitted_as_premium(upstream, monkeypatch):
+    assert DEMO_PROFILE.plan_type == "premium"
+    monkeypatch.setattr(auth, "AUTH_TOKENS", {"demo-token": PROFILE_DEFAULT_USER})
+    with TestClient(app) as client:
+        premium, free = admitted("premium"), admitted("free")
+        response = client.post(
+            "/api/v1/recipes/from-receipt",
+            json={"items": ["tofu", "rice"]},
+            headers={"Authorization": "Bearer demo-token"}
+        )
+        assert response.status_code == 200
+        assert admitted("premium") == premium + 1
+        assert admitted("free") == free
+
+def test_named_premium_user_is_admitted_as_free(upstream, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_TOKENS", {"demo-token": PROFILE_DEFAULT_USER})
+    with TestClient(app) as client:
+        premium, free = admitted("premium"), admitted("free")
+        for request in (
+            {"json": {"items": ["tofu", "rice"], "user_id": PROFILE_DEFAULT_USER}},
+            {"json": {"items": ["tofu", "rice"]}, "headers": {"X-User-ID": PROFILE_DEFAULT_USER}},
+            {"json": {"items": ["tofu", "rice"]}, "headers": {"Authorization": "Bearer wrong-token"}}
+        ):
+            assert client.post("/api/v1/recipes/from-receipt", **request).status_code == 200
+        assert admitted("premium") == premium
+        assert admitted("free") == free + 3
+
+def test_stored_free_profile_is_admitted_as_free(upstream):
+    profile = UserProfile(**{**DEMO_PROFILE.model_dump(), "plan_type": "free"})
+    profile_store.put("free-user", profile, {"diet": "vegetarian"})
+    with TestClient(app) as client:
+        free = admitted("free")
+        response = client.post(
+            "/api/v1/recipes/from-receipt",
+            json={"items": ["tofu", "rice"]},
+            headers={"X-User-ID": "free-user"}
+        )
+        assert response.status_code == 200
+        assert admitted("free") == free + 1
+    # The stored preferences reached the prompt
+    assert "vegetarian" in json.dumps(upstream[-1]).lower()
+
+def test_unknown_user_is_not_found(upstream):
+    with TestClient(app) as client:
+        response = client.post("/api/v1/recipes/from-receipt", json={"items": ["tofu"], "user_id": "nobody"})
+        assert response.status_code == 404
+    assert not upstream
+
+def test_client_claimed_premium_is_admitted_as_free(upstream):
+    with TestClient(app) as client:
+        premium, free = admitted("premium"), admitted("free")
+        response = client.post(
+            "/api/v1/recipes/from-receipt",
+            json={"items": ["tofu", "rice"], "user_preferences": {"plan_type": "premium"}}
+        )
+        assert response.status_code == 200
+        assert admitted("premium") == premium
+        assert admitted("free") == free + 1
+
+def profile_edit(**changes):
+    edit = {**DEMO_PROFILE.model_dump(), **changes}
+    for field in ("plan_type", "member_since", "last_login"):
+        edit.pop(field)
+    return edit
+
+def test_put_cannot_set_plan_type():
+    with TestClient(app) as client:
+        response = client.put(
+            "/api/v1/profile",
+            json={"profile": {**profile_edit(name="New User"), "plan_type": "premium"}},
+            headers={"X-User-ID": "new-user"}
+        )
+        assert response.status_code == 200
+        assert response.json()["profile"]["plan_type"] == "free"
+    assert profile_store.plan_type("new-user") == "free"
+
+def test_put_keeps_server_owned_fields():
+    profile = UserProfile(**{**DEMO_PROFILE.model_dump(), "plan_type": "premium", "member_since": "March 2023"})
+    profile_store.put("paying-user", profile)
+    with TestClient(app) as client:
+        response = client.put(
+            "/api/v1/profile",
+            json={"profile": {**profile_edit(name="Renamed"), "plan_type": "free", "member_since": "Today"}},
+            headers={"X-User-ID": "paying-user"}
+        )
+        assert response.status_code == 200
+    stored = profile_store.get("paying-user").profile
+    assert (stored.name, stored.plan_type, stored.member_since) == ("Renamed", "premium", "March 2023")
+
+def test_put_needs_a_user_other_than_the_default():
+    with TestClient(app) as client:
+        assert client.put("/api/v1/profile", json={"profile": profile_edit()}).status_code == 400
+        response = client.put(
+            "/api/v1/profile",
+            json={"profile": profile_edit(name="Mallory")},
+            headers={"X-User-ID": PROFILE_DEFAULT_USER}
+        )
+        assert response.status_code == 403
+    assert profile_store.get(PROFILE_DEFAULT_USER).profile.name == DEMO_PROFILE.name
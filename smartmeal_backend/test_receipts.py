@@ -0,0 +1,58 @@
+"""
+Receipt uploads: line items are the same however the body is split across
+reads, and multipart uploads give one receipt per file (400 when malformed)
+Runs in process (no server or Gemini key needed): pytest test_receipts.py
+"""
+import os
+
+# In-memory profile store, before the app creates the global one
+os.environ["PROFILE_DB_PATH"] = ""
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.receipts import ReceiptReader, MAX_LINE_CHARS
+
+RECEIPT = "FRESH MART #112\nBNLS CHKN BRST 2.31 lb 7.99 F\nORG BNNA 3 @ 0.29 0.87\nSUBTOTAL 8.86\n"
+
+def read(text: str, chunk_size: int):
+    reader = ReceiptReader()
+    data = text.encode("utf-8")
+    for start in range(0, len(data), chunk_size):
+        reader.feed(data[start:start + chunk_size])
+    return [(item.name, item.quantity, item.unit, item.price) for item in reader.finish()], reader.lines
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 13, 64, 4096])
+def test_lines_split_across_reads(chunk_size):
+    assert read(RECEIPT, chunk_size) == read(RECEIPT, len(RECEIPT))
+    assert read(RECEIPT, chunk_size)[0] == [("chicken", 2.31, "lb", 7.99), ("banana", 3.0, "each", 0.87)]
+
+@pytest.mark.parametrize("chunk_size", [1, 100, MAX_LINE_CHARS - 1, MAX_LINE_CHARS, MAX_LINE_CHARS + 7])
+def test_long_line_is_capped_the_same_however_it_is_split(chunk_size):
+    # The item sits inside the cap, the price beyond it
+    text = "chicken " + "x" * MAX_LINE_CHARS + " 4.99\n" + "ORG BNNA 0.87\n"
+    assert read(text, chunk_size) == read(text, len(text))
+    assert read(text, chunk_size)[0] == [("chicken", None, None, None), ("banana", None, None, 0.87)]
+
+def multipart_body(files, boundary="receipt-boundary"):
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="receipt"; filename="{name}"\r\n'
+        f"Content-Type: text/plain\r\n\r\n{text}\r\n"
+        for name, text in files
+    ]
+    return ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8"), f"multipart/form-data; boundary={boundary}"
+
+def test_multipart_upload_reads_every_file():
+    body, content_type = multipart_body([("a.txt", RECEIPT), ("b.txt", "GRND BF 1.02 lb 5.49\n")])
+    with TestClient(app) as client:
+        response = client.post("/api/v1/receipts/upload", content=body, headers={"Content-Type": content_type})
+    assert response.status_code == 200
+    assert response.json()["items"] == ["chicken", "banana", "beef"]
+
+def test_truncated_multipart_upload_is_rejected():
+    body, content_type = multipart_body([("a.txt", RECEIPT)])
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/receipts/upload", content=body[:len(body) // 2], headers={"Content-Type": content_type}
+        )
+    assert response.status_code == 400
@@ -0,0 +1,57 @@
+"""
+Recipe cache: equivalent requests share one key, and entries evicted from
+the memory LRU (or lost with the process) are served from SQLite
+Runs in process (no server or Gemini key needed): pytest test_recipe_cache.py
+"""
+from services.cache import RecipeCache, make_cache_key
+
+RESPONSE = {"recipes": [{"name": "Tofu Fried Rice"}]}
+
+def test_equivalent_requests_share_a_key():
+    key = make_cache_key(["Tofu", "rice", " garlic "], "quick", {"diet": "vegan", "allergies": ["nuts"]})
+    assert make_cache_key(["garlic", "RICE", "tofu", "tofu"], "quick", {"allergies": ["nuts"], "diet": "vegan"}) == key
+    assert make_cache_key(["tofu", "rice", "garlic", ""], "quick", {"diet": "vegan", "allergies": ["nuts"]}) == key
+
+def test_different_requests_get_different_keys():
+    key = make_cache_key(["tofu", "rice"], "quick", {"diet": "vegan"})
+    assert make_cache_key(["tofu", "rice"], "default", {"diet": "vegan"}) != key
+    assert make_cache_key(["tofu", "rice"], "quick", {"diet": "vegetarian"}) != key
+    assert make_cache_key(["tofu", "rice", "egg"], "quick", {"diet": "vegan"}) != key
+    assert make_cache_key(["tofu", "rice"], "quick", {"diet": "vegan"}, [{"name": "tofu", "quantity": 2}]) != key
+
+def test_detailed_ingredient_order_does_not_change_the_key():
+    detailed = [{"name": "Tofu", "quantity": 2, "unit": "pack"}, {"name": "rice", "quantity": 1, "unit": "kg"}]
+    assert make_cache_key(["tofu", "rice"], detailed_ingredients=detailed) == \
+        make_cache_key(["tofu", "rice"], detailed_ingredients=detailed[::-1])
+
+def test_evicted_entries_come_from_sqlite(tmp_path):
+    cache = RecipeCache(max_memory_entries=1, db_path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", RESPONSE)
+    cache.set("b", {"recipes": []})
+    assert cache.stats()["memory_entries"] == 1
+    assert cache.get("a") == RESPONSE
+    assert (cache.disk_hits, cache.memory_hits) == (1, 0)
+    # Promoted back into memory by the disk hit
+    assert cache.get("a") == RESPONSE
+    assert (cache.disk_hits, cache.memory_hits) == (1, 1)
+
+def test_entries_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    RecipeCache(db_path=db_path).set("a", RESPONSE)
+    restarted = RecipeCache(db_path=db_path)
+    assert restarted.get("a") == RESPONSE
+    assert restarted.disk_hits == 1
+
+def test_expired_entries_are_misses_in_both_tiers(tmp_path):
+    cache = RecipeCache(db_path=str(tmp_path / "cache.sqlite3"), ttl_seconds=0)
+    cache.set("a", RESPONSE)
+    assert cache.get("a") is None
+    assert cache.misses == 1
+    assert cache.stats()["disk_entries"] == 0
+
+def test_memory_only_cache_forgets_evicted_entries():
+    cache = RecipeCache(max_memory_entries=1)
+    cache.set("a", RESPONSE)
+    cache.set("b", RESPONSE)
+    assert cache.get("a") is None
+    assert cache.get("b") == RESPONSE
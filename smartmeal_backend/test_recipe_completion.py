@@ -0,0 +1,94 @@
+"""
+Recipe completion: recipes dropped from a model answer (cut off, invalid, or
+breaking the diet) are asked for again in one call, each replacement taking
+its slot, while the good recipes stay where they were
+Runs in process (no server or Gemini key needed): pytest test_recipe_completion.py
+"""
+import asyncio
+
+import pytest
+from models.schemas import Recipe, RecipeRequest
+from services.ai_service import gemini_service
+import api.routers.path_a_routes as path_a_routes
+
+VEGETARIAN = {"diet": "vegetarian"}
+
+def recipe(name: str, *ingredients: str, recipe_id: str = "r") -> Recipe:
+    return Recipe(
+        id=recipe_id, name=name, description="", ingredients=list(ingredients) or ["rice"],
+        instructions=["Cook"], prep_time=5, cook_time=10, servings=2, calories_per_serving=400, tags=[]
+    )
+
+@pytest.fixture
+def replacements(monkeypatch):
+    """Replacement calls answered in process; the list of answers is set per test"""
+    calls = []
+    answers = []
+
+    async def generate_replacement_recipes_async(**kwargs):
+        calls.append(kwargs)
+        if isinstance(answers[0], Exception):
+            raise answers[0]
+        return {"recipes": [item.model_dump() for item in answers[0]]}
+
+    monkeypatch.setattr(gemini_service, "generate_replacement_recipes_async", generate_replacement_recipes_async)
+    monkeypatch.setattr(gemini_service, "remember_recipes", lambda *args: None)
+    monkeypatch.setattr(path_a_routes, "DIET_VERIFY_ENABLED", True)
+    monkeypatch.setattr(path_a_routes, "RECIPE_REGENERATE_ENABLED", True)
+    return calls, answers
+
+def complete(slots, incomplete=0, preferences=VEGETARIAN):
+    request = RecipeRequest(items=["tofu", "rice"])
+    return asyncio.run(path_a_routes.complete_recipes(
+        request, slots, incomplete, "default", preferences, None, None, None
+    ))
+
+def test_replacements_fill_only_the_dropped_slots(replacements):
+    calls, answers = replacements
+    good = recipe("Tofu Stir Fry", "tofu", "rice", recipe_id="ai_recipe_0")
+    answers.append([
+        recipe("Chicken Curry", "chicken"),
+        recipe("Veggie Fried Rice", "rice", "peas"),
+        recipe("Bean Tacos", "beans", "corn tortilla")
+    ])
+    recipes = complete([good, None, recipe("Beef Stew", "beef")])
+    assert recipes[0] is good
+    assert [item.name for item in recipes] == ["Tofu Stir Fry", "Veggie Fried Rice", "Bean Tacos"]
+    assert [item.id for item in recipes] == ["ai_recipe_0", "ai_recipe_1", "ai_recipe_2"]
+    # One call, for exactly the missing recipes, told what to keep and avoid
+    assert len(calls) == 1
+    assert calls[0]["count"] == 2
+    assert calls[0]["exclude_names"] == ["Tofu Stir Fry"]
+    assert "meat" in calls[0]["avoid"]
+
+def test_cut_off_recipes_are_replaced_up_to_the_answer_size(replacements, monkeypatch):
+    calls, answers = replacements
+    monkeypatch.setattr(path_a_routes, "RECIPE_MAX_COUNT", 3)
+    answers.append([recipe("Veggie Fried Rice", "rice"), recipe("Bean Tacos", "beans"), recipe("Lentil Soup", "lentils")])
+    recipes = complete([recipe("Tofu Stir Fry", "tofu")], incomplete=5)
+    assert calls[0]["count"] == 2
+    assert [item.name for item in recipes] == ["Tofu Stir Fry", "Veggie Fried Rice", "Bean Tacos"]
+
+def test_repeated_names_are_not_replacements(replacements):
+    _, answers = replacements
+    answers.append([recipe("Tofu Stir Fry", "tofu"), recipe("Bean Tacos", "beans")])
+    recipes = complete([recipe("Tofu Stir Fry", "tofu"), None])
+    assert [item.name for item in recipes] == ["Tofu Stir Fry", "Bean Tacos"]
+
+def test_failed_regeneration_keeps_the_good_recipes(replacements):
+    _, answers = replacements
+    answers.append(Exception("upstream unavailable"))
+    good = recipe("Tofu Stir Fry", "tofu")
+    assert complete([good, None, recipe("Beef Stew", "beef")]) == [good]
+
+def test_nothing_left_is_an_error(replacements):
+    _, answers = replacements
+    answers.append(Exception("upstream unavailable"))
+    with pytest.raises(ValueError):
+        complete([None, recipe("Beef Stew", "beef")])
+
+def test_complete_answer_makes_no_call(replacements):
+    calls, _ = replacements
+    slots = [recipe("Tofu Stir Fry", "tofu"), recipe("Bean Tacos", "beans")]
+    assert complete(slots) == slots
+    assert calls == []
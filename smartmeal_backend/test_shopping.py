@@ -0,0 +1,63 @@
+"""
+Shopping list: ingredient amounts are parsed into base units and the same
+ingredient is merged across spellings, units and meals
+Runs in process (no server or Gemini key needed): pytest test_shopping.py
+"""
+import pytest
+from models.schemas import DailyMeal, Recipe, WeeklyPlan
+from services.plan_optimizer import DAYS
+from services.shopping import INGREDIENT_TABLE, build_shopping_list, parse_ingredient
+
+def recipe(*ingredients: str) -> Recipe:
+    return Recipe(
+        id="r", name="Test", description="", ingredients=list(ingredients), instructions=["Cook"],
+        prep_time=5, cook_time=10, servings=2, calories_per_serving=400, tags=[]
+    )
+
+def plan(breakfast: Recipe, lunch: Recipe, dinner: Recipe, days: int = 1) -> WeeklyPlan:
+    """The meals on the first `days` days, an empty recipe on the rest"""
+    empty = recipe()
+    totals = {"total_calories": 0, "total_protein": 0, "total_carbs": 0, "total_fat": 0}
+    return WeeklyPlan(**{
+        day: DailyMeal(breakfast=breakfast, lunch=lunch, dinner=dinner, **totals) if d < days
+        else DailyMeal(breakfast=empty, lunch=empty, dinner=empty, **totals)
+        for d, day in enumerate(DAYS)
+    })
+
+@pytest.mark.parametrize("text, expected", [
+    ("200 g chicken breast", ("chicken", 200, "g")),
+    ("1.5 kg chicken", ("chicken", 1500, "g")),
+    ("1 lb beef", ("beef", 453.6, "g")),
+    ("2 cups of milk", ("milk", 480, "ml")),
+    ("1/2 cup rice", ("rice", 120, "ml")),
+    ("2 tbsp olive oil", ("olive oil", 30, "ml")),
+    ("3 large onions", ("onion", 3, "each")),
+    ("salt", ("salt", None, None)),
+])
+def test_parse_ingredient(text, expected):
+    name, amount, unit = parse_ingredient(text)
+    assert (name, unit) == (expected[0], expected[2])
+    assert amount == pytest.approx(expected[1])
+
+def test_units_merge_into_the_base_unit():
+    shopping = build_shopping_list(plan(
+        recipe("200 g chicken breast", "2 cups milk"),
+        recipe("1 kg chicken", "1 tbsp milk"),
+        recipe("2 chicken", "chicken")
+    ))
+    per_serving = INGREDIENT_TABLE["chicken"][2]
+    # 200 g + 1000 g + two portions + one portion
+    assert f"Chicken ({(1200 + 3 * per_serving) / 1000:.1f} kg)" in shopping.items
+    assert "Milk (495 ml)" in shopping.items
+    assert len([item for item in shopping.items if item.startswith("Chicken")]) == 1
+
+def test_counted_items_merge_with_weighed_ones():
+    shopping = build_shopping_list(plan(recipe("2 onions"), recipe("150 g onion"), recipe("1 onion")))
+    # 2 + 1.5 + 1 items, bought whole
+    assert "Onion (x5)" in shopping.items
+    assert shopping.categories["Vegetables"] == ["Onion (x5)"]
+
+def test_same_ingredient_merges_across_the_week():
+    shopping = build_shopping_list(plan(recipe("100 g tofu"), recipe("water"), recipe("50 g tofu"), days=7))
+    assert shopping.items == ["Tofu (1.1 kg)"]
+    assert shopping.estimated_cost == pytest.approx(1050 * INGREDIENT_TABLE["tofu"][3], abs=0.01)
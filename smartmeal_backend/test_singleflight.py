@@ -0,0 +1,87 @@
+"""
+Single-flight: concurrent identical recipe requests make one upstream call
+and share its result or error
+Runs in process (no server or Gemini key needed): pytest test_singleflight.py
+"""
+import asyncio
+
+import httpx
+import pytest
+from services.ai_service import gemini_service
+from services.singleflight import SingleFlight
+from benchmarks.fake_gemini import model_text
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"recipes": []}
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+        # Once finished, the next call runs again
+        await flight.do("key", fetch)
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 11, "executions": 2, "coalesced": 9, "in_flight": 0}
+
+def test_errors_are_shared():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [str(result) for result in results] == ["upstream failed"] * 3
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """A slow in-process Gemini, so identical requests overlap"""
+    sent = []
+
+    async def post_with_retries(payload, deadline, *args):
+        sent.append(payload)
+        await asyncio.sleep(0.05)
+        body = {"candidates": [{"content": {"parts": [{"text": model_text(3, structured=True)}]}}]}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", "http://gemini"))
+
+    monkeypatch.setattr(gemini_service, "mock_mode", False)
+    monkeypatch.setattr(gemini_service, "cache", None)
+    monkeypatch.setattr(gemini_service, "similarity_cache", None)
+    monkeypatch.setattr(gemini_service, "_post_with_retries", post_with_retries)
+    return sent
+
+def test_identical_recipe_requests_make_one_upstream_call(upstream):
+    async def scenario():
+        return await asyncio.gather(
+            *(gemini_service.generate_recipes_from_ingredients_async(["tofu", "rice"], "quick") for _ in range(8)),
+            gemini_service.generate_recipes_from_ingredients_async(["beef", "rice"], "quick")
+        )
+
+    results = asyncio.run(scenario())
+    assert len(upstream) == 2
+    assert all(result == results[0] for result in results[:8])
@@ -0,0 +1,71 @@
+"""
+Streaming recipes: SSE events whose text splits recipe objects (and network
+reads that split the events themselves) still yield every recipe, each as
+soon as it is complete
+Runs in process (no server or Gemini key needed): pytest test_streaming.py
+"""
+import json
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from services.ai_service import gemini_service
+from services.gemini_backends import GeminiBackend
+from benchmarks.fake_gemini import model_text
+
+def sse_events(text: str, piece: int) -> bytes:
+    """streamGenerateContent frames, each carrying `piece` characters of the model output"""
+    frames = []
+    for start in range(0, len(text), piece):
+        event = {"candidates": [{"content": {"parts": [{"text": text[start:start + piece]}]}}]}
+        frames.append(f"data: {json.dumps(event)}\r\n\r\n")
+    return "".join(frames).encode("utf-8")
+
+class SplitStreamBackend(GeminiBackend):
+    """Serves an SSE body in fixed-size reads, recording how much was read"""
+
+    name = "split"
+
+    def __init__(self, body: bytes, read_size: int):
+        self.body = body
+        self.read_size = read_size
+        self.read = 0
+
+    async def _chunks(self):
+        for start in range(0, len(self.body), self.read_size):
+            self.read = start + self.read_size
+            yield self.body[start:start + self.read_size]
+            await asyncio.sleep(0)
+
+    @asynccontextmanager
+    async def stream(self, payload):
+        yield httpx.Response(200, content=self._chunks(), request=httpx.Request("POST", "http://gemini"))
+
+@pytest.fixture
+def no_caches(monkeypatch):
+    monkeypatch.setattr(gemini_service, "mock_mode", False)
+    monkeypatch.setattr(gemini_service, "cache", None)
+    monkeypatch.setattr(gemini_service, "similarity_cache", None)
+
+async def collect(backend: SplitStreamBackend):
+    """Recipe names, each with how far into the body the stream had read when it arrived"""
+    found = []
+    async for recipe in gemini_service.stream_recipes_from_ingredients(["tofu", "rice"]):
+        found.append((recipe["name"], backend.read))
+    return found
+
+@pytest.mark.parametrize("piece, read_size", [(1, 7), (5, 1), (13, 64), (40, 3), (97, 1000)])
+def test_recipes_split_across_events_and_reads(no_caches, monkeypatch, piece, read_size):
+    text = model_text(3, structured=True)
+    backend = SplitStreamBackend(sse_events(text, piece), read_size)
+    monkeypatch.setattr(gemini_service, "backend", backend)
+    found = asyncio.run(collect(backend))
+    assert [name for name, _ in found] == [recipe["name"] for recipe in json.loads(text)]
+
+def test_recipes_arrive_before_the_stream_ends(no_caches, monkeypatch):
+    backend = SplitStreamBackend(sse_events(model_text(3, structured=True), 16), 32)
+    monkeypatch.setattr(gemini_service, "backend", backend)
+    found = asyncio.run(collect(backend))
+    assert len(found) == 3
+    assert found[0][1] < len(backend.body) // 2